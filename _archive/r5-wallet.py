@@ -14,107 +14,68 @@
 import os
 import sys
 import json
-import base64
 import time
-import configparser
-from ecdsa import SigningKey, SECP256k1
-from cryptography.fernet import Fernet, InvalidToken
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from web3 import Web3
+import sqlite3
+import asyncio
+import threading
+import argparse
+from contextlib import closing
+from decimal import Decimal, InvalidOperation
+from web3 import Web3, AsyncWeb3, WebSocketProvider
 
 from PyQt5 import QtWidgets, QtCore, QtGui
 
+from r5wallet.config import (WALLET_FILENAME, DEFAULT_QUERY_INTERVAL, DEFAULT_SESSION_TIMEOUT,
+                             DEFAULT_KDF, DEFAULT_KDF_TARGET_MS, DEFAULT_HISTORY_BATCH_SIZE,
+                             DEFAULT_HISTORY_CONCURRENCY, DEFAULT_HISTORY_LOOKBACK,
+                             DEFAULT_HISTORY_SCAN_RATE, DEFAULT_HISTORY_SCAN_WINDOW,
+                             WS_RECONNECT_DELAY, TX_POLL_TICK_MS, FEE_TIERS, DEFAULT_FEE_TIER,
+                             DEFAULT_METRICS_LOG_INTERVAL,
+                             load_settings, int_setting, kdf_setting, rpc_addresses)
+from r5wallet.keystore import (WalletSession, create_hd_wallet, wallet_from_mnemonic,
+                               wallet_from_private_key)
+from r5wallet.chain import (HistoryScanError, NonceManager, TransactionTracker, TransactionError,
+                            get_wallet_address, fetch_wallet_state)
+from r5wallet.rpc import connect
+from r5wallet.history import (HistoryIndex, iter_history_index, iter_chain_scan, format_eta,
+                              fill_missing_fees)
+from r5wallet.export import ExportError, export_format, export_history, format_ether
+from r5wallet.fees import FeeOracle
+from r5wallet.accounts import AccountError, load_accounts, add_watch_account, remove_watch_account
+
 # Global constants
-WALLET_FILENAME = "r5.key"
-SETTINGS_FILENAME = "wallet.ini"
-DEFAULT_RPC_ADDRESS = "https://rpc-devnet.r5.network/"
-DEFAULT_QUERY_INTERVAL = 60
+HISTORY_FETCH_ROWS = 500
+HISTORY_WIDTH_SAMPLE_ROWS = 200
+RPC_DEBUG_REFRESH_MS = 2000
+RPC_DEBUG_SLOWEST = 25
 
 # -------------------------------
-# Wallet Helper Functions (same as CLI version)
+# Settings and Wallet Setup
 # -------------------------------
-def derive_key(password: str, salt: bytes) -> bytes:
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-    )
-    return base64.urlsafe_b64encode(kdf.derive(password.encode()))
-
-def encrypt_wallet(wallet: dict, password: str) -> dict:
-    salt = os.urandom(16)
-    key = derive_key(password, salt)
-    f = Fernet(key)
-    wallet_json = json.dumps(wallet).encode()
-    encrypted_wallet = f.encrypt(wallet_json)
-    return {
-        "salt": base64.urlsafe_b64encode(salt).decode(),
-        "wallet": encrypted_wallet.decode()
-    }
-
-def decrypt_wallet(file_data: dict, password: str) -> dict:
-    salt = base64.urlsafe_b64decode(file_data["salt"])
-    key = derive_key(password, salt)
-    f = Fernet(key)
-    decrypted = f.decrypt(file_data["wallet"].encode())
-    wallet = json.loads(decrypted.decode())
-    return wallet
-
-def load_settings():
-    settings = {}
-    config = configparser.ConfigParser()
-    if os.path.exists(SETTINGS_FILENAME):
-        try:
-            config.read(SETTINGS_FILENAME)
-            if 'Wallet' not in config:
-                raise ValueError("Missing [Wallet] section")
-            settings = dict(config['Wallet'])
-        except Exception:
-            settings = create_default_settings()
-    else:
-        settings = create_default_settings()
-    if "rpc_address" not in settings:
-        settings = create_default_settings()
-    if "query_interval" not in settings:
-        settings["query_interval"] = str(DEFAULT_QUERY_INTERVAL)
-        config['Wallet'] = settings
-        with open(SETTINGS_FILENAME, "w") as f:
-            config.write(f)
-    return settings
-
-def create_default_settings():
-    settings = {"rpc_address": DEFAULT_RPC_ADDRESS, "query_interval": str(DEFAULT_QUERY_INTERVAL)}
-    config = configparser.ConfigParser()
-    config['Wallet'] = settings
-    with open(SETTINGS_FILENAME, "w") as f:
-        config.write(f)
-    return settings
-
 def create_wallet_with_import(parent=None):
-    text, ok = QtWidgets.QInputDialog.getText(parent, "Import Wallet", "Enter Private Key (hex):")
+    source, ok = QtWidgets.QInputDialog.getItem(parent, "Import Wallet", "Import from:",
+                                                ["Private key", "Seed phrase"], 0, False)
+    if not ok:
+        return None
+    if source == "Seed phrase":
+        text, ok = QtWidgets.QInputDialog.getText(parent, "Import Wallet", "Enter Seed Phrase:")
+    else:
+        text, ok = QtWidgets.QInputDialog.getText(parent, "Import Wallet", "Enter Private Key (hex):")
     if not ok or not text:
         return None
     try:
-        sk = SigningKey.from_string(bytes.fromhex(text.strip()), curve=SECP256k1)
-    except Exception:
-        QtWidgets.QMessageBox.warning(parent, "Error", "Invalid private key format.")
+        if source == "Seed phrase":
+            return wallet_from_mnemonic(text)
+        return wallet_from_private_key(text)
+    except ValueError as e:
+        QtWidgets.QMessageBox.warning(parent, "Error", str(e))
         return None
-    vk = sk.get_verifying_key()
-    wallet = {
-        "private_key": text.strip(),
-        "public_key": vk.to_string().hex()
-    }
-    return wallet
 
-def create_new_wallet():
-    sk = SigningKey.generate(curve=SECP256k1)
-    vk = sk.get_verifying_key()
-    wallet = {
-        "private_key": sk.to_string().hex(),
-        "public_key": vk.to_string().hex()
-    }
+def create_wallet_with_seed(parent=None):
+    wallet = create_hd_wallet()
+    QtWidgets.QMessageBox.information(parent, "Seed Phrase",
+        f"Write down your seed phrase and keep it offline. It restores this wallet:\n\n"
+        f"{wallet['mnemonic']}")
     return wallet
 
 def prompt_for_password(parent, prompt_title="Encryption Password", confirm=False):
@@ -130,7 +91,8 @@ def prompt_for_password(parent, prompt_title="Encryption Password", confirm=Fals
             return None
     return pwd1
 
-def wallet_setup(parent):
+def wallet_setup(parent, idle_timeout=DEFAULT_SESSION_TIMEOUT, kdf=DEFAULT_KDF,
+                 kdf_target_ms=DEFAULT_KDF_TARGET_MS):
     if not os.path.exists(WALLET_FILENAME):
         choice = QtWidgets.QMessageBox.question(parent, "Wallet Setup",
                     "No existing wallet detected!\nDo you want to import a wallet with a private key?",
@@ -140,15 +102,14 @@ def wallet_setup(parent):
             if wallet is None:
                 return None
         else:
-            wallet = create_new_wallet()
+            wallet = create_wallet_with_seed(parent)
         password = prompt_for_password(parent, "Create Encryption Password", confirm=True)
         if password is None:
             return None
-        file_contents = encrypt_wallet(wallet, password)
-        with open(WALLET_FILENAME, "w") as f:
-            json.dump(file_contents, f)
+        session = WalletSession.create_file(wallet, password, idle_timeout,
+                                            kdf=kdf, kdf_target_ms=kdf_target_ms)
         QtWidgets.QMessageBox.information(parent, "Success", "Wallet file created.")
-        return wallet
+        return session
     else:
         try:
             with open(WALLET_FILENAME, "r") as f:
@@ -162,8 +123,8 @@ def wallet_setup(parent):
         if not ok:
             return None
         try:
-            wallet = decrypt_wallet(file_data, password)
-            return wallet
+            return WalletSession.unlock_file(file_data, password, idle_timeout,
+                                             kdf=kdf, kdf_target_ms=kdf_target_ms)
         except Exception:
             choice = QtWidgets.QMessageBox.question(parent, "Wallet Login",
                                                       "Incorrect password or corrupt wallet.\nDo you want to reimport the wallet?",
@@ -175,134 +136,867 @@ def wallet_setup(parent):
                 password = prompt_for_password(parent, "Create Encryption Password", confirm=True)
                 if password is None:
                     return None
-                file_contents = encrypt_wallet(wallet, password)
-                with open(WALLET_FILENAME, "w") as f:
-                    json.dump(file_contents, f)
-                return wallet
+                return WalletSession.create_file(wallet, password, idle_timeout,
+                                                 kdf=kdf, kdf_target_ms=kdf_target_ms)
             else:
                 choice2 = QtWidgets.QMessageBox.question(parent, "Wallet Login",
                               "Do you want to create a new wallet?", QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
                 if choice2 == QtWidgets.QMessageBox.Yes:
-                    wallet = create_new_wallet()
+                    wallet = create_wallet_with_seed(parent)
                     password = prompt_for_password(parent, "Create Encryption Password", confirm=True)
                     if password is None:
                         return None
-                    file_contents = encrypt_wallet(wallet, password)
-                    with open(WALLET_FILENAME, "w") as f:
-                        json.dump(file_contents, f)
-                    return wallet
+                    return WalletSession.create_file(wallet, password, idle_timeout,
+                                                 kdf=kdf, kdf_target_ms=kdf_target_ms)
                 else:
                     QtWidgets.QMessageBox.critical(parent, "Error", "Could not initiate R5 Wallet.")
                     sys.exit(1)
 
-def get_wallet_address(wallet: dict, w3: Web3) -> str:
-    try:
-        account = w3.eth.account.from_key(wallet["private_key"])
-        return account.address
-    except Exception:
-        return "Unknown"
+def ensure_unlocked(session: WalletSession, parent) -> bool:
+    if not session.locked:
+        return True
+    password = prompt_for_password(parent, "Wallet locked, enter password to unlock")
+    if password is None:
+        return False
+    if not session.verify_password(password):
+        QtWidgets.QMessageBox.warning(parent, "Error", "Incorrect password or error decrypting wallet.")
+        return False
+    return True
 
-def fetch_block_height(w3: Web3) -> int:
-    try:
-        return w3.eth.block_number
-    except Exception:
-        return 0
+# -------------------------------
+# Async Worker for Transaction History
+# -------------------------------
+class HistoryWorker(QtCore.QObject):
+    transactions_found = QtCore.pyqtSignal(list)
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+    
+    def __init__(self, w3, addresses, batch_size=DEFAULT_HISTORY_BATCH_SIZE,
+                 concurrency=DEFAULT_HISTORY_CONCURRENCY,
+                 lookback=DEFAULT_HISTORY_LOOKBACK, parent=None):
+        super().__init__(parent)
+        self.w3 = w3
+        self.addresses = addresses
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lookback = lookback
+        self._cancelled = threading.Event()
 
-def fetch_balance(w3: Web3, wallet: dict):
-    address = get_wallet_address(wallet, w3)
-    try:
-        balance_wei = w3.eth.get_balance(address)
-        balance = w3.from_wei(balance_wei, 'ether')
-        return float(balance)
-    except Exception:
-        return 0.0
-
-def fetch_history(w3: Web3, wallet: dict, block_range: int = 1080):
-    address = get_wallet_address(wallet, w3).lower()
-    current_block = fetch_block_height(w3)
-    start_block = max(0, current_block - block_range)
-    transactions = []
-    for blk in range(start_block, current_block + 1):
+    def cancel(self):
+        # Called directly from the GUI thread, this worker's own event loop is
+        # busy in run(). Takes effect after the batch in progress.
+        self._cancelled.set()
+
+    @QtCore.pyqtSlot()
+    def run(self):
         try:
-            block = w3.eth.get_block(blk, full_transactions=True)
-            for tx in block.transactions:
-                if tx['from'].lower() == address or (tx.to and tx.to.lower() == address):
-                    tx_info = {
-                        "blockNumber": tx.blockNumber,
-                        "from": tx['from'],
-                        "to": tx.to,
-                        "value": w3.from_wei(tx.value, 'ether'),
-                        "hash": tx.hash.hex()
-                    }
-                    transactions.append(tx_info)
-        except Exception:
-            continue
-    return transactions
+            # The sqlite connection has to be opened on the worker thread.
+            with HistoryIndex() as index:
+                scan = iter_history_index(self.w3, index, self.addresses, self.lookback,
+                                          self.batch_size, self.concurrency)
+                with closing(scan):
+                    for transactions, done, total in scan:
+                        if self._cancelled.is_set():
+                            break
+                        if transactions:
+                            self.transactions_found.emit(transactions)
+                        self.progress.emit(done, total)
+        except (HistoryScanError, sqlite3.Error) as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit()
 
-def estimate_gas(w3: Web3, wallet: dict, destination: str, amount_wei: int):
-    sender = get_wallet_address(wallet, w3)
-    tx = {
-        "from": sender,
-        "to": destination,
-        "value": amount_wei
-    }
-    try:
-        gas_estimate = w3.eth.estimate_gas(tx)
-        return gas_estimate
-    except Exception:
-        return 21000
+class ChainScanWorker(QtCore.QObject):
+    """Runs iter_chain_scan for the history dialog. finished carries the
+    last progress, whether the job is done or was stopped to resume later."""
+    progress = QtCore.pyqtSignal(dict)
+    finished = QtCore.pyqtSignal(dict)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, w3, addresses, from_block, rate=DEFAULT_HISTORY_SCAN_RATE,
+                 window=DEFAULT_HISTORY_SCAN_WINDOW, batch_size=DEFAULT_HISTORY_BATCH_SIZE,
+                 concurrency=DEFAULT_HISTORY_CONCURRENCY, parent=None):
+        super().__init__(parent)
+        self.w3 = w3
+        self.addresses = addresses
+        self.from_block = from_block
+        self.rate = rate
+        self.window = window
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._stop = threading.Event()
+
+    def cancel(self):
+        # Also cuts short a wait for the node to come back.
+        self._stop.set()
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        progress = {}
+        try:
+            with HistoryIndex() as index:
+                for _, progress in iter_chain_scan(self.w3, index, self.addresses, self.from_block,
+                                                   self.rate, self.window, self.batch_size,
+                                                   self.concurrency, self._stop):
+                    self.progress.emit(progress)
+        except (HistoryScanError, sqlite3.Error) as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(progress)
+
+class ExportWorker(QtCore.QObject):
+    """Looks up missing fees, then streams the indexed history of the
+    accounts to a report file. finished carries the totals per account."""
+    finished = QtCore.pyqtSignal(dict)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, w3, addresses, path, fmt, batch_size=DEFAULT_HISTORY_BATCH_SIZE,
+                 parent=None):
+        super().__init__(parent)
+        self.w3 = w3
+        self.addresses = addresses
+        self.path = path
+        self.fmt = fmt
+        self.batch_size = batch_size
+
+    @QtCore.pyqtSlot()
+    def run(self):
+        try:
+            with HistoryIndex() as index:
+                try:
+                    fill_missing_fees(self.w3, index, self.addresses, self.batch_size)
+                except HistoryScanError:
+                    pass  # the report marks the fees it lacks
+                summary = export_history(index, self.addresses, self.path, self.fmt)
+        except (ExportError, OSError, sqlite3.Error) as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(summary)
 
 # -------------------------------
-# Async Worker for Transaction History
+# Background Wallet Refresh
 # -------------------------------
-class HistoryWorker(QtCore.QObject):
-    finished = QtCore.pyqtSignal(list)
-    
-    def __init__(self, w3, wallet, parent=None):
+class RefreshWorker(QtCore.QObject):
+    """Lives on its own thread and answers refresh requests from the window.
+    Unless the refresh is forced, it first asks only for the block height,
+    and nothing more is fetched or emitted while that stays the same. On a
+    new block it fetches one fetch_wallet_state batch, watched balances
+    included, and refreshes the fee oracle."""
+    updated = QtCore.pyqtSignal(dict)
+    failed = QtCore.pyqtSignal(str)
+    done = QtCore.pyqtSignal()
+
+    def __init__(self, w3, wallet, fee_oracle, parent=None):
         super().__init__(parent)
         self.w3 = w3
         self.wallet = wallet
+        self.fee_oracle = fee_oracle
+        self.address = None
+        self.last_block = None
+        self.watch = ()  # replaced whole from the GUI thread, never mutated
+
+    @QtCore.pyqtSlot(bool)
+    def refresh(self, force=False):
+        try:
+            if self.address is None:
+                self.address = get_wallet_address(self.wallet, self.w3)
+            if not force and self.last_block is not None:
+                if self.w3.eth.block_number == self.last_block:
+                    return
+            state = fetch_wallet_state(self.w3, self.address, watch=self.watch)
+            self.last_block = state["block_height"]
+            self.updated.emit(state)
+            self.fee_oracle.refresh(state["block_height"])
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.done.emit()
+
+class GasEstimateWorker(QtCore.QObject):
+    """Estimates transfer gas for the send dialog on its own thread, as a
+    transfer to a contract is an eth_estimateGas round trip. estimated
+    carries the destination and amount it was asked about."""
+    estimated = QtCore.pyqtSignal(str, object, int)
+
+    def __init__(self, wallet, fee_oracle, parent=None):
+        super().__init__(parent)
+        self.wallet = wallet
+        self.fee_oracle = fee_oracle
+
+    @QtCore.pyqtSlot(str, object)
+    def estimate(self, destination, amount_wei):
+        self.estimated.emit(destination, amount_wei,
+                            self.fee_oracle.transfer_gas(self.wallet, destination, amount_wei))
+
+class HeadSubscriber(QtCore.QObject):
+    """Holds a newHeads subscription on a WebSocket endpoint and emits the
+    number of every new block, reconnecting after WS_RECONNECT_DELAY when
+    the connection drops."""
+    new_head = QtCore.pyqtSignal(int)
+
+    def __init__(self, ws_address, parent=None):
+        super().__init__(parent)
+        self.ws_address = ws_address
+        self._stopped = threading.Event()
+        self._loop = None
+        self._task = None
 
     @QtCore.pyqtSlot()
     def run(self):
-        transactions = fetch_history(self.w3, self.wallet)
-        self.finished.emit(transactions)
+        self._loop = asyncio.new_event_loop()
+        try:
+            while not self._stopped.is_set():
+                self._task = self._loop.create_task(self._listen())
+                try:
+                    self._loop.run_until_complete(self._task)
+                except (Exception, asyncio.CancelledError):
+                    pass
+                self._stopped.wait(WS_RECONNECT_DELAY)
+        finally:
+            self._loop.close()
+
+    async def _listen(self):
+        async with AsyncWeb3(WebSocketProvider(self.ws_address)) as w3:
+            await w3.eth.subscribe("newHeads")
+            async for message in w3.socket.process_subscriptions():
+                self.new_head.emit(int(message["result"]["number"]))
+
+    def stop(self):
+        # Called from the GUI thread.
+        self._stopped.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+
+# -------------------------------
+# Transaction Lifecycle Tracking
+# -------------------------------
+class TransactionTrackerWorker(QtCore.QObject):
+    """Runs a TransactionTracker on its own thread, so signing, broadcasting
+    and receipt polling never block the window. A transaction that never
+    left is reported as failed with an empty hash."""
+    status_changed = QtCore.pyqtSignal(str, str, dict)
+
+    def __init__(self, w3, wallet, nonce_manager, parent=None):
+        super().__init__(parent)
+        self.tracker = TransactionTracker(w3, wallet, nonce_manager, self.status_changed.emit)
+        self.timer = None
+
+    @QtCore.pyqtSlot()
+    def start(self):
+        # Created here so the timer belongs to the tracker's thread.
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.tracker.poll)
+        self.timer.start(TX_POLL_TICK_MS)
+
+    @QtCore.pyqtSlot()
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+
+    @QtCore.pyqtSlot(dict)
+    def submit(self, tx):
+        try:
+            self.tracker.submit(tx)
+        except TransactionError as e:
+            self.status_changed.emit("", "failed", {"error": str(e)})
+
+# -------------------------------
+# Transaction History Dialog
+# -------------------------------
+class HistoryTableModel(QtCore.QAbstractTableModel):
+    """Table model over the plain transaction dicts. Cells are formatted on
+    demand, sorting and filtering work on an index list instead of the rows
+    themselves, and rows are handed to the view HISTORY_FETCH_ROWS at a time
+    as it scrolls, so large histories never materialize per-cell objects.
+    Direction is relative to the account each row was matched for;
+    accounts maps lowercase addresses to their labels."""
+
+    HEADERS = ["Block", "From", "To", "Amount", "Tx Hash", "Account"]
+    DIRECTIONS = ["All", "Incoming", "Outgoing"]
+
+    def __init__(self, accounts: dict, parent=None):
+        super().__init__(parent)
+        self.accounts = accounts
+        self._account = ""
+        self._rows = []
+        self._view = []  # indices into _rows that pass the filter, in display order
+        self._loaded = 0  # leading part of _view the view has been told about
+        self._sort_column = 0
+        self._sort_order = QtCore.Qt.AscendingOrder
+        self._direction = "All"
+        self._counterparty = ""
+        self._min_amount = None
+        self._max_amount = None
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        tx = self._rows[self._view[index.row()]]
+        column = index.column()
+        if column == 0:
+            return str(tx["blockNumber"])
+        if column == 1:
+            return tx["from"]
+        if column == 2:
+            return tx["to"] or ""
+        if column == 3:
+            return str(tx["value"])
+        if column == 4:
+            return tx["hash"]
+        return self.accounts.get(tx["account"], tx["account"])
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._view)
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        self._show_more(HISTORY_FETCH_ROWS)
+
+    def _show_more(self, count):
+        loaded = min(len(self._view), self._loaded + count)
+        if loaded > self._loaded:
+            self.beginInsertRows(QtCore.QModelIndex(), self._loaded, loaded - 1)
+            self._loaded = loaded
+            self.endInsertRows()
+
+    def total_count(self):
+        return len(self._rows)
+
+    def visible_count(self):
+        return len(self._view)
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._view = []
+        self._loaded = 0
+        self.endResetModel()
+
+    def append(self, transactions):
+        first = len(self._rows)
+        self._rows.extend(transactions)
+        matches = [i for i in range(first, len(self._rows)) if self._accepts(self._rows[i])]
+        if not matches:
+            return
+        if self._sort_column == 0 and self._sort_order == QtCore.Qt.AscendingOrder:
+            # Batches arrive in block order, so the default order only appends.
+            self._view.extend(matches)
+            if self._loaded < HISTORY_FETCH_ROWS:
+                self._show_more(HISTORY_FETCH_ROWS - self._loaded)
+        else:
+            self._view.extend(matches)
+            self._rebuild(refilter=False)
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._rebuild(refilter=False)
+
+    def set_filter(self, direction="All", counterparty="", min_amount=None, max_amount=None,
+                   account=""):
+        self._account = account.lower()
+        self._direction = direction
+        self._counterparty = counterparty.strip().lower()
+        self._min_amount = min_amount
+        self._max_amount = max_amount
+        self._rebuild(refilter=True)
+
+    def _accepts(self, tx):
+        account = tx["account"]
+        if self._account and account != self._account:
+            return False
+        outgoing = tx["from"].lower() == account
+        to = (tx["to"] or "").lower()
+        if self._direction == "Incoming" and to != account:
+            return False
+        if self._direction == "Outgoing" and not outgoing:
+            return False
+        if self._counterparty:
+            counterparty = to if outgoing else tx["from"].lower()
+            if self._counterparty not in counterparty:
+                return False
+        if self._min_amount is not None and tx["value"] < self._min_amount:
+            return False
+        if self._max_amount is not None and tx["value"] > self._max_amount:
+            return False
+        return True
+
+    def _sort_key(self, column):
+        if column == 0:
+            return lambda i: self._rows[i]["blockNumber"]
+        if column == 1:
+            return lambda i: self._rows[i]["from"].lower()
+        if column == 2:
+            return lambda i: (self._rows[i]["to"] or "").lower()
+        if column == 3:
+            return lambda i: self._rows[i]["value"]
+        if column == 4:
+            return lambda i: self._rows[i]["hash"]
+        return lambda i: self.accounts.get(self._rows[i]["account"], "").lower()
+
+    def _rebuild(self, refilter):
+        self.beginResetModel()
+        if refilter:
+            self._view = [i for i, tx in enumerate(self._rows) if self._accepts(tx)]
+        # Sort from the arrival order so ties keep block order.
+        self._view.sort()
+        if not (self._sort_column == 0 and self._sort_order == QtCore.Qt.AscendingOrder):
+            self._view.sort(key=self._sort_key(self._sort_column),
+                            reverse=self._sort_order == QtCore.Qt.DescendingOrder)
+        self._loaded = min(len(self._view), HISTORY_FETCH_ROWS)
+        self.endResetModel()
+
+def _parse_amount(text: str):
+    try:
+        return Decimal(text) if text.strip() else None
+    except InvalidOperation:
+        return None
+
+class HistoryDialog(QtWidgets.QDialog):
+    full_scan_requested = QtCore.pyqtSignal(int)
+    export_requested = QtCore.pyqtSignal(str, str)
+    EXPORT_FILTERS = {"CSV (*.csv)": "csv", "JSON Lines (*.jsonl)": "jsonl",
+                      "Parquet (*.parquet)": "parquet"}
+
+    def __init__(self, accounts, parent=None):
+        super().__init__(parent)
+        self.labels = {account["address"].lower(): account["label"] for account in accounts}
+        self.setWindowTitle("Transaction History")
+        self.resize(500, 400)
+        layout = QtWidgets.QVBoxLayout(self)
+
+        filter_layout = QtWidgets.QHBoxLayout()
+        self.account_combo = QtWidgets.QComboBox()
+        self.account_combo.addItem("All accounts", "")
+        for account in accounts:
+            self.account_combo.addItem(account["label"], account["address"])
+        self.account_combo.setVisible(len(accounts) > 1)
+        filter_layout.addWidget(self.account_combo)
+        self.direction_combo = QtWidgets.QComboBox()
+        self.direction_combo.addItems(HistoryTableModel.DIRECTIONS)
+        self.counterparty_edit = QtWidgets.QLineEdit()
+        self.counterparty_edit.setPlaceholderText("Counterparty")
+        self.min_amount_edit = QtWidgets.QLineEdit()
+        self.min_amount_edit.setPlaceholderText("Min amount")
+        self.max_amount_edit = QtWidgets.QLineEdit()
+        self.max_amount_edit.setPlaceholderText("Max amount")
+        for widget in [self.direction_combo, self.counterparty_edit,
+                       self.min_amount_edit, self.max_amount_edit]:
+            filter_layout.addWidget(widget)
+        layout.addLayout(filter_layout)
+
+        self.model = HistoryTableModel({account["address"].lower(): account["label"]
+                                        for account in accounts}, self)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, QtCore.Qt.AscendingOrder)
+        self.table.setColumnHidden(len(HistoryTableModel.HEADERS) - 1, len(accounts) == 1)
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        # Size columns from a sample of rows rather than every row.
+        self.table.horizontalHeader().setResizeContentsPrecision(HISTORY_WIDTH_SAMPLE_ROWS)
+        layout.addWidget(self.table)
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 0)  # busy indicator until the block count is known
+        layout.addWidget(self.progress_bar)
+        self.status_label = QtWidgets.QLabel("Scanning blocks...")
+        layout.addWidget(self.status_label)
+        button_layout = QtWidgets.QHBoxLayout()
+        self.full_scan_btn = QtWidgets.QPushButton("Scan Older Blocks...")
+        self.full_scan_btn.setToolTip("Index the history below the scanned range, back to genesis "
+                                      "or a given block")
+        self.full_scan_btn.setEnabled(False)
+        self.full_scan_btn.clicked.connect(self.request_full_scan)
+        self.export_btn = QtWidgets.QPushButton("Export...")
+        self.export_btn.setToolTip("Write the indexed history of every account with running "
+                                   "balances and fee totals to a CSV, JSONL or Parquet file")
+        self.export_btn.setEnabled(False)
+        self.export_btn.clicked.connect(self.request_export)
+        btn_close = QtWidgets.QPushButton("Close")
+        btn_close.clicked.connect(self.accept)
+        button_layout.addWidget(self.full_scan_btn)
+        button_layout.addWidget(self.export_btn)
+        button_layout.addWidget(btn_close)
+        layout.addLayout(button_layout)
+
+        self.account_combo.currentIndexChanged.connect(self.apply_filter)
+        self.direction_combo.currentIndexChanged.connect(self.apply_filter)
+        self.counterparty_edit.textChanged.connect(self.apply_filter)
+        self.min_amount_edit.textChanged.connect(self.apply_filter)
+        self.max_amount_edit.textChanged.connect(self.apply_filter)
+        self.columns_sized = False
+
+    def add_transactions(self, transactions):
+        self.model.append(transactions)
+        if not self.columns_sized and self.model.rowCount():
+            self.table.resizeColumnsToContents()
+            self.columns_sized = True
+
+    def apply_filter(self):
+        self.model.set_filter(self.direction_combo.currentText(),
+                              self.counterparty_edit.text(),
+                              _parse_amount(self.min_amount_edit.text()),
+                              _parse_amount(self.max_amount_edit.text()),
+                              self.account_combo.currentData())
+
+    def set_progress(self, done, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done if total else 1)
+        self.status_label.setText(f"Scanned {done} of {total} new blocks")
+
+    def scan_finished(self):
+        self.progress_bar.hide()
+        self.status_label.setText(f"{self.model.total_count()} transactions")
+        self.full_scan_btn.setEnabled(True)
+        self.export_btn.setEnabled(True)
+
+    def scan_failed(self, message):
+        self.progress_bar.hide()
+        self.status_label.setText(f"Error loading transaction history: {message}")
+        self.full_scan_btn.setEnabled(True)
+
+    def clear(self):
+        self.model.clear()
+        self.columns_sized = False
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.show()
+        self.status_label.setText("Scanning blocks...")
+        self.full_scan_btn.setEnabled(False)
+        self.export_btn.setEnabled(False)
+
+    def request_full_scan(self):
+        from_block, ok = QtWidgets.QInputDialog.getInt(
+            self, "Scan Older Blocks", "Scan from block (an interrupted scan from the same\n"
+                                       "block resumes where it stopped):", 0, 0)
+        if not ok:
+            return
+        self.full_scan_btn.setEnabled(False)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.show()
+        self.status_label.setText("Starting full scan...")
+        self.full_scan_requested.emit(from_block)
+
+    def request_export(self):
+        path, selected = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export History", "r5-history.csv", ";;".join(self.EXPORT_FILTERS))
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += "." + self.EXPORT_FILTERS.get(selected, "csv")
+        try:
+            fmt = export_format(path)
+        except ExportError as e:
+            QtWidgets.QMessageBox.warning(self, "Export", str(e))
+            return
+        self.export_btn.setEnabled(False)
+        self.status_label.setText(f"Exporting to {path}...")
+        self.export_requested.emit(path, fmt)
+
+    def export_finished(self, summary):
+        self.export_btn.setEnabled(True)
+        self.status_label.setText("Exported " + "; ".join(
+            f"{self.labels[address]}: {totals['rows']} transactions, "
+            f"fees {format_ether(totals['fees'])} R5"
+            + (f" ({totals['fees_missing']} unknown)" if totals["fees_missing"] else "")
+            for address, totals in summary.items()))
+
+    def export_failed(self, message):
+        self.export_btn.setEnabled(True)
+        self.status_label.setText(f"Export failed: {message}")
+
+    def set_full_scan_progress(self, progress):
+        if progress["status"] == "waiting":
+            self.status_label.setText(f"Full scan waiting for the node: {progress['error']}")
+            return
+        if progress["status"] == "stopped":
+            self.progress_bar.hide()
+            self.status_label.setText(f"Full scan stopped at block {progress['next_block']}; "
+                                      "scan again from the same block to resume")
+            self.full_scan_btn.setEnabled(True)
+            return
+        self.progress_bar.setRange(0, max(progress["blocks_total"], 1))
+        self.progress_bar.setValue(progress["blocks_done"] if progress["blocks_total"] else 1)
+        speed = progress["blocks_per_second"]
+        self.status_label.setText(
+            f"Full scan: {progress['blocks_done']:,} of {progress['blocks_total']:,} blocks"
+            + (f", {speed:,.0f} blocks/s, ETA {format_eta(progress['eta'])}" if speed else "")
+            + f", {progress['transactions']} transactions found")
+
+# -------------------------------
+# Accounts Dialog
+# -------------------------------
+class AccountsDialog(QtWidgets.QDialog):
+    """The wallet's own account and the watch-only ones, with balances from
+    the window's latest refresh. Changes are saved to the settings file and
+    reported through accounts_changed."""
+    accounts_changed = QtCore.pyqtSignal()
+
+    HEADERS = ["Label", "Address", "Type", "Balance"]
+
+    def __init__(self, settings, address, state=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Accounts")
+        self.resize(640, 300)
+        self.settings = settings
+        self.address = address
+        self.state = state
+        layout = QtWidgets.QVBoxLayout(self)
+        self.table = QtWidgets.QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        layout.addWidget(self.table)
+        self.total_label = QtWidgets.QLabel("")
+        layout.addWidget(self.total_label)
+
+        button_layout = QtWidgets.QHBoxLayout()
+        btn_add = QtWidgets.QPushButton("Watch Address...")
+        btn_remove = QtWidgets.QPushButton("Remove")
+        btn_close = QtWidgets.QPushButton("Close")
+        for btn in [btn_add, btn_remove, btn_close]:
+            button_layout.addWidget(btn)
+        layout.addLayout(button_layout)
+        btn_add.clicked.connect(self.add_account)
+        btn_remove.clicked.connect(self.remove_account)
+        btn_close.clicked.connect(self.accept)
+        self.populate()
+
+    def populate(self):
+        self.accounts = load_accounts(self.settings, self.address)
+        balances = self.state["balances"] if self.state else {}
+        self.table.setRowCount(len(self.accounts))
+        for row, account in enumerate(self.accounts):
+            balance = balances.get(account["address"])
+            cells = [account["label"], account["address"],
+                     "Watch-only" if account["watch_only"] else "Key",
+                     "..." if balance is None else f"{Web3.from_wei(balance, 'ether'):.4f} R5"]
+            for column, text in enumerate(cells):
+                self.table.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+        if self.state and all(a["address"] in balances for a in self.accounts):
+            total = Web3.from_wei(sum(balances[a["address"]] for a in self.accounts), 'ether')
+            self.total_label.setText(f"Total: {total:.4f} R5 at block {self.state['block_height']}")
+        else:
+            self.total_label.setText("")
+
+    def update_state(self, state):
+        self.state = state
+        self.populate()
+
+    def add_account(self):
+        address, ok = QtWidgets.QInputDialog.getText(self, "Watch Address", "Address:")
+        if not ok or not address.strip():
+            return
+        label, ok = QtWidgets.QInputDialog.getText(self, "Watch Address", "Label (optional):")
+        if not ok:
+            return
+        try:
+            add_watch_account(self.settings, address, label)
+        except (AccountError, OSError) as e:
+            QtWidgets.QMessageBox.warning(self, "Error", str(e))
+            return
+        self.populate()
+        self.accounts_changed.emit()
+
+    def remove_account(self):
+        row = self.table.currentRow()
+        if row < 0 or not self.accounts[row]["watch_only"]:
+            QtWidgets.QMessageBox.warning(self, "Error", "Select a watch-only account to remove.")
+            return
+        try:
+            remove_watch_account(self.settings, self.accounts[row]["address"])
+        except (AccountError, OSError) as e:
+            QtWidgets.QMessageBox.warning(self, "Error", str(e))
+            return
+        self.populate()
+        self.accounts_changed.emit()
+
+# -------------------------------
+# RPC Debug Panel
+# -------------------------------
+class RPCDebugDialog(QtWidgets.QDialog):
+    """Per-method RPC counters and the slowest of the recent calls, read
+    from the provider's metrics every couple of seconds while open."""
+    METHOD_HEADERS = ["Method", "Requests", "Calls", "Errors", "Retries", "Avg ms", "KB in"]
+    CALL_HEADERS = ["Time", "Method", "ms", "Calls", "Bytes out", "Bytes in", "Errors", "Endpoint"]
+
+    def __init__(self, metrics, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("RPC Debug")
+        self.resize(760, 480)
+        self.metrics = metrics
+        layout = QtWidgets.QVBoxLayout(self)
+        self.methods_table = self._table(self.METHOD_HEADERS)
+        self.calls_table = self._table(self.CALL_HEADERS)
+        self.summary_label = QtWidgets.QLabel("")
+        layout.addWidget(QtWidgets.QLabel("Methods:"))
+        layout.addWidget(self.methods_table)
+        layout.addWidget(QtWidgets.QLabel(f"Slowest of the last {metrics.recent.maxlen} requests:"))
+        layout.addWidget(self.calls_table)
+        layout.addWidget(self.summary_label)
+        btn_close = QtWidgets.QPushButton("Close")
+        btn_close.clicked.connect(self.accept)
+        layout.addWidget(btn_close)
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.populate)
+        self.populate()
+
+    def _table(self, headers):
+        table = QtWidgets.QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().hide()
+        return table
+
+    def _fill(self, table, rows):
+        table.setRowCount(len(rows))
+        for row, cells in enumerate(rows):
+            for column, value in enumerate(cells):
+                table.setItem(row, column, QtWidgets.QTableWidgetItem(str(value)))
+        table.resizeColumnsToContents()
+
+    def populate(self):
+        methods = sorted(self.metrics.snapshot().items(), key=lambda item: item[1]["seconds"],
+                         reverse=True)
+        self._fill(self.methods_table, [
+            (method, stats["requests"], stats["calls"], stats["errors"], stats["retries"],
+             f"{stats['seconds'] / stats['requests'] * 1000:.1f}",
+             f"{stats['response_bytes'] / 1024:.1f}") for method, stats in methods])
+        self._fill(self.calls_table, [
+            (time.strftime("%H:%M:%S", time.localtime(call["time"])), call["method"],
+             f"{call['elapsed'] * 1000:.1f}", call["calls"], call["request_bytes"],
+             call["response_bytes"], call["errors"], call["endpoint"] or "all failed")
+            for call in self.metrics.slowest(RPC_DEBUG_SLOWEST)])
+        self.summary_label.setText(self.metrics.summary_line())
+
+    def showEvent(self, event):
+        self.timer.start(RPC_DEBUG_REFRESH_MS)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
 
 # -------------------------------
 # Custom Dialog for Sending Transactions
 # -------------------------------
 class SendTransactionDialog(QtWidgets.QDialog):
-    def __init__(self, w3, wallet, parent=None):
+    """Opens without any RPC call: fees come from the oracle's last refresh
+    (or the state snapshot before the first one) and the gas limit is only
+    estimated after an address is entered, on a GasEstimateWorker thread."""
+    FEE_TIERS = ["Slow", "Normal", "Fast", "Custom"]
+    gas_estimate_requested = QtCore.pyqtSignal(str, object)
+    # (thread, worker) of closed dialogs whose estimate outlived the wait.
+    _finishing = set()
+
+    def __init__(self, w3, wallet, state, fee_oracle, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Send Transaction")
         self.w3 = w3
         self.wallet = wallet
+        self.state = state
+        self.fee_oracle = fee_oracle
         
         layout = QtWidgets.QFormLayout(self)
         
         self.dest_edit = QtWidgets.QLineEdit()
         self.amount_edit = QtWidgets.QLineEdit()
         self.gas_limit_edit = QtWidgets.QLineEdit()
+        self.fee_combo = QtWidgets.QComboBox()
         self.gas_price_edit = QtWidgets.QLineEdit()
         
         # Set default gas values
         default_amount = "0"
-        default_gas = estimate_gas(self.w3, self.wallet, "0x0", 0)
-        default_gas_price = self.w3.eth.gas_price
+        default_gas = self.default_gas = self.fee_oracle.transfer_gas(self.wallet)
+        self.gas_estimate = None  # (dest, amount_wei, gas) of the last worker answer
         
         self.amount_edit.setText(default_amount)
         self.gas_limit_edit.setText(str(default_gas))
-        self.gas_price_edit.setText(str(self.w3.from_wei(default_gas_price, 'gwei')))
+        self.fee_combo.addItems(self.FEE_TIERS)
+        self.fee_combo.setCurrentText(DEFAULT_FEE_TIER.capitalize())
+        self.set_fee_tier()
         
         layout.addRow("Destination Address:", self.dest_edit)
         layout.addRow("Amount (in R5):", self.amount_edit)
         layout.addRow("Gas Limit:", self.gas_limit_edit)
+        layout.addRow("Fee:", self.fee_combo)
         layout.addRow("Gas Price (gwei):", self.gas_price_edit)
         
         btn_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
         btn_box.accepted.connect(self.accept)
         btn_box.rejected.connect(self.reject)
         layout.addRow(btn_box)
+
+        self.gas_limit_edited = False
+        self.gas_limit_edit.textEdited.connect(lambda _: setattr(self, "gas_limit_edited", True))
+        self.dest_edit.editingFinished.connect(self.estimate_gas_limit)
+        self.amount_edit.editingFinished.connect(self.estimate_gas_limit)
+        self.fee_combo.activated.connect(self.set_fee_tier)
+        self.gas_price_edit.textEdited.connect(lambda _: self.fee_combo.setCurrentText("Custom"))
+
+        self.gas_thread = QtCore.QThread(self)
+        self.gas_worker = GasEstimateWorker(self.wallet, self.fee_oracle)
+        self.gas_worker.moveToThread(self.gas_thread)
+        self.gas_estimate_requested.connect(self.gas_worker.estimate)
+        self.gas_worker.estimated.connect(self.gas_estimated)
+        self.finished.connect(self.stop_gas_estimates)
+        self.gas_thread.start()
+
+    def tier_gas_price(self, tier=DEFAULT_FEE_TIER):
+        suggestion = self.fee_oracle.suggestion(tier)
+        return suggestion["gas_price"] if suggestion else self.state["gas_price"]
+
+    def set_fee_tier(self):
+        tier = self.fee_combo.currentText().lower()
+        if tier in FEE_TIERS:
+            self.gas_price_edit.setText(str(self.w3.from_wei(self.tier_gas_price(tier), 'gwei')))
+
+    def amount_wei(self):
+        try:
+            return self.w3.to_wei(float(self.amount_edit.text()), 'ether')
+        except Exception:
+            return 0
+
+    def estimate_gas_limit(self):
+        dest = self.dest_edit.text().strip()
+        if self.gas_limit_edited or not Web3.is_address(dest):
+            return
+        self.gas_estimate_requested.emit(dest, self.amount_wei())
+
+    def gas_estimated(self, dest, amount_wei, gas):
+        self.gas_estimate = (dest, amount_wei, gas)
+        # An answer for an earlier destination or amount is stale by now.
+        if self.gas_limit_edited or (dest, amount_wei) != (self.dest_edit.text().strip(),
+                                                           self.amount_wei()):
+            return
+        self.gas_limit_edit.setText(str(gas))
+
+    def stop_gas_estimates(self):
+        self.gas_worker.estimated.disconnect(self.gas_estimated)
+        self.gas_thread.quit()
+        if self.gas_thread.wait(2000):
+            return
+        # An estimate is stuck on the node. Rather than hold the dialog, keep
+        # the thread and worker alive until it ends; destroying a running
+        # QThread would abort the process.
+        pair = (self.gas_thread, self.gas_worker)
+        self.gas_thread.setParent(None)
+        SendTransactionDialog._finishing.add(pair)
+        self.gas_thread.finished.connect(
+            lambda: (pair[0].wait(), SendTransactionDialog._finishing.discard(pair)))
     
     def get_data(self):
         dest = self.dest_edit.text().strip()
@@ -313,15 +1007,30 @@ class SendTransactionDialog(QtWidgets.QDialog):
         try:
             gas_limit = int(self.gas_limit_edit.text())
         except Exception:
-            gas_limit = estimate_gas(self.w3, self.wallet, dest, self.w3.to_wei(amount, 'ether'))
+            # No RPC here: the worker's answer for this transfer if there is
+            # one, else the default the dialog opened with.
+            estimate = self.gas_estimate
+            gas_limit = (estimate[2] if estimate and estimate[:2] == (dest, self.amount_wei())
+                         else self.default_gas)
         try:
             gas_price = self.w3.to_wei(float(self.gas_price_edit.text()), 'gwei')
         except Exception:
-            gas_price = self.w3.eth.gas_price
+            gas_price = self.tier_gas_price()
         return dest, amount, gas_limit, gas_price
 
-def send_transaction(w3: Web3, wallet: dict, parent):
-    dlg = SendTransactionDialog(w3, wallet, parent)
+def send_transaction(w3: Web3, wallet: dict, parent, submit, state=None, fee_oracle=None):
+    """Collect and confirm a transfer, then hand the unsigned transaction to
+    submit (the tracker picks the nonce, signs and broadcasts). state is the
+    latest fetch_wallet_state snapshot; one is fetched if none is given."""
+    if fee_oracle is None:
+        fee_oracle = FeeOracle(w3)
+    if state is None:
+        try:
+            state = fetch_wallet_state(w3, get_wallet_address(wallet, w3))
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(parent, "Error", f"Error fetching wallet state: {e}")
+            return
+    dlg = SendTransactionDialog(w3, wallet, state, fee_oracle, parent)
     if dlg.exec_() != QtWidgets.QDialog.Accepted:
         return
     
@@ -330,52 +1039,44 @@ def send_transaction(w3: Web3, wallet: dict, parent):
         QtWidgets.QMessageBox.warning(parent, "Error", "Destination address is required.")
         return
     amount_wei = w3.to_wei(amount, 'ether')
-    sender = get_wallet_address(wallet, w3)
+    sender = state["address"]
+    if amount_wei + gas_limit * gas_price > state["balance_wei"]:
+        QtWidgets.QMessageBox.warning(parent, "Error",
+                                      f"Insufficient funds: balance at block {state['block_height']} "
+                                      f"is {state['balance']:.4f} R5.")
+        return
     
     msg = (f"From: {sender}\nTo: {dest}\nAmount: {amount} R5\n"
-           f"Gas Limit: {gas_limit}\nGas Price: {w3.from_wei(gas_price, 'gwei'):.0f} gwei")
+           f"Gas Limit: {gas_limit}\nGas Price: {w3.from_wei(gas_price, 'gwei')} gwei")
     confirm = QtWidgets.QMessageBox.question(parent, "Confirm Transaction", msg,
                                              QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
     if confirm != QtWidgets.QMessageBox.Yes:
         return
 
-    try:
-        nonce = w3.eth.get_transaction_count(sender)
-    except Exception as e:
-        QtWidgets.QMessageBox.warning(parent, "Error", f"Error fetching nonce: {e}")
-        return
     tx = {
-        "nonce": nonce,
         "to": dest,
         "value": amount_wei,
         "gas": gas_limit,
         "gasPrice": gas_price,
+        "chainId": state["chain_id"],
     }
-    try:
-        signed_tx = w3.eth.account.sign_transaction(tx, wallet["private_key"])
-    except Exception as e:
-        QtWidgets.QMessageBox.warning(parent, "Error", f"Error signing transaction: {e}")
+    if not ensure_unlocked(wallet, parent):
         return
-    try:
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=1200)
-        QtWidgets.QMessageBox.information(parent, "Success", f"Transaction mined!\nReceipt:\n{Web3.to_hex(tx_hash)}")
-    except Exception as e:
-        QtWidgets.QMessageBox.warning(parent, "Error", f"Error sending transaction: {e}")
+    submit(tx)
 
-def expose_private_key(wallet: dict, parent):
+def expose_private_key(session: WalletSession, parent):
     entered_password = prompt_for_password(parent, "Enter password to expose private key")
     if entered_password is None:
         return
-    try:
-        with open(WALLET_FILENAME, "r") as f:
-            file_data = json.load(f)
-        _ = decrypt_wallet(file_data, entered_password)
-        QtWidgets.QMessageBox.information(parent, "Private Key", f"Your Private Key:\n{wallet['private_key']}")
-    except Exception:
+    if session.verify_password(entered_password):
+        message = f"Your Private Key:\n{session['private_key']}"
+        if session.get("mnemonic"):
+            message += f"\n\nYour Seed Phrase ({session['hd_path']}):\n{session['mnemonic']}"
+        QtWidgets.QMessageBox.information(parent, "Private Key", message)
+    else:
         QtWidgets.QMessageBox.warning(parent, "Error", "Incorrect password or error decrypting wallet.")
 
-def reset_wallet(parent):
+def reset_wallet(session: WalletSession, parent):
     reply = QtWidgets.QMessageBox.question(parent, "Reset Wallet",
                 "THIS WILL DELETE THE EXISTING WALLET FROM THE SYSTEM, MAKING IT UNACCESSIBLE FOREVER!\nAre you sure?",
                 QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
@@ -384,20 +1085,21 @@ def reset_wallet(parent):
     entered_password = prompt_for_password(parent, "Enter password to confirm wallet reset")
     if entered_password is None:
         return
-    try:
-        with open(WALLET_FILENAME, "r") as f:
-            file_data = json.load(f)
-        _ = decrypt_wallet(file_data, entered_password)
+    if session.verify_password(entered_password):
+        session.lock()
         os.remove(WALLET_FILENAME)
         QtWidgets.QMessageBox.information(parent, "Wallet Reset", "Wallet has been reset. Restart the application.")
         sys.exit(0)
-    except Exception:
+    else:
         QtWidgets.QMessageBox.warning(parent, "Error", "Incorrect password or error decrypting wallet.")
 
 # -------------------------------
 # Main UI Window
 # -------------------------------
 class WalletWindow(QtWidgets.QMainWindow):
+    refresh_requested = QtCore.pyqtSignal(bool)
+    transaction_submitted = QtCore.pyqtSignal(dict)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("R5 Wallet")
@@ -425,14 +1127,24 @@ class WalletWindow(QtWidgets.QMainWindow):
         self.address_row_layout.addStretch()
 
         self.rpc_label = QtWidgets.QLabel("Loading...")
+        self.rpc_debug_btn = QtWidgets.QPushButton("Debug")
+        self.rpc_debug_btn.setToolTip("RPC call counts, latency and the slowest recent calls")
+        self.rpc_row_layout = QtWidgets.QHBoxLayout()
+        self.rpc_row_layout.addWidget(self.rpc_label)
+        self.rpc_row_layout.addWidget(self.rpc_debug_btn)
+        self.rpc_row_layout.addStretch()
         self.block_height_label = QtWidgets.QLabel("Loading...")
         self.balance_label = QtWidgets.QLabel("Loading...")
+        self.nonce_label = QtWidgets.QLabel("Loading...")
+        self.portfolio_label = QtWidgets.QLabel("")
         self.query_interval_label = QtWidgets.QLabel("Loading...")
         
         self.info_layout.addRow("Address:", self.address_row_layout)
-        self.info_layout.addRow("RPC URL:", self.rpc_label)
+        self.info_layout.addRow("RPC URL:", self.rpc_row_layout)
         self.info_layout.addRow("Block Height:", self.block_height_label)
         self.info_layout.addRow("Available Balance:", self.balance_label)
+        self.info_layout.addRow("Nonce:", self.nonce_label)
+        self.info_layout.addRow("Portfolio:", self.portfolio_label)
         self.info_layout.addRow("Query Interval:", self.query_interval_label)
         
         self.v_layout.addLayout(self.info_layout)
@@ -441,116 +1153,284 @@ class WalletWindow(QtWidgets.QMainWindow):
         self.send_tx_btn = QtWidgets.QPushButton("Send Transaction")
         self.refresh_btn = QtWidgets.QPushButton("Refresh Wallet")
         self.history_btn = QtWidgets.QPushButton("Transaction History")
+        self.accounts_btn = QtWidgets.QPushButton("Accounts")
         self.expose_pk_btn = QtWidgets.QPushButton("Expose Private Key")
         self.reset_btn = QtWidgets.QPushButton("Reset Wallet")
         self.exit_btn = QtWidgets.QPushButton("Exit")
         
-        for btn in [self.send_tx_btn, self.refresh_btn, self.history_btn,
+        for btn in [self.send_tx_btn, self.refresh_btn, self.history_btn, self.accounts_btn,
                     self.expose_pk_btn, self.reset_btn, self.exit_btn]:
             self.button_layout.addWidget(btn)
         
         self.v_layout.addLayout(self.button_layout)
         
-        self.original_history_text = self.history_btn.text()
-        self.loading_timer = QtCore.QTimer(self)
-        self.loading_timer.timeout.connect(self.update_loading_text)
-        self.loading_texts = ["loading", "loading.", "loading..", "loading..."]
-        self.loading_index = 0
-        
         self.send_tx_btn.clicked.connect(self.send_transaction)
-        self.refresh_btn.clicked.connect(self.refresh_wallet)
+        self.refresh_btn.clicked.connect(lambda: self.refresh_wallet(force=True))
         self.history_btn.clicked.connect(self.show_history_async)
+        self.accounts_btn.clicked.connect(self.show_accounts)
         self.expose_pk_btn.clicked.connect(self.expose_private_key)
         self.reset_btn.clicked.connect(self.reset_wallet)
         self.exit_btn.clicked.connect(self.close)
         self.copy_btn.clicked.connect(self.copy_address_to_clipboard)
+        self.rpc_debug_btn.clicked.connect(self.show_rpc_debug)
 
         self.settings = load_settings()
-        self.rpc_address = self.settings.get("rpc_address", DEFAULT_RPC_ADDRESS)
+        self.rpc_addresses = rpc_addresses(self.settings)
+        self.rpc_address = ", ".join(self.rpc_addresses)
         try:
             self.query_interval = int(self.settings.get("query_interval", DEFAULT_QUERY_INTERVAL))
         except Exception:
             self.query_interval = DEFAULT_QUERY_INTERVAL
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_address))
+        self.history_batch_size = int_setting(self.settings, "history_batch_size",
+                                              DEFAULT_HISTORY_BATCH_SIZE)
+        self.history_concurrency = int_setting(self.settings, "history_concurrency",
+                                               DEFAULT_HISTORY_CONCURRENCY)
+        try:
+            self.history_lookback = int(self.settings.get("history_lookback", DEFAULT_HISTORY_LOOKBACK))
+        except Exception:
+            self.history_lookback = DEFAULT_HISTORY_LOOKBACK
+        self.w3, self.rpc_cache = connect(self.settings, self.history_concurrency)
         if not self.w3.is_connected():
             QtWidgets.QMessageBox.critical(self, "Error", f"Unable to connect to RPC at {self.rpc_address}")
             sys.exit(1)
         
         self.rpc_label.setText(self.rpc_address)
         self.query_interval_label.setText(str(self.query_interval))
+        self.rpc_debug_dialog = None
+        metrics_interval = int_setting(self.settings, "metrics_log_interval",
+                                       DEFAULT_METRICS_LOG_INTERVAL)
+        if metrics_interval > 0:
+            self.metrics_timer = QtCore.QTimer(self)
+            self.metrics_timer.timeout.connect(
+                lambda: print(self.w3.provider.metrics.summary_line(), file=sys.stderr, flush=True))
+            self.metrics_timer.start(metrics_interval * 1000)
         
-        self.wallet = wallet_setup(self)
-        if self.wallet is None:
+        self.session_timeout = int_setting(self.settings, "session_timeout", DEFAULT_SESSION_TIMEOUT)
+        self.kdf = kdf_setting(self.settings)
+        self.kdf_target_ms = int_setting(self.settings, "kdf_target_ms", DEFAULT_KDF_TARGET_MS)
+        self.session = wallet_setup(self, self.session_timeout, self.kdf, self.kdf_target_ms)
+        if self.session is None:
             sys.exit(1)
+        self.idle_timer = QtCore.QTimer(self)
+        self.idle_timer.timeout.connect(self.session.check_idle)
+        self.idle_timer.start(min(self.session_timeout, 30) * 1000)
         
+        self.wallet_state = None
+        self.accounts_dialog = None
+        self.refresh_pending = False
+        self.refresh_thread = QtCore.QThread(self)
+        self.fee_oracle = FeeOracle(self.w3)
+        self.refresh_worker = RefreshWorker(self.w3, self.session, self.fee_oracle)
+        self.load_accounts()
+        self.refresh_worker.moveToThread(self.refresh_thread)
+        self.refresh_requested.connect(self.refresh_worker.refresh)
+        self.refresh_worker.updated.connect(self.wallet_refreshed)
+        self.refresh_worker.failed.connect(self.wallet_refresh_failed)
+        self.refresh_worker.done.connect(self.wallet_refresh_done)
+        self.refresh_thread.start()
+
+        self.nonce_manager = NonceManager(self.w3, self.session.address)
+        self.tracker_thread = QtCore.QThread(self)
+        self.tracker = TransactionTrackerWorker(self.w3, self.session, self.nonce_manager)
+        self.tracker.moveToThread(self.tracker_thread)
+        self.tracker_thread.started.connect(self.tracker.start)
+        self.transaction_submitted.connect(self.tracker.submit)
+        self.tracker.status_changed.connect(self.transaction_status)
+        self.tracker_thread.start()
+
+        # Polling stays on as a fallback; a tick that finds the head where it
+        # was only costs one eth_blockNumber call.
         self.timer = QtCore.QTimer(self)
         self.timer.timeout.connect(self.refresh_wallet)
         self.timer.start(self.query_interval * 1000)
-        self.refresh_wallet()
-    
-    def update_loading_text(self):
-        self.history_btn.setText(self.loading_texts[self.loading_index])
-        self.loading_index = (self.loading_index + 1) % len(self.loading_texts)
+
+        self.head_subscriber = None
+        self.ws_address = self.settings.get("ws_address", "").strip()
+        if self.ws_address:
+            self.head_thread = QtCore.QThread(self)
+            self.head_subscriber = HeadSubscriber(self.ws_address)
+            self.head_subscriber.moveToThread(self.head_thread)
+            self.head_thread.started.connect(self.head_subscriber.run)
+            self.head_subscriber.new_head.connect(lambda _: self.refresh_wallet())
+            self.head_thread.start()
+        self.refresh_wallet(force=True)
     
-    def refresh_wallet(self):
-        block_height = fetch_block_height(self.w3)
-        balance = fetch_balance(self.w3, self.wallet)
-        address = get_wallet_address(self.wallet, self.w3)
-        self.block_height_label.setText(str(block_height))
-        self.balance_label.setText(f"{balance:.4f} R5")
-        self.address_label.setText(address)
+    def refresh_wallet(self, force=False):
+        # Skip ticks while the node is still answering the previous one.
+        if self.refresh_pending and not force:
+            return
+        self.refresh_pending = True
+        self.refresh_requested.emit(force)
+
+    def wallet_refreshed(self, state):
+        stats = self.rpc_cache.stats()
+        self.rpc_label.setToolTip(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+                                  f"{stats['entries']} entries")
+        self.address_label.setText(state["address"])
+        self.block_height_label.setText(str(state["block_height"]))
+        self.balance_label.setText(f"{state['balance']:.4f} R5")
+        self.nonce_label.setText(str(state["nonce"]))
+        balances = state["balances"]
+        if len(self.accounts) > 1 and all(a["address"] in balances for a in self.accounts):
+            total = Web3.from_wei(sum(balances[a["address"]] for a in self.accounts), 'ether')
+            self.portfolio_label.setText(f"{total:.4f} R5 across {len(self.accounts)} accounts")
+        else:
+            self.portfolio_label.setText("")
+        self.wallet_state = state
+        if self.accounts_dialog is not None:
+            self.accounts_dialog.update_state(state)
+
+    def load_accounts(self):
+        self.accounts = load_accounts(self.settings, self.session.address)
+        self.refresh_worker.watch = tuple(a["address"] for a in self.accounts if a["watch_only"])
+
+    def accounts_changed(self):
+        self.load_accounts()
+        self.refresh_wallet(force=True)
+
+    def show_accounts(self):
+        if self.accounts_dialog is None:
+            self.accounts_dialog = AccountsDialog(self.settings, self.session.address,
+                                                  self.wallet_state, self)
+            self.accounts_dialog.accounts_changed.connect(self.accounts_changed)
+        self.accounts_dialog.show()
+        self.accounts_dialog.raise_()
+
+    def show_rpc_debug(self):
+        if self.rpc_debug_dialog is None:
+            self.rpc_debug_dialog = RPCDebugDialog(self.w3.provider.metrics, self)
+        self.rpc_debug_dialog.populate()
+        self.rpc_debug_dialog.show()
+        self.rpc_debug_dialog.raise_()
+
+    def wallet_refresh_failed(self, message):
+        self.statusBar().showMessage(f"Refresh failed: {message}", 10000)
+
+    def wallet_refresh_done(self):
+        self.refresh_pending = False
+
+    def closeEvent(self, event):
+        if self.head_subscriber is not None:
+            self.head_subscriber.stop()
+            self.head_thread.quit()
+            self.head_thread.wait(2000)
+        self.refresh_thread.quit()
+        self.refresh_thread.wait(2000)
+        QtCore.QMetaObject.invokeMethod(self.tracker, "stop", QtCore.Qt.BlockingQueuedConnection)
+        self.tracker_thread.quit()
+        self.tracker_thread.wait(2000)
+        super().closeEvent(event)
     
     def send_transaction(self):
-        send_transaction(self.w3, self.wallet, self)
-        self.refresh_wallet()
+        send_transaction(self.w3, self.session, self, self.transaction_submitted.emit,
+                         self.wallet_state, self.fee_oracle)
+
+    def transaction_status(self, tx_hash, status, details):
+        if status == "pending":
+            self.statusBar().showMessage(f"Transaction {tx_hash} pending (nonce {details['nonce']})")
+            self.refresh_wallet(force=True)
+            return
+        self.statusBar().clearMessage()
+        if status == "mined":
+            QtWidgets.QMessageBox.information(self, "Success", f"Transaction mined!\nReceipt:\n{tx_hash}")
+        elif status == "failed" and not tx_hash:
+            QtWidgets.QMessageBox.warning(self, "Error", details["error"])
+        elif status == "failed":
+            QtWidgets.QMessageBox.warning(self, "Error", f"Transaction reverted in block "
+                                                         f"{details['blockNumber']}:\n{tx_hash}")
+        else:
+            QtWidgets.QMessageBox.warning(self, "Error", f"Transaction {status}:\n{tx_hash}\n"
+                                                         f"{details.get('error', '')}")
+        self.refresh_wallet(force=True)
     
     def show_history_async(self):
         self.history_btn.setEnabled(False)
-        self.loading_index = 0
-        self.loading_timer.start(500)
-        QtWidgets.QApplication.processEvents()
-        
+        self.history_dialog = HistoryDialog(self.accounts, self)
+        self.history_dialog.full_scan_requested.connect(self.start_full_scan)
+        self.history_dialog.export_requested.connect(self.start_export)
+        self.history_dialog.finished.connect(self.cancel_history_scan)
+        self.scan_worker = None
+        self.history_scans = 0
+        self.start_history_scan()
+        self.history_dialog.show()
+
+    def start_history_scan(self):
+        self.history_scans += 1
         self.thread = QtCore.QThread()
-        self.worker = HistoryWorker(self.w3, self.wallet)
+        self.worker = HistoryWorker(self.w3, [a["address"] for a in self.accounts],
+                                    self.history_batch_size, self.history_concurrency,
+                                    self.history_lookback)
         self.worker.moveToThread(self.thread)
         self.thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.display_history)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker.transactions_found.connect(self.history_dialog.add_transactions)
+        self.worker.progress.connect(self.history_dialog.set_progress)
+        self.worker.finished.connect(self.history_dialog.scan_finished)
+        self.worker.failed.connect(self.history_dialog.scan_failed)
+        for done_signal in (self.worker.finished, self.worker.failed):
+            done_signal.connect(self.thread.quit)
+            done_signal.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
+        self.thread.finished.connect(self.history_scan_stopped)
         self.thread.start()
-    
-    def display_history(self, transactions):
-        self.loading_timer.stop()
-        self.history_btn.setText(self.original_history_text)
-        self.history_btn.setEnabled(True)
-
-        dlg = QtWidgets.QDialog(self)
-        dlg.setWindowTitle("Transaction History")
-        dlg.resize(500, 400)
-        layout = QtWidgets.QVBoxLayout(dlg)
-        table = QtWidgets.QTableWidget()
-        table.setColumnCount(5)
-        table.setHorizontalHeaderLabels(["Block", "From", "To", "Amount", "Tx Hash"])
-        table.setRowCount(len(transactions))
-        for i, tx in enumerate(transactions):
-            table.setItem(i, 0, QtWidgets.QTableWidgetItem(str(tx["blockNumber"])))
-            table.setItem(i, 1, QtWidgets.QTableWidgetItem(tx["from"]))
-            table.setItem(i, 2, QtWidgets.QTableWidgetItem(tx["to"] or ""))
-            table.setItem(i, 3, QtWidgets.QTableWidgetItem(str(tx["value"])))
-            table.setItem(i, 4, QtWidgets.QTableWidgetItem(tx["hash"]))
-        table.resizeColumnsToContents()
-        layout.addWidget(table)
-        btn_close = QtWidgets.QPushButton("Close")
-        btn_close.clicked.connect(dlg.accept)
-        layout.addWidget(btn_close)
-        dlg.exec_()
+
+    def start_full_scan(self, from_block):
+        self.history_scans += 1
+        self.scan_thread = QtCore.QThread()
+        self.scan_worker = ChainScanWorker(
+            self.w3, [a["address"] for a in self.accounts], from_block,
+            int_setting(self.settings, "history_scan_rate", DEFAULT_HISTORY_SCAN_RATE),
+            int_setting(self.settings, "history_scan_window", DEFAULT_HISTORY_SCAN_WINDOW),
+            self.history_batch_size, self.history_concurrency)
+        self.scan_worker.moveToThread(self.scan_thread)
+        self.scan_thread.started.connect(self.scan_worker.run)
+        self.scan_worker.progress.connect(self.history_dialog.set_full_scan_progress)
+        self.scan_worker.finished.connect(self.full_scan_finished)
+        self.scan_worker.failed.connect(self.history_dialog.scan_failed)
+        for done_signal in (self.scan_worker.finished, self.scan_worker.failed):
+            done_signal.connect(self.scan_thread.quit)
+            done_signal.connect(self.scan_worker.deleteLater)
+        self.scan_thread.finished.connect(self.scan_thread.deleteLater)
+        self.scan_thread.finished.connect(self.history_scan_stopped)
+        self.scan_thread.start()
+
+    def start_export(self, path, fmt):
+        self.history_scans += 1
+        self.export_thread = QtCore.QThread()
+        self.export_worker = ExportWorker(self.w3, [a["address"] for a in self.accounts],
+                                          path, fmt, self.history_batch_size)
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.finished.connect(self.history_dialog.export_finished)
+        self.export_worker.failed.connect(self.history_dialog.export_failed)
+        for done_signal in (self.export_worker.finished, self.export_worker.failed):
+            done_signal.connect(self.export_thread.quit)
+            done_signal.connect(self.export_worker.deleteLater)
+        self.export_thread.finished.connect(self.export_thread.deleteLater)
+        self.export_thread.finished.connect(self.history_scan_stopped)
+        self.export_thread.start()
+
+    def full_scan_finished(self, progress):
+        if progress.get("status") == "done" and self.history_dialog.isVisible():
+            # The older blocks are in the index now; reload the view from it.
+            self.history_dialog.clear()
+            self.start_history_scan()
+
+    def cancel_history_scan(self):
+        self.worker.cancel()
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+
+    def history_scan_stopped(self):
+        # Only allow a new scan once every scan thread has really exited.
+        self.history_scans -= 1
+        if self.history_scans == 0:
+            self.history_btn.setEnabled(True)
 
     def expose_private_key(self):
-        expose_private_key(self.wallet, self)
+        expose_private_key(self.session, self)
 
     def reset_wallet(self):
-        reset_wallet(self)
+        reset_wallet(self.session, self)
 
     def copy_address_to_clipboard(self):
         clipboard = QtWidgets.QApplication.clipboard()
@@ -563,7 +1443,34 @@ class WalletWindow(QtWidgets.QMainWindow):
 # Main function
 # -------------------------------
 def main():
-    app = QtWidgets.QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="R5 Wallet",
+                                     epilog="Headless use: python -m r5wallet --help")
+    parser.add_argument("--benchmark-kdf", action="store_true",
+                        help="print wallet unlock latency per KDF setting and exit")
+    parser.add_argument("--payout", metavar="FILE",
+                        help="send the to,amount rows in a CSV or JSONL file without the GUI")
+    parser.add_argument("--journal", metavar="FILE",
+                        help="payout progress journal (default: FILE.journal); rerun to resume")
+    parser.add_argument("--payout-window", type=int,
+                        help="maximum unconfirmed payout transactions at once")
+    parser.add_argument("--yes", action="store_true", help="do not ask before paying out")
+    args, qt_args = parser.parse_known_args()
+    # Kept for existing scripts; both now live in the Qt-free CLI.
+    if args.payout:
+        from r5wallet.cli import main as cli_main
+        cli_args = ["payout", args.payout]
+        if args.journal:
+            cli_args += ["--journal", args.journal]
+        if args.payout_window:
+            cli_args += ["--window", str(args.payout_window)]
+        if args.yes:
+            cli_args.append("--yes")
+        sys.exit(cli_main(cli_args))
+    if args.benchmark_kdf:
+        from r5wallet.cli import main as cli_main
+        sys.exit(cli_main(["benchmark-kdf"]))
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
     window = WalletWindow()
     window.show()
     sys.exit(app.exec_())
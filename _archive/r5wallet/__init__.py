@@ -0,0 +1,26 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Qt-free R5 wallet core.
+
+Submodules are deliberately not imported here: web3 and eth_account take
+over a second to load, so each entry point imports only what it uses.
+
+    config    constants and wallet.ini settings (stdlib only)
+    keystore  r5.key encryption and WalletSession
+    chain     queries, history scanning, signing, nonces and tracking
+    rpc       endpoint pool, response cache and connect()
+    history   sqlite history index
+    payout    bulk payouts
+    daemon    local JSON API
+    cli       command line entry point (python -m r5wallet)
+"""
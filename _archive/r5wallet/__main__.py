@@ -0,0 +1,5 @@
+import sys
+
+from r5wallet.cli import main
+
+sys.exit(main())
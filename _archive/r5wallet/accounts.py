@@ -0,0 +1,75 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""The accounts the wallet follows: its own key plus watch-only addresses.
+
+Watch-only addresses are kept in the watch_addresses setting as a comma
+separated list of "label:address" or bare "address" entries.
+"""
+
+from web3 import Web3
+
+from r5wallet.config import save_settings
+
+class AccountError(ValueError):
+    pass
+
+def _short(address: str) -> str:
+    return f"{address[:6]}...{address[-4:]}"
+
+def watch_accounts(settings: dict) -> list:
+    accounts = []
+    for entry in settings.get("watch_addresses", "").split(","):
+        label, _, address = entry.strip().rpartition(":")
+        address = address.strip()
+        if not Web3.is_address(address):
+            continue  # hand-edited junk is skipped rather than fatal
+        address = Web3.to_checksum_address(address)
+        accounts.append({"label": label.strip() or _short(address), "address": address,
+                         "watch_only": True})
+    return accounts
+
+def load_accounts(settings: dict, address: str, label: str = "Wallet") -> list:
+    """The wallet's own account first, then the watch-only ones."""
+    accounts = [{"label": label, "address": address, "watch_only": False}]
+    seen = {address.lower()}
+    for account in watch_accounts(settings):
+        if account["address"].lower() not in seen:
+            seen.add(account["address"].lower())
+            accounts.append(account)
+    return accounts
+
+def _store(settings: dict, accounts: list):
+    settings["watch_addresses"] = ", ".join(f"{a['label']}:{a['address']}" for a in accounts)
+    save_settings(settings)
+
+def add_watch_account(settings: dict, address: str, label: str = "") -> dict:
+    address = address.strip()
+    if not Web3.is_address(address):
+        raise AccountError(f"Invalid address {address!r}")
+    label = label.strip()
+    if any(c in label for c in ",:"):
+        raise AccountError("Labels cannot contain ',' or ':'")
+    address = Web3.to_checksum_address(address)
+    accounts = watch_accounts(settings)
+    if any(a["address"] == address for a in accounts):
+        raise AccountError(f"{address} is already watched")
+    account = {"label": label or _short(address), "address": address, "watch_only": True}
+    _store(settings, accounts + [account])
+    return account
+
+def remove_watch_account(settings: dict, address: str):
+    accounts = watch_accounts(settings)
+    remaining = [a for a in accounts if a["address"].lower() != address.strip().lower()]
+    if len(remaining) == len(accounts):
+        raise AccountError(f"{address} is not watched")
+    _store(settings, remaining)
@@ -0,0 +1,384 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Benchmark suite: the wallet's hot paths timed against a mock JSON-RPC node."""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from r5wallet.config import (DEFAULT_BENCH_BLOCKS, DEFAULT_BENCH_TXS_PER_BLOCK, DEFAULT_BENCH_RUNS,
+                             DEFAULT_BENCH_OPERATIONS, DEFAULT_HISTORY_BATCH_SIZE,
+                             DEFAULT_HISTORY_CONCURRENCY, DEFAULT_KDF_TARGET_MS, DEFAULT_FEE_TIER,
+                             int_setting, kdf_setting)
+
+# Fixed so every run scans, matches and signs exactly the same data.
+BENCH_PRIVATE_KEY = "0x" + "42" * 32
+BENCH_ADDRESS = "0x17c5185167401ed00cf5f5b2fc97d9bbfdb7d025"
+BENCH_PASSWORD = "benchmark"
+BENCH_DESTINATION = "0x5e5E5e5e5E5e5E5E5e5E5E5e5e5E5E5E5e5E5E5e"
+BENCHMARKS = ["unlock", "sign", "refresh", "history", "send"]
+
+# -------------------------------
+# Mock JSON-RPC Node
+# -------------------------------
+MOCK_CHAIN_ID = 1337
+MOCK_TIMESTAMP = 1700000000
+MOCK_BLOCK_TIME = 12
+MOCK_GAS_PRICE = 10 ** 9
+MOCK_BALANCE = 10 ** 24
+# The benchmarked wallet sends the first transaction of every tenth block.
+MOCK_WALLET_EVERY = 10
+
+_TX_TEMPLATE = ('{"hash":"0x%064x","from":"%s","to":"0x%040x","value":"0xde0b6b3a7640000",'
+                '"blockNumber":"%s","blockHash":"%s","nonce":"%s","gas":"0x5208",'
+                '"gasPrice":"0x3b9aca00","input":"0x","transactionIndex":"%s","type":"0x0",'
+                '"v":"0x1b","r":"0x1","s":"0x1"}')
+
+def _block_hash(number: int) -> str:
+    return "0x%064x" % (number * 7919 + 1)
+
+class MockNode:
+    """Just enough of an Ethereum node for the wallet: a chain of `blocks`
+    blocks with `txs_per_block` generated transfers each, balances, fees,
+    and a send path that mines every transaction at the head.
+
+    Every HTTP request sleeps latency plus or minus up to jitter seconds,
+    and each JSON-RPC call in it fails with probability error_rate.
+    Responses are built as JSON text, so the node spends as little time as
+    possible on what the client is being timed for."""
+
+    def __init__(self, blocks: int = DEFAULT_BENCH_BLOCKS,
+                 txs_per_block: int = DEFAULT_BENCH_TXS_PER_BLOCK, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0,
+                 address: str = BENCH_ADDRESS, seed: int = 0):
+        self.head = max(blocks, 1) - 1
+        self.txs_per_block = txs_per_block
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.address = address.lower()
+        self.sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.methods = {
+            "web3_clientVersion": lambda params: '"r5wallet-mock/1.0"',
+            "net_version": lambda params: f'"{MOCK_CHAIN_ID}"',
+            "eth_chainId": lambda params: f'"{hex(MOCK_CHAIN_ID)}"',
+            "eth_blockNumber": lambda params: f'"{hex(self.head)}"',
+            "eth_gasPrice": lambda params: f'"{hex(MOCK_GAS_PRICE)}"',
+            "eth_maxPriorityFeePerGas": lambda params: f'"{hex(MOCK_GAS_PRICE // 10)}"',
+            "eth_getBalance": lambda params: f'"{hex(MOCK_BALANCE)}"',
+            "eth_getTransactionCount": self._transaction_count,
+            "eth_estimateGas": lambda params: '"0x5208"',
+            "eth_feeHistory": self._fee_history,
+            "eth_getBlockByNumber": self._block_by_number,
+            "eth_sendRawTransaction": self._send_raw_transaction,
+            "eth_getTransactionReceipt": self._receipt,
+        }
+
+    def _block_number(self, tag) -> int:
+        if tag in ("latest", "pending", "safe", "finalized"):
+            return self.head
+        return 0 if tag == "earliest" else int(tag, 16)
+
+    def _transaction_count(self, params):
+        with self._lock:
+            return f'"{hex(self.sent)}"'
+
+    def _fee_history(self, params):
+        count = int(params[0], 16) if isinstance(params[0], str) else int(params[0])
+        count = min(count, self.head + 1)
+        percentiles = params[2] if len(params) > 2 else []
+        reward = "[%s]" % ",".join(f'"{hex(MOCK_GAS_PRICE // 100 * (i + 1))}"'
+                                   for i in range(len(percentiles)))
+        return ('{"oldestBlock":"%s","baseFeePerGas":[%s],"gasUsedRatio":[%s],"reward":[%s]}'
+                % (hex(self.head - count + 1), ",".join([f'"{hex(MOCK_GAS_PRICE)}"'] * (count + 1)),
+                   ",".join(["0.5"] * count), ",".join([reward] * count)))
+
+    def _block_by_number(self, params):
+        number = self._block_number(params[0])
+        if number > self.head:
+            return "null"
+        number_hex, block_hash = hex(number), _block_hash(number)
+        first = number * self.txs_per_block
+        if params[1]:
+            transactions = [_TX_TEMPLATE % (first + i,
+                                            self.address if i == 0 and number % MOCK_WALLET_EVERY == 0
+                                            else "0x%040x" % (first + i),
+                                            first + i + 1, number_hex, block_hash, hex(i), hex(i))
+                            for i in range(self.txs_per_block)]
+        else:
+            transactions = ['"0x%064x"' % (first + i) for i in range(self.txs_per_block)]
+        return ('{"number":"%s","hash":"%s","parentHash":"%s","timestamp":"%s","miner":"0x%040x",'
+                '"gasUsed":"%s","gasLimit":"0x1c9c380","baseFeePerGas":"%s","difficulty":"0x0",'
+                '"totalDifficulty":"0x0","extraData":"0x","logsBloom":"0x%s","nonce":"0x%016x",'
+                '"sha3Uncles":"%s","mixHash":"%s","stateRoot":"%s","receiptsRoot":"%s",'
+                '"transactionsRoot":"%s","size":"0x100","uncles":[],"transactions":[%s]}'
+                % (number_hex, block_hash, _block_hash(max(number - 1, 0)),
+                   hex(MOCK_TIMESTAMP + number * MOCK_BLOCK_TIME), 0, hex(21000 * self.txs_per_block),
+                   hex(MOCK_GAS_PRICE), "00" * 256, 0, _block_hash(0), _block_hash(0),
+                   _block_hash(0), _block_hash(0), _block_hash(0), ",".join(transactions)))
+
+    def _send_raw_transaction(self, params):
+        with self._lock:
+            self.sent += 1
+        return '"0x%s"' % hashlib.sha256(bytes.fromhex(params[0][2:])).hexdigest()
+
+    def _receipt(self, params):
+        return ('{"transactionHash":"%s","status":"0x1","blockNumber":"%s","blockHash":"%s",'
+                '"transactionIndex":"0x0","from":"%s","to":"%s","gasUsed":"0x5208",'
+                '"cumulativeGasUsed":"0x5208","effectiveGasPrice":"%s","contractAddress":null,'
+                '"logs":[],"logsBloom":"0x%s","type":"0x0"}'
+                % (params[0], hex(self.head), _block_hash(self.head), self.address,
+                   BENCH_DESTINATION, hex(MOCK_GAS_PRICE), "00" * 256))
+
+    def handle(self, request) -> str:
+        """One JSON-RPC call object in, its response as JSON text out."""
+        request_id = json.dumps(request.get("id"))
+        method = self.methods.get(request.get("method"))
+        if method is None:
+            return ('{"jsonrpc":"2.0","id":%s,"error":{"code":-32601,"message":"Method not found"}}'
+                    % request_id)
+        if self.error_rate:
+            with self._lock:
+                failed = self._random.random() < self.error_rate
+            if failed:
+                return ('{"jsonrpc":"2.0","id":%s,"error":{"code":-32000,"message":"injected error"}}'
+                        % request_id)
+        return '{"jsonrpc":"2.0","id":%s,"result":%s}' % (request_id,
+                                                         method(request.get("params") or []))
+
+    def delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def server(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            wbufsize = 65536
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                delay = node.delay()
+                if delay:
+                    time.sleep(delay)
+                if isinstance(body, list):
+                    data = ("[" + ",".join(node.handle(request) for request in body) + "]").encode()
+                else:
+                    data = node.handle(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+def _serve_mock(options: dict, ready):
+    server = MockNode(**options).server()
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+def start_mock_node(**options):
+    """MockNode in a child process, so serving it does not compete with the
+    timed client for the GIL. Returns (process, url); terminate the process
+    when done."""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_mock, args=(options, ready), daemon=True)
+    process.start()
+    port = ready.get(timeout=30)
+    return process, f"http://127.0.0.1:{port}"
+
+# -------------------------------
+# Benchmarks
+# -------------------------------
+def _result(name: str, timings: list, errors: int = 0, unit: str = "ops",
+            per_run: int = 1, **extra) -> dict:
+    """Median, min and max milliseconds per run; throughput is per_run units
+    over the median run."""
+    result = {"name": name, "runs": len(timings), "errors": errors}
+    if timings:
+        median = statistics.median(timings)
+        result.update(median_ms=round(median * 1000, 3), min_ms=round(min(timings) * 1000, 3),
+                      max_ms=round(max(timings) * 1000, 3), unit=unit,
+                      per_second=round(per_run / median, 1) if median else None)
+    result.update(extra)
+    return result
+
+def _rpc_totals(w3) -> dict:
+    methods = w3.provider.metrics.snapshot().values()
+    return {key: sum(stats[key] for stats in methods)
+            for key in ("requests", "calls", "errors", "response_bytes")}
+
+def _rpc_delta(w3, before: dict) -> dict:
+    return {f"rpc_{key}": value - before[key] for key, value in _rpc_totals(w3).items()}
+
+def bench_unlock(file_data: dict, runs: int) -> dict:
+    from r5wallet.keystore import decrypt_wallet, keystore_kdf
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        decrypt_wallet(file_data, BENCH_PASSWORD)
+        timings.append(time.perf_counter() - start)
+    kdf, params = keystore_kdf(file_data)
+    return _result("unlock", timings, unit="unlocks", kdf=kdf, kdf_params=params)
+
+def bench_sign(w3, session, operations: int, runs: int) -> dict:
+    from r5wallet.chain import sign_transaction
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for nonce in range(operations):
+            sign_transaction(w3, session, {"to": BENCH_DESTINATION, "value": 1, "gas": 21000,
+                                           "gasPrice": MOCK_GAS_PRICE, "nonce": nonce,
+                                           "chainId": MOCK_CHAIN_ID})
+        timings.append(time.perf_counter() - start)
+    return _result("sign", timings, unit="tx", per_run=operations, transactions=operations)
+
+def bench_refresh(w3, address: str, operations: int) -> dict:
+    """fetch_wallet_state, the one batch behind every wallet refresh."""
+    from r5wallet.chain import fetch_wallet_state
+    before = _rpc_totals(w3)
+    timings, errors = [], 0
+    for _ in range(operations):
+        start = time.perf_counter()
+        try:
+            fetch_wallet_state(w3, address)
+        except Exception:
+            errors += 1
+            continue
+        timings.append(time.perf_counter() - start)
+    return _result("refresh", timings, errors, unit="refreshes", **_rpc_delta(w3, before))
+
+def bench_history(w3, session, blocks: int, runs: int, batch_size: int, concurrency: int) -> dict:
+    """A full fetch_history scan of the mock chain per run."""
+    from r5wallet.chain import fetch_history
+    before = _rpc_totals(w3)
+    timings, errors, matched = [], 0, 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            matched = len(fetch_history(w3, session, blocks - 1, batch_size, concurrency))
+        except Exception:
+            errors += 1
+            continue
+        timings.append(time.perf_counter() - start)
+    return _result("history", timings, errors, unit="blocks", per_run=blocks, blocks=blocks,
+                   matched=matched, batch_size=batch_size, concurrency=concurrency,
+                   **_rpc_delta(w3, before))
+
+def bench_send(w3, session, operations: int) -> dict:
+    """What wallet_send does per payment: a state snapshot, fee and gas
+    from the oracle, then nonce, signing and broadcast."""
+    from r5wallet.chain import NonceManager, TransactionTracker, fetch_wallet_state
+    from r5wallet.fees import FeeOracle
+    oracle = FeeOracle(w3)
+    tracker = TransactionTracker(w3, session, NonceManager(w3, session.address),
+                                 lambda tx_hash, status, details: None)
+    before = _rpc_totals(w3)
+    timings, errors = [], 0
+    for _ in range(operations):
+        start = time.perf_counter()
+        try:
+            state = fetch_wallet_state(w3, session.address)
+            tiers = oracle.refresh(state["block_height"])
+            tracker.submit({"to": BENCH_DESTINATION, "value": 1,
+                            "gas": oracle.transfer_gas(session, BENCH_DESTINATION, 1),
+                            "gasPrice": tiers[DEFAULT_FEE_TIER]["gas_price"],
+                            "chainId": state["chain_id"]})
+        except Exception:
+            errors += 1
+            continue
+        timings.append(time.perf_counter() - start)
+    return _result("send", timings, errors, unit="tx", **_rpc_delta(w3, before))
+
+def _revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True,
+                              text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(settings: dict, blocks: int = DEFAULT_BENCH_BLOCKS,
+                   txs_per_block: int = DEFAULT_BENCH_TXS_PER_BLOCK, latency: float = 0.0,
+                   jitter: float = 0.0, error_rate: float = 0.0, runs: int = DEFAULT_BENCH_RUNS,
+                   operations: int = DEFAULT_BENCH_OPERATIONS, only=None, seed: int = 0) -> dict:
+    """Start a mock node, run the selected benchmarks (all by default)
+    against it and return one JSON-serializable report. The wallet's KDF,
+    history batch size and concurrency come from settings."""
+    from r5wallet.keystore import WalletSession, calibrate_kdf, encrypt_wallet
+    from r5wallet.rpc import connect
+    selected = only or BENCHMARKS
+    kdf = kdf_setting(settings)
+    file_data = encrypt_wallet({"private_key": BENCH_PRIVATE_KEY[2:], "public_key": ""},
+                               BENCH_PASSWORD, kdf,
+                               calibrate_kdf(kdf, int_setting(settings, "kdf_target_ms",
+                                                              DEFAULT_KDF_TARGET_MS)))
+    batch_size = int_setting(settings, "history_batch_size", DEFAULT_HISTORY_BATCH_SIZE)
+    concurrency = int_setting(settings, "history_concurrency", DEFAULT_HISTORY_CONCURRENCY)
+    process, url = start_mock_node(blocks=blocks, txs_per_block=txs_per_block, latency=latency,
+                                   jitter=jitter, error_rate=error_rate, seed=seed)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            session = WalletSession.unlock_file(file_data, BENCH_PASSWORD,
+                                                path=os.path.join(directory, "r5.key"), kdf=kdf)
+            # A fresh connection per benchmark, so the response cache and the
+            # RPC counters only ever hold that benchmark's own calls.
+            for name in selected:
+                w3, _ = connect({"rpc_address": url, "rpc_cache_file": ""}, concurrency)
+                if name == "unlock":
+                    results.append(bench_unlock(file_data, runs))
+                elif name == "sign":
+                    results.append(bench_sign(w3, session, operations, runs))
+                elif name == "refresh":
+                    results.append(bench_refresh(w3, session.address, operations))
+                elif name == "history":
+                    results.append(bench_history(w3, session, blocks, runs, batch_size,
+                                                 concurrency))
+                elif name == "send":
+                    results.append(bench_send(w3, session, operations))
+    finally:
+        process.terminate()
+        process.join()
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": _revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "node": {"blocks": blocks, "txs_per_block": txs_per_block, "latency": latency,
+                 "jitter": jitter, "error_rate": error_rate, "seed": seed},
+        "runs": runs,
+        "operations": operations,
+        "results": results,
+    }
@@ -0,0 +1,469 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Queries, history scanning, signing and transaction tracking."""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from eth_account import Account
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from r5wallet.config import (DEFAULT_HISTORY_BATCH_SIZE, DEFAULT_HISTORY_CONCURRENCY,
+                             DEFAULT_HISTORY_RETRIES, DEFAULT_TX_TIMEOUT,
+                             TX_POLL_MIN_INTERVAL, TX_POLL_MAX_INTERVAL, TX_DROP_MISSES,
+                             TX_DROP_GRACE)
+
+def get_wallet_address(wallet: dict, w3: Web3) -> str:
+    # Unlocked sessions already know their address.
+    address = getattr(wallet, "address", None)
+    if address:
+        return address
+    try:
+        account = w3.eth.account.from_key(wallet["private_key"])
+        return account.address
+    except Exception:
+        return "Unknown"
+
+def fetch_block_height(w3: Web3) -> int:
+    try:
+        return w3.eth.block_number
+    except Exception:
+        return 0
+
+def fetch_balance(w3: Web3, wallet: dict):
+    address = get_wallet_address(wallet, w3)
+    try:
+        balance_wei = w3.eth.get_balance(address)
+        balance = w3.from_wei(balance_wei, 'ether')
+        return float(balance)
+    except Exception:
+        return 0.0
+
+def fetch_wallet_state(w3: Web3, address: str, block_identifier="latest", watch=()) -> dict:
+    """Block height, balance, nonce, gas price and chain ID in one JSON-RPC
+    batch, with balance and nonce read at the same block_identifier. Pass a
+    block number to pin them to exactly that block; with "latest" the height
+    is the node's head at the time it answered the batch.
+
+    Balances of the watch addresses ride along in the same batch, so
+    "balances" maps every address, the wallet's own included, to wei at one
+    block."""
+    watch = [a for a in watch if a.lower() != address.lower()]
+    with w3.batch_requests() as batch:
+        batch.add(w3.eth.block_number)
+        batch.add(w3.eth.get_balance(address, block_identifier))
+        batch.add(w3.eth.get_transaction_count(address, block_identifier))
+        batch.add(w3.eth.gas_price)
+        batch.add(w3.eth.chain_id)
+        for watched in watch:
+            batch.add(w3.eth.get_balance(watched, block_identifier))
+        results = batch.execute()
+    if len(results) != 5 + len(watch):
+        raise ValueError("Incomplete batch response")
+    head, balance_wei, nonce, gas_price, chain_id = results[:5]
+    balances = {address: balance_wei}
+    balances.update(zip(watch, results[5:]))
+    return {
+        "address": address,
+        "block_height": block_identifier if isinstance(block_identifier, int) else head,
+        "balance_wei": balance_wei,
+        "balance": float(w3.from_wei(balance_wei, 'ether')),
+        "nonce": nonce,
+        "gas_price": gas_price,
+        "chain_id": chain_id,
+        "balances": balances,
+    }
+
+class HistoryScanError(Exception):
+    pass
+
+def _get_block_batch(w3: Web3, block_numbers: list):
+    # One JSON-RPC batch of eth_getBlockByNumber calls. A rejected batch, an
+    # error on any single entry or a short response all raise.
+    with w3.batch_requests() as batch:
+        for blk in block_numbers:
+            batch.add(w3.eth.get_block(blk, full_transactions=True))
+        blocks = batch.execute()
+    if len(blocks) != len(block_numbers):
+        raise ValueError("Incomplete batch response")
+    return blocks
+
+def _raw_batch(w3: Web3, requests_info: list) -> list:
+    # A batch without web3's result formatting: results come back as the
+    # node sent them, hex strings and lowercase addresses.
+    if hasattr(w3.provider, "make_raw_batch_request"):
+        responses = w3.provider.make_raw_batch_request(requests_info)
+        if isinstance(responses, list):
+            # Batch responses may come in any order; the ids are positions.
+            responses.sort(key=lambda response: response["id"])
+    else:
+        responses = w3.provider.make_batch_request(requests_info)
+    if not isinstance(responses, list) or len(responses) != len(requests_info):
+        raise ValueError("Incomplete batch response")
+    return responses
+
+def _get_raw_block_batch(w3: Web3, block_numbers: list):
+    responses = _raw_batch(w3, [("eth_getBlockByNumber", [hex(blk), True])
+                                for blk in block_numbers])
+    blocks = [response.get("result") for response in responses]
+    for response, block in zip(responses, blocks):
+        if block is None:
+            raise ValueError(response.get("error") or "Block not found")
+    return blocks
+
+def _get_single_block(w3: Web3, block_number: int, retries: int, raw: bool = False):
+    for attempt in range(retries):
+        try:
+            if raw:
+                return _get_raw_block_batch(w3, [block_number])[0]
+            return w3.eth.get_block(block_number, full_transactions=True)
+        except Exception as e:
+            if attempt == retries - 1:
+                raise HistoryScanError(f"Unable to fetch block {block_number}: {e}") from e
+            time.sleep(0.5 * 2 ** attempt)
+
+def _fetch_block_chunk(w3: Web3, block_numbers: list, retries: int = DEFAULT_HISTORY_RETRIES,
+                       raw: bool = False):
+    if len(block_numbers) == 1:
+        return [_get_single_block(w3, block_numbers[0], retries, raw)]
+    try:
+        if raw:
+            return _get_raw_block_batch(w3, block_numbers)
+        return _get_block_batch(w3, block_numbers)
+    except Exception:
+        # Re-split so a single bad block (or a node with a lower batch limit)
+        # only costs the half it is in, down to plain single calls.
+        mid = len(block_numbers) // 2
+        return (_fetch_block_chunk(w3, block_numbers[:mid], retries, raw) +
+                _fetch_block_chunk(w3, block_numbers[mid:], retries, raw))
+
+def iter_blocks(w3: Web3, start_block: int, end_block: int,
+                batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                concurrency: int = DEFAULT_HISTORY_CONCURRENCY,
+                retries: int = DEFAULT_HISTORY_RETRIES, raw: bool = False):
+    """Yield blocks start_block..end_block (inclusive) with full transactions,
+    one list per batch of batch_size blocks, in block order. Up to
+    concurrency batch requests are in flight at a time. A block that still
+    fails after falling back to single calls and retrying raises
+    HistoryScanError. Closing the generator cancels the pending requests.
+
+    With raw, blocks are the plain JSON-RPC result dicts, skipping web3's
+    per-field formatting; pair them with match_raw_transactions."""
+    batch_size = max(1, batch_size)
+    chunks = (list(range(chunk_start, min(chunk_start + batch_size - 1, end_block) + 1))
+              for chunk_start in range(start_block, end_block + 1, batch_size))
+    if concurrency <= 1:
+        for chunk in chunks:
+            yield _fetch_block_chunk(w3, chunk, retries, raw)
+        return
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(pool.submit(_fetch_block_chunk, w3, chunk, retries, raw))
+            if len(pending) >= concurrency:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def fetch_blocks(w3: Web3, start_block: int, end_block: int,
+                 batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                 concurrency: int = DEFAULT_HISTORY_CONCURRENCY,
+                 retries: int = DEFAULT_HISTORY_RETRIES):
+    return [block for chunk in iter_blocks(w3, start_block, end_block, batch_size,
+                                           concurrency, retries)
+            for block in chunk]
+
+def iter_history(w3: Web3, wallet: dict, block_range: int = 1080,
+                 batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                 concurrency: int = DEFAULT_HISTORY_CONCURRENCY):
+    """Streaming fetch_history: yields (transactions, blocks_done, blocks_total)
+    after every scanned batch."""
+    address = get_wallet_address(wallet, w3).lower()
+    current_block = fetch_block_height(w3)
+    start_block = max(0, current_block - block_range)
+    total = current_block - start_block + 1
+    done = 0
+    for blocks in iter_blocks(w3, start_block, current_block, batch_size, concurrency, raw=True):
+        transactions = []
+        for block in blocks:
+            transactions.extend(match_raw_transactions(block, address))
+        done += len(blocks)
+        yield transactions, done, total
+
+def fetch_history(w3: Web3, wallet: dict, block_range: int = 1080,
+                  batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                  concurrency: int = DEFAULT_HISTORY_CONCURRENCY):
+    transactions = []
+    for found, _, _ in iter_history(w3, wallet, block_range, batch_size, concurrency):
+        transactions.extend(found)
+    return transactions
+
+def match_transactions(w3: Web3, block, addresses):
+    """Transfers in block touching addresses, a lowercase address or a set
+    of them. Each match names the account it belongs to; a transfer between
+    two followed accounts is reported once for each."""
+    if isinstance(addresses, str):
+        addresses = {addresses}
+    transactions = []
+    for tx in block.transactions:
+        sender = tx['from'].lower()
+        recipient = tx.to.lower() if tx.to else None
+        if sender not in addresses and recipient not in addresses:
+            continue
+        tx_info = {
+            "blockNumber": tx.blockNumber,
+            "from": tx['from'],
+            "to": tx.to,
+            "value": w3.from_wei(tx.value, 'ether'),
+            "hash": tx.hash.hex()
+        }
+        for account in sorted({sender, recipient} & addresses):
+            transactions.append(dict(tx_info, account=account))
+    return transactions
+
+def match_raw_transactions(block: dict, addresses):
+    """match_transactions over a raw block from iter_blocks(raw=True). Nodes
+    send addresses in lowercase, so non-matching transactions cost two
+    string lookups; only matches are decoded."""
+    if isinstance(addresses, str):
+        addresses = {addresses}
+    transactions = []
+    for tx in block["transactions"]:
+        sender = tx["from"]
+        recipient = tx.get("to")
+        if sender not in addresses and recipient not in addresses:
+            # Lowercase is conventional, not guaranteed; recheck the odd
+            # node that checksums its output.
+            if sender.islower() and (recipient is None or recipient.islower()):
+                continue
+            sender, recipient = sender.lower(), recipient and recipient.lower()
+            if sender not in addresses and recipient not in addresses:
+                continue
+        tx_info = {
+            "blockNumber": int(tx["blockNumber"], 16),
+            "from": Web3.to_checksum_address(sender),
+            "to": Web3.to_checksum_address(recipient) if recipient else None,
+            "value": Web3.from_wei(int(tx["value"], 16), 'ether'),
+            # Same form as HexBytes.hex() in match_transactions.
+            "hash": tx["hash"][2:]
+        }
+        for account in sorted({sender, recipient} & addresses):
+            transactions.append(dict(tx_info, account=account))
+    return transactions
+
+def fetch_transaction_outcomes(w3: Web3, tx_hashes: list,
+                               batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                               retries: int = DEFAULT_HISTORY_RETRIES) -> dict:
+    """(fee, status) per transaction hash in the form the matchers give (no
+    0x), from receipts fetched in raw batches of batch_size. fee is the wei
+    paid, gasUsed times effectiveGasPrice, and status 1 for success or 0
+    for a reverted transaction, which still pays its fee. Either is None
+    when the node has no receipt or the receipt lacks the field."""
+    outcomes = {}
+    for start in range(0, len(tx_hashes), max(1, batch_size)):
+        chunk = tx_hashes[start:start + max(1, batch_size)]
+        for attempt in range(retries):
+            try:
+                responses = _raw_batch(w3, [("eth_getTransactionReceipt", ["0x" + tx_hash])
+                                            for tx_hash in chunk])
+                if any("error" in response for response in responses):
+                    raise ValueError(next(r["error"] for r in responses if "error" in r))
+                break
+            except Exception as e:
+                if attempt == retries - 1:
+                    raise HistoryScanError(f"Unable to fetch receipts: {e}") from e
+                time.sleep(0.5 * 2 ** attempt)
+        for tx_hash, response in zip(chunk, responses):
+            receipt = response.get("result") or {}
+            fee = status = None
+            if receipt.get("effectiveGasPrice") is not None:
+                fee = int(receipt["gasUsed"], 16) * int(receipt["effectiveGasPrice"], 16)
+            if receipt.get("status") is not None:
+                status = int(receipt["status"], 16)
+            outcomes[tx_hash] = (fee, status)
+    return outcomes
+
+def sign_transaction(w3: Web3, wallet: dict, tx: dict):
+    account = getattr(wallet, "account", None)
+    if account is not None:
+        return account.sign_transaction(tx)
+    return Account.sign_transaction(tx, wallet["private_key"])
+
+def estimate_gas(w3: Web3, wallet: dict, destination: str, amount_wei: int):
+    sender = get_wallet_address(wallet, w3)
+    tx = {
+        "from": sender,
+        "to": destination,
+        "value": amount_wei
+    }
+    try:
+        gas_estimate = w3.eth.estimate_gas(tx)
+        return gas_estimate
+    except Exception:
+        return 21000
+
+# -------------------------------
+# Transaction Lifecycle Tracking
+# -------------------------------
+class NonceManager:
+    """Hands out sequential nonces for one address so transactions can be
+    pipelined without a get_transaction_count call each. The first call,
+    and the first one after resync(), starts from the node's pending count."""
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None
+
+    def next_nonce(self) -> int:
+        with self._lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def skip_to(self, nonce: int):
+        """Never hand out a nonce below this one, e.g. ones reserved by a
+        journal that the node has not seen yet."""
+        with self._lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            self._next = max(self._next, nonce)
+
+    def resync(self):
+        """Forget the local counter, e.g. after a failed broadcast or a
+        dropped or replaced transaction left a gap."""
+        with self._lock:
+            self._next = None
+
+class TransactionError(Exception):
+    pass
+
+class TransactionTracker:
+    """Assigns nonces, signs and broadcasts submitted transactions, then polls
+    their receipts with per-transaction backoff. on_status(tx_hash, status,
+    details) is called with pending, mined, failed (reverted), replaced
+    (another transaction used the nonce) or dropped (gone from the node for
+    TX_DROP_MISSES polls in a row and TX_DROP_GRACE seconds, or timed out).
+    Call poll() about once a second."""
+
+    def __init__(self, w3, wallet, nonce_manager, on_status, timeout=DEFAULT_TX_TIMEOUT):
+        self.w3 = w3
+        self.wallet = wallet
+        self.nonce_manager = nonce_manager
+        self.on_status = on_status
+        self.timeout = timeout
+        self.pending = {}  # tx hash -> tracking state
+        self._lock = threading.Lock()
+
+    def submit(self, tx: dict) -> str:
+        """Returns the transaction hash; raises TransactionError if it never
+        left."""
+        tx = dict(tx)
+        try:
+            tx["nonce"] = self.nonce_manager.next_nonce()
+        except Exception as e:
+            raise TransactionError(f"Error fetching nonce: {e}")
+        try:
+            signed_tx = sign_transaction(self.w3, self.wallet, tx)
+            tx_hash = Web3.to_hex(self.w3.eth.send_raw_transaction(signed_tx.raw_transaction))
+        except Exception as e:
+            # The node may or may not have taken the nonce; ask it next time.
+            self.nonce_manager.resync()
+            raise TransactionError(f"Error sending transaction: {e}")
+        now = time.monotonic()
+        with self._lock:
+            self.pending[tx_hash] = {
+                "nonce": tx["nonce"],
+                "submitted": now,
+                "interval": TX_POLL_MIN_INTERVAL,
+                "next_poll": now + TX_POLL_MIN_INTERVAL,
+                "misses": 0,
+            }
+        self.on_status(tx_hash, "pending", {"nonce": tx["nonce"], "to": tx["to"],
+                                            "value": tx["value"]})
+        return tx_hash
+
+    def _receipt(self, tx_hash):
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    def _finish(self, tx_hash, status, details):
+        with self._lock:
+            entry = self.pending.pop(tx_hash, None)
+        if entry is None:
+            return  # already reported by an overlapping poll()
+        details["nonce"] = entry["nonce"]
+        if status in ("replaced", "dropped"):
+            self.nonce_manager.resync()
+        self.on_status(tx_hash, status, details)
+
+    def poll(self):
+        now = time.monotonic()
+        # Work on copies: submit() and _finish() change the entries from
+        # other threads, so they are only written back under the lock.
+        with self._lock:
+            due = [(tx_hash, dict(entry)) for tx_hash, entry in self.pending.items()
+                   if entry["next_poll"] <= now]
+        chain_nonce = None
+        for tx_hash, entry in due:
+            misses = entry["misses"]
+            try:
+                receipt = self._receipt(tx_hash)
+                if receipt is None:
+                    if chain_nonce is None:
+                        chain_nonce = self.w3.eth.get_transaction_count(
+                            get_wallet_address(self.wallet, self.w3), "latest")
+                    if chain_nonce > entry["nonce"]:
+                        # The nonce is used up: either ours got mined in the
+                        # meantime or another transaction took its place.
+                        receipt = self._receipt(tx_hash)
+                        if receipt is None:
+                            self._finish(tx_hash, "replaced", {})
+                            continue
+                    else:
+                        try:
+                            self.w3.eth.get_transaction(tx_hash)
+                            misses = 0
+                        except TransactionNotFound:
+                            # One miss may just be an endpoint that has not
+                            # seen the transaction yet.
+                            misses += 1
+                            if misses >= TX_DROP_MISSES and now - entry["submitted"] >= TX_DROP_GRACE:
+                                self._finish(tx_hash, "dropped",
+                                             {"error": "No longer known to the node"})
+                                continue
+            except Exception:
+                receipt = None
+            if receipt is not None:
+                status = "mined" if receipt["status"] == 1 else "failed"
+                self._finish(tx_hash, status, {"blockNumber": receipt["blockNumber"],
+                                               "gasUsed": receipt["gasUsed"]})
+            elif now - entry["submitted"] > self.timeout:
+                self._finish(tx_hash, "dropped", {"error": "Timed out waiting for a receipt"})
+            else:
+                with self._lock:
+                    current = self.pending.get(tx_hash)
+                    if current is not None:
+                        current["interval"] = min(entry["interval"] * 2, TX_POLL_MAX_INTERVAL)
+                        current["next_poll"] = now + current["interval"]
+                        current["misses"] = misses
@@ -0,0 +1,626 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Command line and daemon entry point: python -m r5wallet <command>.
+
+Only the standard library is imported up front. Each command imports the
+modules it needs, so e.g. benchmark-kdf never loads web3 and --help
+returns before anything heavy is touched.
+"""
+
+import os
+import sys
+import json
+import time
+import getpass
+import argparse
+import statistics
+import subprocess
+
+from r5wallet.config import (WALLET_FILENAME, DEFAULT_SESSION_TIMEOUT, DEFAULT_KDF_TARGET_MS,
+                             DEFAULT_HISTORY_BATCH_SIZE, DEFAULT_HISTORY_CONCURRENCY,
+                             DEFAULT_HISTORY_LOOKBACK, DEFAULT_HISTORY_SCAN_RATE,
+                             DEFAULT_HISTORY_SCAN_WINDOW, DEFAULT_PAYOUT_WINDOW, DEFAULT_RPC_TIMEOUT,
+                             DEFAULT_DAEMON_PORT, DAEMON_TOKEN_FILENAME, TX_POLL_TICK_MS,
+                             HD_DEFAULT_PATH, HD_MNEMONIC_WORDS, DEFAULT_HD_GAP_LIMIT,
+                             FEE_TIERS, DEFAULT_FEE_TIER, DEFAULT_BENCH_BLOCKS,
+                             DEFAULT_BENCH_TXS_PER_BLOCK, DEFAULT_BENCH_RUNS, DEFAULT_BENCH_OPERATIONS,
+                             EXPORT_FORMATS, load_settings, int_setting, kdf_setting, rpc_addresses)
+
+class CommandError(Exception):
+    pass
+
+def read_password(args, prompt="Wallet password: ") -> str:
+    if args.password_file:
+        with open(args.password_file, "r") as f:
+            return f.readline().rstrip("\r\n")
+    return getpass.getpass(prompt)
+
+def read_wallet_file() -> dict:
+    if not os.path.exists(WALLET_FILENAME):
+        raise CommandError(f"No wallet file {WALLET_FILENAME}; run 'init' or the GUI first.")
+    with open(WALLET_FILENAME, "r") as f:
+        return json.load(f)
+
+def open_session(args, settings):
+    from r5wallet.keystore import WalletSession
+    file_data = read_wallet_file()
+    try:
+        return WalletSession.unlock_file(
+            file_data, read_password(args),
+            int_setting(settings, "session_timeout", DEFAULT_SESSION_TIMEOUT),
+            kdf=kdf_setting(settings),
+            kdf_target_ms=int_setting(settings, "kdf_target_ms", DEFAULT_KDF_TARGET_MS))
+    except Exception:
+        raise CommandError("Incorrect password or corrupt wallet.")
+
+def connect(settings, pool_size=None):
+    from r5wallet.rpc import connect
+    w3, cache = connect(settings, pool_size)
+    if not w3.is_connected():
+        raise CommandError(f"Unable to connect to RPC at {', '.join(rpc_addresses(settings))}")
+    return w3, cache
+
+def cmd_init(args, settings):
+    from r5wallet.keystore import (WalletSession, create_hd_wallet, wallet_from_mnemonic,
+                                   wallet_from_private_key)
+    if os.path.exists(WALLET_FILENAME) and not args.force:
+        raise CommandError(f"{WALLET_FILENAME} already exists; pass --force to replace it.")
+    try:
+        if args.import_key:
+            wallet = wallet_from_private_key(getpass.getpass("Private key (hex): "))
+        elif args.seed:
+            wallet = wallet_from_mnemonic(getpass.getpass("Seed phrase: "),
+                                          getpass.getpass("Seed passphrase (optional): "), args.path)
+        else:
+            wallet = create_hd_wallet(args.words)
+    except ValueError as e:
+        raise CommandError(str(e))
+    password = read_password(args, "Create encryption password: ")
+    if not args.password_file and getpass.getpass("Confirm password: ") != password:
+        raise CommandError("Passwords don't match.")
+    session = WalletSession.create_file(
+        wallet, password, kdf=kdf_setting(settings),
+        kdf_target_ms=int_setting(settings, "kdf_target_ms", DEFAULT_KDF_TARGET_MS))
+    if not (args.import_key or args.seed):
+        print(f"Seed phrase, write it down: {wallet['mnemonic']}", file=sys.stderr)
+    print(session.address)
+
+def cmd_seed(args, settings):
+    session = open_session(args, settings)
+    if not session.get("mnemonic"):
+        raise CommandError("This wallet was not created from a seed phrase.")
+    print(session["mnemonic"])
+    if session.get("mnemonic_passphrase"):
+        print("(plus the seed passphrase given at import)", file=sys.stderr)
+
+def open_keychain(args, settings):
+    from r5wallet.hd import HDKeychain
+    session = open_session(args, settings)
+    if not session.get("mnemonic"):
+        raise CommandError("This wallet was not created from a seed phrase.")
+    return HDKeychain.from_mnemonic(session["mnemonic"], session.get("mnemonic_passphrase", ""))
+
+def cmd_derive(args, settings):
+    from r5wallet.hd import derive_addresses
+    chain = open_keychain(args, settings).node(f"m/44'/60'/{args.account}'/0").public()
+    started = time.perf_counter()
+    addresses = derive_addresses(chain, args.start, args.count, args.workers)
+    elapsed = time.perf_counter() - started
+    for index, address in enumerate(addresses, args.start):
+        print(json.dumps({"index": index, "address": address}) if args.json
+              else f"{index}\t{address}")
+    print(f"Derived {len(addresses)} addresses in {elapsed:.2f}s", file=sys.stderr)
+
+def cmd_discover(args, settings):
+    from web3 import Web3
+    from r5wallet.hd import discover_accounts
+    keychain = open_keychain(args, settings)
+    w3, _ = connect(settings)
+    for account in discover_accounts(w3, keychain, args.gap_limit):
+        for used in account["addresses"]:
+            print(f"{account['path']}/{used['index']}\t{used['address']}\t"
+                  f"{Web3.from_wei(used['balance_wei'], 'ether'):.4f} R5\tnonce {used['nonce']}")
+
+def cmd_address(args, settings):
+    print(open_session(args, settings).address)
+
+def cmd_status(args, settings):
+    from r5wallet.chain import fetch_wallet_state
+    session = open_session(args, settings)
+    w3, _ = connect(settings)
+    state = fetch_wallet_state(w3, session.address)
+    print(f"Address:      {session.address}")
+    print(f"RPC URL:      {', '.join(rpc_addresses(settings))}")
+    print(f"Block Height: {state['block_height']}")
+    print(f"Balance:      {state['balance']:.4f} R5")
+    print(f"Nonce:        {state['nonce']}")
+
+def cmd_accounts(args, settings):
+    from web3 import Web3
+    from r5wallet.accounts import load_accounts
+    from r5wallet.chain import fetch_wallet_state
+    session = open_session(args, settings)
+    w3, _ = connect(settings)
+    accounts = load_accounts(settings, session.address)
+    state = fetch_wallet_state(w3, session.address,
+                               watch=[account["address"] for account in accounts])
+    for account in accounts:
+        balance = Web3.from_wei(state["balances"][account["address"]], "ether")
+        print(f"{account['label']:<12} {account['address']} "
+              f"{'watch' if account['watch_only'] else 'key':<5} {balance:.4f} R5")
+    total = Web3.from_wei(sum(state["balances"].values()), "ether")
+    print(f"Total at block {state['block_height']}: {total:.4f} R5")
+
+def cmd_watch(args, settings):
+    from r5wallet.accounts import AccountError, add_watch_account
+    try:
+        account = add_watch_account(settings, args.address, args.label or "")
+    except AccountError as e:
+        raise CommandError(str(e))
+    print(f"Watching {account['address']} as {account['label']}")
+
+def cmd_unwatch(args, settings):
+    from r5wallet.accounts import AccountError, remove_watch_account
+    try:
+        remove_watch_account(settings, args.address)
+    except AccountError as e:
+        raise CommandError(str(e))
+
+def cmd_history(args, settings):
+    from r5wallet.accounts import load_accounts
+    from r5wallet.history import HistoryIndex, sync_history_index
+    session = open_session(args, settings)
+    w3, _ = connect(settings)
+    accounts = load_accounts(settings, session.address)
+    if not args.all:
+        accounts = accounts[:1]
+    labels = {account["address"].lower(): account["label"] for account in accounts}
+    lookback = args.lookback or int_setting(settings, "history_lookback", DEFAULT_HISTORY_LOOKBACK)
+    with HistoryIndex() as index:
+        txs = sync_history_index(w3, index, list(labels), lookback,
+                                 int_setting(settings, "history_batch_size", DEFAULT_HISTORY_BATCH_SIZE),
+                                 int_setting(settings, "history_concurrency", DEFAULT_HISTORY_CONCURRENCY))
+    for tx in txs:
+        line = f"{tx['blockNumber']}\t{tx['from']}\t{tx['to']}\t{tx['value']}\t{tx['hash']}"
+        print(f"{labels[tx['account']]}\t{line}" if args.all else line)
+
+def cmd_scan(args, settings):
+    from r5wallet.accounts import load_accounts
+    from r5wallet.chain import HistoryScanError
+    from r5wallet.history import HistoryIndex, iter_chain_scan, format_eta
+    session = open_session(args, settings)
+    w3, _ = connect(settings)
+    accounts = load_accounts(settings, session.address)
+    if not args.all:
+        accounts = accounts[:1]
+    rate = args.rate if args.rate is not None else \
+        int_setting(settings, "history_scan_rate", DEFAULT_HISTORY_SCAN_RATE)
+    progress = None
+    with HistoryIndex() as index:
+        scan = iter_chain_scan(w3, index, [account["address"] for account in accounts],
+                               args.from_block, rate,
+                               int_setting(settings, "history_scan_window", DEFAULT_HISTORY_SCAN_WINDOW),
+                               int_setting(settings, "history_batch_size", DEFAULT_HISTORY_BATCH_SIZE),
+                               int_setting(settings, "history_concurrency", DEFAULT_HISTORY_CONCURRENCY))
+        try:
+            for _, progress in scan:
+                if progress["status"] == "waiting":
+                    print(f"Waiting for the node: {progress['error']}", file=sys.stderr, flush=True)
+                elif progress["status"] == "scanning":
+                    total = max(progress["blocks_total"], 1)
+                    print(f"{progress['blocks_done']}/{progress['blocks_total']} blocks "
+                          f"({100 * progress['blocks_done'] / total:.1f}%), "
+                          f"{progress['blocks_per_second']:.0f} blocks/s, "
+                          f"ETA {format_eta(progress['eta'])}", file=sys.stderr, flush=True)
+        except HistoryScanError as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            scan.close()
+            print("Stopped; run scan again with the same options to resume.", file=sys.stderr)
+            return 1
+    print(f"Scanned blocks {progress['from_block']} to {progress['to_block']}: "
+          f"{progress['transactions']} transactions found. 'history' lists them.")
+
+def cmd_export(args, settings):
+    from web3 import Web3
+    from r5wallet.accounts import load_accounts
+    from r5wallet.chain import HistoryScanError
+    from r5wallet.history import HistoryIndex, iter_history_index, fill_missing_fees
+    from r5wallet.export import ExportError, export_format, export_history, format_ether
+    try:
+        export_format(args.file, args.format)
+    except ExportError as e:
+        raise CommandError(str(e))
+    session = open_session(args, settings)
+    accounts = load_accounts(settings, session.address)
+    if not args.all:
+        accounts = accounts[:1]
+    addresses = [account["address"].lower() for account in accounts]
+    batch_size = int_setting(settings, "history_batch_size", DEFAULT_HISTORY_BATCH_SIZE)
+    w3 = None if args.offline and not args.opening_balance else connect(settings)[0]
+    opening_balances = {}
+    with HistoryIndex() as index:
+        try:
+            if not args.offline:
+                # Only the new blocks pass through here; the rows themselves
+                # are streamed from the index below.
+                for _ in iter_history_index(
+                        w3, index, addresses,
+                        int_setting(settings, "history_lookback", DEFAULT_HISTORY_LOOKBACK),
+                        batch_size,
+                        int_setting(settings, "history_concurrency", DEFAULT_HISTORY_CONCURRENCY),
+                        indexed=False):
+                    pass
+                fill_missing_fees(w3, index, addresses, batch_size)
+            for address in addresses if args.opening_balance else []:
+                first_block = index.first_scanned_block(address)
+                if first_block is None:
+                    print(f"{address}: where its index begins is unknown, "
+                          "opening balance left at 0; 'scan' records it.", file=sys.stderr)
+                elif first_block > 0:
+                    try:
+                        opening_balances[address] = w3.eth.get_balance(
+                            Web3.to_checksum_address(address), first_block - 1)
+                    except Exception as e:
+                        raise CommandError(f"Unable to fetch the balance at block {first_block - 1} "
+                                           f"(the node may not keep that state): {e}")
+            summary = export_history(index, addresses, args.file, args.format, opening_balances)
+        except (HistoryScanError, ExportError) as e:
+            raise CommandError(str(e))
+    labels = {account["address"].lower(): account["label"] for account in accounts}
+    for address, totals in summary.items():
+        missing = f", {totals['fees_missing']} fees unknown" if totals["fees_missing"] else ""
+        reverted = f" ({totals['reverted']} reverted)" if totals["reverted"] else ""
+        print(f"{labels[address]}: {totals['rows']} transactions{reverted}, "
+              f"received {format_ether(totals['received'])} R5, "
+              f"sent {format_ether(totals['sent'])} R5, "
+              f"fees {format_ether(totals['fees'])} R5{missing}, "
+              f"balance {format_ether(totals['balance'])} R5", file=sys.stderr)
+
+def cmd_send(args, settings):
+    from decimal import Decimal, InvalidOperation
+    from web3 import Web3
+    from r5wallet.chain import NonceManager, TransactionTracker, TransactionError, fetch_wallet_state
+    from r5wallet.fees import FeeOracle
+    if not Web3.is_address(args.to):
+        raise CommandError(f"Invalid address {args.to!r}")
+    try:
+        amount_wei = Web3.to_wei(Decimal(args.amount), "ether")
+    except (InvalidOperation, ValueError):
+        raise CommandError(f"Invalid amount {args.amount!r}")
+    session = open_session(args, settings)
+    w3, _ = connect(settings)
+    to = Web3.to_checksum_address(args.to)
+    state = fetch_wallet_state(w3, session.address)
+    fee_oracle = FeeOracle(w3)
+    if not args.gas_price:
+        fee_oracle.refresh(state["block_height"])
+    tx = {
+        "to": to,
+        "value": amount_wei,
+        "gas": fee_oracle.transfer_gas(session, to, amount_wei),
+        "gasPrice": (Web3.to_wei(args.gas_price, "gwei") if args.gas_price
+                     else fee_oracle.suggestion(args.fee)["gas_price"]),
+        "chainId": state["chain_id"],
+    }
+    if tx["value"] + tx["gas"] * tx["gasPrice"] > state["balance_wei"]:
+        raise CommandError(f"Insufficient funds: balance at block {state['block_height']} "
+                           f"is {state['balance']:.4f} R5.")
+    print(f"From: {session.address}\nTo: {to}\nAmount: {args.amount} R5\n"
+          f"Gas Limit: {tx['gas']}\nGas Price: {Web3.from_wei(tx['gasPrice'], 'gwei')} gwei")
+    if not args.yes and input("Proceed? [y/N] ").strip().lower() != "y":
+        return 1
+    outcome = {}
+    tracker = TransactionTracker(w3, session, NonceManager(w3, session.address),
+                                 lambda tx_hash, status, details: outcome.update(status=status, **details))
+    try:
+        tx_hash = tracker.submit(tx)
+    except TransactionError as e:
+        raise CommandError(str(e))
+    print(tx_hash)
+    if args.no_wait:
+        return 0
+    while tracker.pending:
+        time.sleep(TX_POLL_TICK_MS / 1000)
+        tracker.poll()
+    print(outcome["status"] + (f" in block {outcome['blockNumber']}" if "blockNumber" in outcome else ""))
+    return 0 if outcome["status"] == "mined" else 1
+
+def cmd_payout(args, settings):
+    from web3 import Web3
+    from r5wallet.keystore import decrypt_wallet
+    from r5wallet.chain import get_wallet_address
+    from r5wallet.rpc import RPCPoolProvider
+    from r5wallet.payout import PayoutError, PayoutJournal, load_payouts, run_payouts
+    try:
+        rows = load_payouts(args.file)
+    except (OSError, PayoutError) as e:
+        raise CommandError(f"Cannot read {args.file}:\n{e}")
+    file_data = read_wallet_file()
+    try:
+        wallet = decrypt_wallet(file_data, read_password(args))
+    except Exception:
+        raise CommandError("Incorrect password or corrupt wallet.")
+
+    window = max(args.window, 1)
+    # No response cache here: every call in a payout is about fresh state.
+    w3 = Web3(RPCPoolProvider(rpc_addresses(settings),
+                              int_setting(settings, "rpc_timeout", DEFAULT_RPC_TIMEOUT), window))
+    if not w3.is_connected():
+        raise CommandError(f"Unable to connect to RPC at {', '.join(rpc_addresses(settings))}")
+    journal = PayoutJournal(args.journal or args.file + ".journal")
+    try:
+        total = Web3.from_wei(sum(row["value"] for row in rows), "ether")
+        resumed = sum(1 for row in rows if row["row"] in journal.entries)
+        print(f"{len(rows)} payouts totalling {total} R5 from {get_wallet_address(wallet, w3)}"
+              + (f", {resumed} already in {journal.path}" if resumed else ""))
+        if not args.yes and input("Proceed? [y/N] ").strip().lower() != "y":
+            return 1
+        try:
+            summary = run_payouts(w3, wallet, rows, journal, window)
+        except PayoutError as e:
+            raise CommandError(str(e))
+    finally:
+        journal.close()
+    counts = ", ".join(f"{summary[s]} {s}" for s in sorted(summary)
+                       if s not in ("elapsed", "tx_per_second", "halted"))
+    print(f"Done in {summary['elapsed']:.1f}s ({summary['tx_per_second']:.1f} tx/s): {counts}")
+    if "halted" in summary:
+        raise CommandError(f"Stopped broadcasting at {summary['halted']}")
+    return 0 if summary.get("mined", 0) == len(rows) else 1
+
+def cmd_daemon(args, settings):
+    from r5wallet.daemon import WalletDaemon, write_token_file
+    session = open_session(args, settings)
+    w3, cache = connect(settings)
+    token = write_token_file(args.token_file)
+    port = args.port or int_setting(settings, "daemon_port", DEFAULT_DAEMON_PORT)
+    if args.metrics_interval is not None:
+        settings["metrics_log_interval"] = str(args.metrics_interval)
+    daemon = WalletDaemon(w3, session, settings, cache, token)
+    print(f"Serving {session.address} on http://{args.host}:{port}/ "
+          f"(bearer token in {args.token_file})", flush=True)
+    try:
+        daemon.serve(args.host, port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.lock()
+
+def cmd_benchmark_kdf(args, settings):
+    from r5wallet.keystore import benchmark_kdf
+    for result in benchmark_kdf():
+        params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+        print(f"{result['kdf']:<14} {params:<24} {result['decrypt_ms']:>8.1f} ms")
+
+# Entry points measured by bench-startup, as code run in a fresh interpreter.
+STARTUP_TARGETS = [
+    ("interpreter", "pass"),
+    ("cli", "import r5wallet.cli"),
+    ("keystore", "import r5wallet.keystore"),
+    ("chain+rpc", "import r5wallet.chain, r5wallet.rpc"),
+    ("daemon", "import r5wallet.daemon"),
+    ("gui", "import importlib.util as u; s = u.spec_from_file_location('gui', 'r5-wallet.py'); "
+            "s.loader.exec_module(u.module_from_spec(s))"),
+]
+
+def measure_startup(runs: int = 5) -> list:
+    """Median wall time to start a fresh interpreter and import each entry
+    point. The first run of each is discarded so the OS file cache is warm
+    for all of them alike."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for name, code in STARTUP_TARGETS:
+        timings = []
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=root, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        results.append({"target": name, "ms": round(statistics.median(timings[1:]) * 1000, 1)})
+    return results
+
+def cmd_bench_startup(args, settings):
+    results = measure_startup(args.runs)
+    if args.json:
+        print(json.dumps(results))
+        return
+    for result in results:
+        print(f"{result['target']:<12} {result['ms']:>8.1f} ms")
+
+def _mock_options(args) -> dict:
+    if not 0 <= args.error_rate < 1:
+        raise CommandError("--error-rate must be at least 0 and below 1")
+    return {"blocks": args.blocks, "txs_per_block": args.txs_per_block,
+            "latency": args.latency / 1000, "jitter": args.jitter / 1000,
+            "error_rate": args.error_rate, "seed": args.seed}
+
+def cmd_bench(args, settings):
+    from r5wallet.bench import run_benchmarks
+    report = run_benchmarks(settings, runs=args.runs, operations=args.operations,
+                            only=args.only, **_mock_options(args))
+    if args.json:
+        print(json.dumps(report))
+        return
+    for result in report["results"]:
+        if "median_ms" not in result:
+            print(f"{result['name']:<10} every run failed ({result['errors']} errors)")
+            continue
+        print(f"{result['name']:<10} {result['median_ms']:>10.2f} ms {result['per_second']:>12.1f} "
+              f"{result['unit']}/s   ({result['runs']} runs, {result['errors']} errors)")
+
+def cmd_mock_node(args, settings):
+    from r5wallet.bench import MockNode
+    server = MockNode(**_mock_options(args)).server(args.host, args.port)
+    print(f"Mock node on http://{args.host}:{server.server_address[1]}/ "
+          f"({args.blocks} blocks of {args.txs_per_block} transactions)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def add_mock_arguments(p):
+    p.add_argument("--blocks", type=int, default=DEFAULT_BENCH_BLOCKS, help="chain length")
+    p.add_argument("--txs-per-block", type=int, default=DEFAULT_BENCH_TXS_PER_BLOCK)
+    p.add_argument("--latency", type=float, default=0.0, metavar="MS",
+                   help="added to every HTTP request")
+    p.add_argument("--jitter", type=float, default=0.0, metavar="MS",
+                   help="latency varies uniformly by up to this much either way")
+    p.add_argument("--error-rate", type=float, default=0.0,
+                   help="fraction of JSON-RPC calls answered with an error")
+    p.add_argument("--seed", type=int, default=0, help="for the jitter and error draws")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="r5wallet", description="R5 Wallet without the GUI")
+    parser.add_argument("--password-file", metavar="FILE",
+                        help="read the wallet password from the first line of FILE")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("init", help="create a new wallet file from a fresh seed phrase")
+    source = p.add_mutually_exclusive_group()
+    source.add_argument("--import", dest="import_key", action="store_true",
+                        help="import an existing private key instead")
+    source.add_argument("--seed", action="store_true", help="restore from an existing seed phrase")
+    p.add_argument("--words", type=int, default=HD_MNEMONIC_WORDS, choices=[12, 15, 18, 21, 24])
+    p.add_argument("--path", help=f"key to use below the seed (default: {HD_DEFAULT_PATH}/0)")
+    p.add_argument("--force", action="store_true", help="replace an existing wallet file")
+    p.set_defaults(func=cmd_init)
+
+    p = commands.add_parser("address", help="print the wallet address")
+    p.set_defaults(func=cmd_address)
+
+    p = commands.add_parser("seed", help="print the wallet's seed phrase")
+    p.set_defaults(func=cmd_seed)
+
+    p = commands.add_parser("derive", help="print addresses derived from the wallet's seed")
+    p.add_argument("--account", type=int, default=0, help="BIP-44 account")
+    p.add_argument("--start", type=int, default=0)
+    p.add_argument("--count", type=int, default=1)
+    p.add_argument("--workers", type=int, help="processes to spread the work over (default: cores)")
+    p.add_argument("--json", action="store_true", help="one JSON object per line")
+    p.set_defaults(func=cmd_derive)
+
+    p = commands.add_parser("discover", help="find used accounts and addresses below the seed")
+    p.add_argument("--gap-limit", type=int, default=DEFAULT_HD_GAP_LIMIT,
+                   help="unused addresses in a row that end an account")
+    p.set_defaults(func=cmd_discover)
+
+    p = commands.add_parser("status", help="print block height, balance and nonce")
+    p.set_defaults(func=cmd_status)
+
+    p = commands.add_parser("accounts", help="print the wallet and watched accounts with balances")
+    p.set_defaults(func=cmd_accounts)
+
+    p = commands.add_parser("watch", help="follow an address without its key")
+    p.add_argument("address")
+    p.add_argument("--label")
+    p.set_defaults(func=cmd_watch)
+
+    p = commands.add_parser("unwatch", help="stop following a watched address")
+    p.add_argument("address")
+    p.set_defaults(func=cmd_unwatch)
+
+    p = commands.add_parser("history", help="print transactions in recent blocks")
+    p.add_argument("--lookback", type=int, help="blocks to scan back from the head")
+    p.add_argument("--all", action="store_true",
+                   help="include watched accounts, prefixing each line with its label")
+    p.set_defaults(func=cmd_history)
+
+    p = commands.add_parser("scan", help="index the history from a given block, resumably")
+    p.add_argument("--from-block", type=int, default=0, help="default: genesis")
+    p.add_argument("--all", action="store_true", help="include watched accounts")
+    p.add_argument("--rate", type=int, metavar="REQUESTS",
+                   help="block requests per second, 0 = unlimited "
+                        f"(default: history_scan_rate setting, {DEFAULT_HISTORY_SCAN_RATE})")
+    p.set_defaults(func=cmd_scan)
+
+    p = commands.add_parser("export", help="write the indexed history with running balances "
+                                           "and fee totals to a CSV, JSONL or Parquet file")
+    p.add_argument("file", help="output file, - for stdout")
+    p.add_argument("--format", choices=EXPORT_FORMATS, help="default: from the file extension")
+    p.add_argument("--all", action="store_true", help="include watched accounts")
+    p.add_argument("--offline", action="store_true",
+                   help="export the index as it is, without syncing it or looking up fees")
+    p.add_argument("--opening-balance", action="store_true",
+                   help="start the running balances from the balance before the first "
+                        "indexed block (needs a node that keeps old state)")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("send", help="send R5 and wait for the receipt")
+    p.add_argument("to")
+    p.add_argument("amount", help="amount in R5")
+    p.add_argument("--gas-price", type=int, metavar="GWEI")
+    p.add_argument("--fee", choices=list(FEE_TIERS), default=DEFAULT_FEE_TIER,
+                   help="fee tier when no --gas-price is given")
+    p.add_argument("--no-wait", action="store_true", help="exit once broadcast")
+    p.add_argument("--yes", action="store_true", help="do not ask for confirmation")
+    p.set_defaults(func=cmd_send)
+
+    p = commands.add_parser("payout", help="send the to,amount rows of a CSV or JSONL file")
+    p.add_argument("file")
+    p.add_argument("--journal", metavar="FILE",
+                   help="progress journal (default: FILE.journal); rerun to resume")
+    p.add_argument("--window", type=int, default=DEFAULT_PAYOUT_WINDOW,
+                   help="maximum unconfirmed transactions at once")
+    p.add_argument("--yes", action="store_true", help="do not ask before paying out")
+    p.set_defaults(func=cmd_payout)
+
+    p = commands.add_parser("daemon", help="serve the unlocked wallet over a local JSON-RPC API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, help=f"default: daemon_port setting ({DEFAULT_DAEMON_PORT})")
+    p.add_argument("--token-file", default=DAEMON_TOKEN_FILENAME)
+    p.add_argument("--metrics-interval", type=int, metavar="SECONDS",
+                   help="print an RPC summary line to stderr this often "
+                        "(default: metrics_log_interval setting, 0 = off)")
+    p.set_defaults(func=cmd_daemon)
+
+    p = commands.add_parser("benchmark-kdf", help="print unlock latency per KDF setting")
+    p.set_defaults(func=cmd_benchmark_kdf)
+
+    p = commands.add_parser("bench-startup", help="measure cold-start time of each entry point")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--json", action="store_true", help="machine-readable output")
+    p.set_defaults(func=cmd_bench_startup)
+
+    p = commands.add_parser("bench", help="time unlock, signing, refresh, history and send "
+                                          "against a mock node")
+    add_mock_arguments(p)
+    p.add_argument("--runs", type=int, default=DEFAULT_BENCH_RUNS,
+                   help="runs of unlock, signing and history")
+    p.add_argument("--operations", type=int, default=DEFAULT_BENCH_OPERATIONS,
+                   help="transactions signed per run; refreshes and sends timed")
+    p.add_argument("--only", action="append", choices=["unlock", "sign", "refresh", "history",
+                                                       "send"],
+                   help="run just this benchmark; repeat for several")
+    p.add_argument("--json", action="store_true", help="machine-readable output")
+    p.set_defaults(func=cmd_bench)
+
+    p = commands.add_parser("mock-node", help="serve the benchmark mock JSON-RPC node")
+    add_mock_arguments(p)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8545)
+    p.set_defaults(func=cmd_mock_node)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    settings = load_settings()
+    try:
+        return args.func(args, settings) or 0
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
@@ -0,0 +1,193 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Constants and wallet.ini settings shared by the GUI, CLI and daemon."""
+
+import os
+import configparser
+
+# Global constants
+WALLET_FILENAME = "r5.key"
+SETTINGS_FILENAME = "wallet.ini"
+HISTORY_DB_FILENAME = "r5-history.db"
+RPC_CACHE_FILENAME = "r5-rpc-cache.db"
+DEFAULT_RPC_ADDRESS = "https://rpc-devnet.r5.network/"
+DEFAULT_QUERY_INTERVAL = 60
+DEFAULT_SESSION_TIMEOUT = 300
+DEFAULT_TX_TIMEOUT = 1200
+TX_POLL_TICK_MS = 1000
+TX_POLL_MIN_INTERVAL = 2
+TX_POLL_MAX_INTERVAL = 30
+# A pending transaction counts as dropped only when this many polls in a
+# row cannot find it, and not before this many seconds after sending:
+# another endpoint of the pool may simply not have it yet.
+TX_DROP_MISSES = 3
+TX_DROP_GRACE = 60
+DEFAULT_PAYOUT_WINDOW = 16
+PAYOUT_SIGN_CHUNK = 64
+PAYOUT_POLL_INTERVAL = 1
+DEFAULT_DAEMON_PORT = 8765
+DAEMON_TOKEN_FILENAME = "r5-daemon.token"
+DAEMON_TRACKED_TXS = 1000
+DAEMON_MAX_DERIVE = 100000
+FEE_HISTORY_BLOCKS = 20
+# Tier -> (priority fee percentile over FEE_HISTORY_BLOCKS, headroom factor
+# on the next base fee, or on eth_gasPrice for nodes without fee history).
+FEE_TIERS = {"slow": (10, 1.0), "normal": (50, 1.125), "fast": (90, 1.25)}
+DEFAULT_FEE_TIER = "normal"
+TRANSFER_GAS = 21000
+FEE_GAS_MEMO_SIZE = 256
+# BIP-44 external chain; Ethereum's coin type so seeds interoperate with
+# other EVM wallets. Account keys are HD_DEFAULT_PATH/<index>.
+HD_DEFAULT_PATH = "m/44'/60'/0'/0"
+HD_MNEMONIC_WORDS = 12
+DEFAULT_HD_GAP_LIMIT = 20
+HD_DERIVE_CHUNK = 2000
+KEYSTORE_VERSION = 2
+KDF_PBKDF2 = "pbkdf2-sha256"
+KDF_SCRYPT = "scrypt"
+DEFAULT_KDF = KDF_SCRYPT
+DEFAULT_KDF_TARGET_MS = 500
+# r5.key files without a version field were always PBKDF2 with 100k rounds.
+LEGACY_KDF_PARAMS = {"iterations": 100000}
+MIN_KDF_PARAMS = {
+    KDF_PBKDF2: {"iterations": 100000},
+    KDF_SCRYPT: {"n": 2 ** 14, "r": 8, "p": 1},
+}
+MAX_SCRYPT_N = 2 ** 18  # 256 MiB with r=8
+DEFAULT_HISTORY_BATCH_SIZE = 50
+DEFAULT_HISTORY_CONCURRENCY = 8
+DEFAULT_HISTORY_RETRIES = 3
+DEFAULT_RPC_TIMEOUT = 10
+DEFAULT_HISTORY_LOOKBACK = 1080
+HISTORY_REORG_DEPTH = 128
+DEFAULT_HISTORY_SCAN_WINDOW = 2000
+DEFAULT_HISTORY_SCAN_RATE = 0
+HISTORY_SCAN_MIN_BACKOFF = 5
+HISTORY_SCAN_MAX_BACKOFF = 300
+WS_RECONNECT_DELAY = 5
+RPC_LATENCY_SMOOTHING = 0.2
+RPC_MAX_COOLDOWN = 60
+DEFAULT_RPC_CACHE_SIZE = 5000
+RPC_CACHE_DISK_ROWS = 100000
+RPC_CACHE_FINALITY_DEPTH = HISTORY_REORG_DEPTH
+RPC_CACHE_RECENT_TTL = 30
+# Seconds a response stays valid; None caches it for good.
+RPC_CACHE_TTLS = {
+    "eth_chainId": None,
+    "net_version": None,
+    "eth_gasPrice": 15,
+    "eth_maxPriorityFeePerGas": 15,
+    "eth_feeHistory": 15,
+    "eth_estimateGas": 60,
+}
+# They say which chain the node is on, so a cache file is checked against
+# the live answer and never answers them itself.
+RPC_CACHE_MEMORY_ONLY = {"eth_chainId", "net_version"}
+# Methods whose result is fixed once the block they are asked about is
+# final, mapped to the position of their block parameter.
+RPC_CACHE_BLOCK_PARAMS = {
+    "eth_getBlockByNumber": 0,
+    "eth_getBalance": 1,
+    "eth_getTransactionCount": 1,
+    "eth_getCode": 1,
+    "eth_call": 1,
+}
+RPC_CACHE_BY_HASH = {"eth_getBlockByHash", "eth_getTransactionByHash", "eth_getTransactionReceipt"}
+# Upper bounds in seconds of the RPC latency histogram buckets.
+RPC_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RPC_RECENT_CALLS = 500
+DEFAULT_METRICS_LOG_INTERVAL = 0
+DEFAULT_BENCH_BLOCKS = 2000
+DEFAULT_BENCH_TXS_PER_BLOCK = 50
+DEFAULT_BENCH_RUNS = 5
+DEFAULT_BENCH_OPERATIONS = 100
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+# Rows per Parquet row group, which is all an export holds in memory.
+EXPORT_PARQUET_ROWS = 65536
+
+# -------------------------------
+# Settings and Wallet Setup
+# -------------------------------
+def load_settings():
+    settings = {}
+    config = configparser.ConfigParser()
+    if os.path.exists(SETTINGS_FILENAME):
+        try:
+            config.read(SETTINGS_FILENAME)
+            if 'Wallet' not in config:
+                raise ValueError("Missing [Wallet] section")
+            settings = dict(config['Wallet'])
+        except Exception:
+            settings = create_default_settings()
+    else:
+        settings = create_default_settings()
+    if "rpc_address" not in settings:
+        settings = create_default_settings()
+    missing = {k: v for k, v in default_settings().items() if k not in settings}
+    if missing:
+        settings.update(missing)
+        config['Wallet'] = settings
+        with open(SETTINGS_FILENAME, "w") as f:
+            config.write(f)
+    return settings
+
+def default_settings():
+    return {
+        "rpc_address": DEFAULT_RPC_ADDRESS,
+        "query_interval": str(DEFAULT_QUERY_INTERVAL),
+        "history_batch_size": str(DEFAULT_HISTORY_BATCH_SIZE),
+        "history_concurrency": str(DEFAULT_HISTORY_CONCURRENCY),
+        "rpc_timeout": str(DEFAULT_RPC_TIMEOUT),
+        "history_lookback": str(DEFAULT_HISTORY_LOOKBACK),
+        "history_scan_rate": str(DEFAULT_HISTORY_SCAN_RATE),
+        "history_scan_window": str(DEFAULT_HISTORY_SCAN_WINDOW),
+        "ws_address": "",
+        "rpc_cache_size": str(DEFAULT_RPC_CACHE_SIZE),
+        "rpc_cache_file": RPC_CACHE_FILENAME,
+        "session_timeout": str(DEFAULT_SESSION_TIMEOUT),
+        "kdf": DEFAULT_KDF,
+        "kdf_target_ms": str(DEFAULT_KDF_TARGET_MS),
+        "daemon_port": str(DEFAULT_DAEMON_PORT),
+        "watch_addresses": "",
+        "metrics_log_interval": str(DEFAULT_METRICS_LOG_INTERVAL),
+    }
+
+def int_setting(settings: dict, key: str, default: int) -> int:
+    try:
+        value = int(settings.get(key, default))
+    except Exception:
+        return default
+    return value if value > 0 else default
+
+def kdf_setting(settings: dict) -> str:
+    kdf = settings.get("kdf", DEFAULT_KDF).strip()
+    return kdf if kdf in MIN_KDF_PARAMS else DEFAULT_KDF
+
+def rpc_addresses(settings: dict) -> list:
+    """rpc_address may hold several endpoints separated by commas."""
+    addresses = [a.strip() for a in settings.get("rpc_address", "").split(",") if a.strip()]
+    return addresses or [DEFAULT_RPC_ADDRESS]
+
+def save_settings(settings: dict):
+    config = configparser.ConfigParser()
+    config['Wallet'] = settings
+    with open(SETTINGS_FILENAME, "w") as f:
+        config.write(f)
+
+def create_default_settings():
+    settings = default_settings()
+    config = configparser.ConfigParser()
+    config['Wallet'] = settings
+    with open(SETTINGS_FILENAME, "w") as f:
+        config.write(f)
+    return settings
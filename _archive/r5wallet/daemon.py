@@ -0,0 +1,373 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Long-running wallet service with a local JSON-RPC 2.0 API over HTTP."""
+
+import os
+import sys
+import json
+import hmac
+import time
+import secrets
+import threading
+from decimal import Decimal, InvalidOperation
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from web3 import Web3
+
+from r5wallet.config import (DAEMON_TOKEN_FILENAME, DAEMON_TRACKED_TXS, DAEMON_MAX_DERIVE,
+                             DEFAULT_HISTORY_BATCH_SIZE, DEFAULT_HISTORY_CONCURRENCY,
+                             DEFAULT_HISTORY_LOOKBACK, TX_POLL_TICK_MS, FEE_TIERS,
+                             DEFAULT_FEE_TIER, DEFAULT_METRICS_LOG_INTERVAL,
+                             DEFAULT_HISTORY_SCAN_RATE, DEFAULT_HISTORY_SCAN_WINDOW, int_setting)
+from r5wallet.keystore import WalletLockedError
+from r5wallet.accounts import load_accounts
+from r5wallet.hd import HDKeychain, derive_addresses
+from r5wallet.fees import FeeOracle
+from r5wallet.chain import NonceManager, TransactionTracker, TransactionError, fetch_wallet_state
+from r5wallet.history import HistoryIndex, sync_history_index, iter_chain_scan
+
+class DaemonError(Exception):
+    def __init__(self, message, code=-32000):
+        super().__init__(message)
+        self.code = code
+
+def write_token_file(path: str = DAEMON_TOKEN_FILENAME) -> str:
+    """A fresh bearer token per start, readable only by the owner."""
+    token = secrets.token_hex(32)
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token + "\n")
+    return token
+
+class WalletDaemon:
+    """Serves the unlocked session to local clients. Every request must
+    carry "Authorization: Bearer <token>" from the token file, since
+    wallet_send spends funds. Methods take named params:
+
+        wallet_status                      address, block, balance, nonce, locked
+        wallet_accounts                    own and watched accounts with balances
+        wallet_history    lookback[, all]  matched transactions, all accounts if all
+        wallet_scan       [fromBlock, all, stop]   full-chain scan progress; fromBlock
+                                           starts one, stop ends it
+        wallet_deriveAddresses start, count[, account]   addresses below the seed
+        wallet_estimateGas to, amount
+        wallet_fees                        slow/normal/fast fee suggestions
+        wallet_send       to, amount[, gas, gasPrice, fee]   -> hash
+        wallet_transaction hash            tracked status
+        wallet_lock / wallet_unlock password
+        rpc_stats                          endpoint pool, cache and per-method counters
+
+    GET /metrics, with the same token, serves the RPC counters in the
+    Prometheus text format.
+    """
+
+    def __init__(self, w3: Web3, session, settings: dict, cache=None, token: str = None):
+        self.w3 = w3
+        self.session = session
+        self.settings = settings
+        self.cache = cache
+        self.token = token
+        self.tracker = TransactionTracker(w3, session, NonceManager(w3, session.address),
+                                          self._transaction_status)
+        self.transactions = OrderedDict()
+        self.fee_oracle = FeeOracle(w3)
+        self._hd_chains = {}  # BIP-44 account -> public external chain node
+        self._scan_job = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.methods = {
+            "wallet_status": self.status,
+            "wallet_accounts": self.accounts,
+            "wallet_history": self.history,
+            "wallet_scan": self.scan,
+            "wallet_deriveAddresses": self.derive_addresses,
+            "wallet_estimateGas": self.estimate_gas,
+            "wallet_fees": self.fees,
+            "wallet_send": self.send,
+            "wallet_transaction": self.transaction,
+            "wallet_lock": self.lock,
+            "wallet_unlock": self.unlock,
+            "rpc_stats": self.rpc_stats,
+        }
+
+    def _transaction_status(self, tx_hash, status, details):
+        with self._lock:
+            self.transactions[tx_hash] = dict(details, status=status)
+            self.transactions.move_to_end(tx_hash)
+            while len(self.transactions) > DAEMON_TRACKED_TXS:
+                self.transactions.popitem(last=False)
+
+    def _poll_loop(self):
+        interval = int_setting(self.settings, "metrics_log_interval", DEFAULT_METRICS_LOG_INTERVAL)
+        next_log = time.monotonic() + interval
+        while not self._stopped.wait(TX_POLL_TICK_MS / 1000):
+            self.session.check_idle()
+            self.tracker.poll()
+            if interval > 0 and time.monotonic() >= next_log:
+                next_log += interval
+                print(self.w3.provider.metrics.summary_line(), file=sys.stderr, flush=True)
+
+    def _amount(self, params):
+        to = params.get("to", "")
+        if not Web3.is_address(to):
+            raise DaemonError(f"Invalid address {to!r}", -32602)
+        try:
+            amount = Decimal(str(params.get("amount")))
+        except InvalidOperation:
+            raise DaemonError("amount must be a decimal number of R5", -32602)
+        if not amount.is_finite() or amount <= 0:
+            raise DaemonError("amount must be positive", -32602)
+        return Web3.to_checksum_address(to), Web3.to_wei(amount, "ether")
+
+    def status(self, params):
+        state = fetch_wallet_state(self.w3, self.session.address)
+        return {
+            "address": state["address"],
+            "blockNumber": state["block_height"],
+            "balance": str(Web3.from_wei(state["balance_wei"], "ether")),
+            "nonce": state["nonce"],
+            "gasPrice": state["gas_price"],
+            "chainId": state["chain_id"],
+            "locked": self.session.locked,
+        }
+
+    def accounts(self, params):
+        accounts = load_accounts(self.settings, self.session.address)
+        state = fetch_wallet_state(self.w3, self.session.address,
+                                   watch=[account["address"] for account in accounts])
+        return {
+            "blockNumber": state["block_height"],
+            "accounts": [dict(account, balance=str(Web3.from_wei(state["balances"][account["address"]],
+                                                                 "ether")))
+                         for account in accounts],
+        }
+
+    def history(self, params):
+        lookback = int(params.get("lookback") or int_setting(self.settings, "history_lookback",
+                                                             DEFAULT_HISTORY_LOOKBACK))
+        addresses = self._accounts(params)
+        # sqlite connections belong to the thread that opened them.
+        with HistoryIndex() as index:
+            txs = sync_history_index(self.w3, index, addresses, lookback,
+                                     int_setting(self.settings, "history_batch_size",
+                                                 DEFAULT_HISTORY_BATCH_SIZE),
+                                     int_setting(self.settings, "history_concurrency",
+                                                 DEFAULT_HISTORY_CONCURRENCY))
+        return [dict(tx, value=str(tx["value"])) for tx in txs]
+
+    def _accounts(self, params):
+        if params.get("all"):
+            return [account["address"] for account in load_accounts(self.settings,
+                                                                    self.session.address)]
+        return [self.session.address]
+
+    def _run_scan(self, job, addresses, from_block):
+        try:
+            with HistoryIndex() as index:
+                for _, progress in iter_chain_scan(
+                        self.w3, index, addresses, from_block,
+                        int_setting(self.settings, "history_scan_rate", DEFAULT_HISTORY_SCAN_RATE),
+                        int_setting(self.settings, "history_scan_window", DEFAULT_HISTORY_SCAN_WINDOW),
+                        int_setting(self.settings, "history_batch_size", DEFAULT_HISTORY_BATCH_SIZE),
+                        int_setting(self.settings, "history_concurrency", DEFAULT_HISTORY_CONCURRENCY),
+                        job["stop"]):
+                    job["progress"] = progress
+        except Exception as e:
+            job["progress"] = dict(job["progress"], status="failed", error=f"{type(e).__name__}: {e}")
+
+    def scan(self, params):
+        """With fromBlock, starts a full-chain scan in the background unless
+        one is still running, which is then left as it is. Every call returns
+        the latest progress of the current or last scan, None before the
+        first; wallet_history serves what it found once it is done."""
+        with self._lock:
+            job = self._scan_job
+            if params.get("stop"):
+                if job is not None:
+                    job["stop"].set()
+            elif "fromBlock" in params and (job is None or not job["thread"].is_alive()):
+                try:
+                    from_block = int(params["fromBlock"])
+                except (TypeError, ValueError):
+                    raise DaemonError("fromBlock must be an integer", -32602)
+                if from_block < 0:
+                    raise DaemonError("fromBlock must be non-negative", -32602)
+                job = self._scan_job = {"stop": threading.Event(), "progress": {"status": "starting"}}
+                job["thread"] = threading.Thread(target=self._run_scan,
+                                                 args=(job, self._accounts(params), from_block),
+                                                 daemon=True)
+                job["thread"].start()
+            return job["progress"] if job is not None else None
+
+    def derive_addresses(self, params):
+        try:
+            account, start, count = (int(params.get(name, default)) for name, default in
+                                     (("account", 0), ("start", 0), ("count", 1)))
+        except (TypeError, ValueError):
+            raise DaemonError("account, start and count must be integers", -32602)
+        if account < 0 or start < 0 or not 0 < count <= DAEMON_MAX_DERIVE:
+            raise DaemonError(f"count must be 1 to {DAEMON_MAX_DERIVE}, start and account "
+                              "non-negative", -32602)
+        # Only the public chain node is kept, so deposit addresses stay
+        # available while the session is locked.
+        chain = self._hd_chains.get(account)
+        if chain is None:
+            if not self.session.get("mnemonic"):
+                raise DaemonError("This wallet was not created from a seed phrase")
+            keychain = HDKeychain.from_mnemonic(self.session["mnemonic"],
+                                                self.session.get("mnemonic_passphrase", ""))
+            chain = self._hd_chains[account] = keychain.node(f"m/44'/60'/{account}'/0").public()
+        return [{"index": index, "address": address} for index, address in
+                enumerate(derive_addresses(chain, start, count), start)]
+
+    def estimate_gas(self, params):
+        to, value = self._amount(params)
+        return self.fee_oracle.transfer_gas(self.session, to, value)
+
+    def fees(self, params):
+        head = self.w3.eth.block_number
+        return {"blockNumber": head, "tiers": self.fee_oracle.refresh(head)}
+
+    def send(self, params):
+        to, value = self._amount(params)
+        if self.session.locked:
+            raise DaemonError("Wallet is locked; call wallet_unlock first")
+        tier = params.get("fee", DEFAULT_FEE_TIER)
+        if tier not in FEE_TIERS:
+            raise DaemonError(f"fee must be one of {', '.join(FEE_TIERS)}", -32602)
+        state = fetch_wallet_state(self.w3, self.session.address)
+        gas_price = params.get("gasPrice") or \
+            self.fee_oracle.refresh(state["block_height"])[tier]["gas_price"]
+        tx = {
+            "to": to,
+            "value": value,
+            "gas": int(params.get("gas") or self.fee_oracle.transfer_gas(self.session, to, value)),
+            "gasPrice": int(gas_price),
+            "chainId": state["chain_id"],
+        }
+        if tx["value"] + tx["gas"] * tx["gasPrice"] > state["balance_wei"]:
+            raise DaemonError(f"Insufficient funds at block {state['block_height']}")
+        try:
+            tx_hash = self.tracker.submit(tx)
+        except TransactionError as e:
+            raise DaemonError(str(e))
+        return {"hash": tx_hash}
+
+    def transaction(self, params):
+        with self._lock:
+            entry = self.transactions.get(params.get("hash", ""))
+        if entry is None:
+            raise DaemonError("Unknown transaction", -32602)
+        return entry
+
+    def lock(self, params):
+        self.session.lock()
+        return True
+
+    def unlock(self, params):
+        if not self.session.verify_password(str(params.get("password", ""))):
+            raise DaemonError("Incorrect password")
+        return True
+
+    def rpc_stats(self, params):
+        return {
+            "endpoints": self.w3.provider.endpoint_stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "methods": self.w3.provider.metrics.snapshot(),
+            "slowest": self.w3.provider.metrics.slowest(),
+        }
+
+    def handle(self, request):
+        """One JSON-RPC 2.0 request object in, one response object out."""
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise DaemonError("Invalid request", -32600)
+            method = self.methods.get(request["method"])
+            if method is None:
+                raise DaemonError(f"Method not found: {request['method']}", -32601)
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise DaemonError("params must be an object", -32602)
+            result = method(params)
+        except DaemonError as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}}
+        except WalletLockedError as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32000, "message": str(e)}}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": request_id,
+                    "error": {"code": -32603, "message": f"{type(e).__name__}: {e}"}}
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def serve(self, host: str, port: int, ready=None):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body in one write; otherwise Nagle and delayed ACK
+            # add ~40ms to every local call.
+            wbufsize = 65536
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, content_type="application/json"):
+                data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _authorized(self):
+                if daemon.token is not None:
+                    supplied = self.headers.get("Authorization", "")
+                    if not hmac.compare_digest(supplied.encode(), f"Bearer {daemon.token}".encode()):
+                        self._reply(401, {"error": "unauthorized"})
+                        return False
+                return True
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self._reply(404, {"error": "not found"})
+                elif self._authorized():
+                    self._reply(200, daemon.w3.provider.metrics.prometheus(),
+                                "text/plain; version=0.0.4")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self._authorized():
+                    return
+                try:
+                    request = json.loads(body)
+                except ValueError:
+                    self._reply(200, {"jsonrpc": "2.0", "id": None,
+                                      "error": {"code": -32700, "message": "Parse error"}})
+                    return
+                self._reply(200, daemon.handle(request))
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        poller = threading.Thread(target=self._poll_loop, daemon=True)
+        poller.start()
+        if ready is not None:
+            ready(server)
+        try:
+            server.serve_forever()
+        finally:
+            self._stopped.set()
+            if self._scan_job is not None:
+                self._scan_job["stop"].set()
+            server.server_close()
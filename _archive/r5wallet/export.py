@@ -0,0 +1,197 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""History and accounting reports streamed from the local history index.
+
+Every row is one indexed transaction of one account with the account's
+running balance and fee total after it. Balances follow the indexed
+transfers only, starting from an opening balance (0 unless given), so
+anything else that moves funds, such as contract calls paying out, is not
+in them. A reverted transaction moves no value; its sender only pays the
+fee. Rows are read off a sqlite cursor and written as they come, so an
+export holds at most one Parquet row group in memory however long the
+history is.
+"""
+
+import os
+import csv
+import sys
+import json
+from decimal import Context, Decimal
+from web3 import Web3
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from r5wallet.config import EXPORT_FORMATS, EXPORT_PARQUET_ROWS
+from r5wallet.history import HistoryIndex
+
+EXPORT_COLUMNS = ["account", "block", "tx_hash", "from", "to", "direction", "status",
+                  "value", "fee", "balance", "fees_total"]
+
+# Receipt status as the index keeps it; None is not known yet.
+_STATUS_NAMES = {1: "success", 0: "reverted", None: None}
+
+class ExportError(ValueError):
+    pass
+
+def export_format(path: str, fmt: str = None) -> str:
+    """fmt, or the format named by the extension of path; csv for "-",
+    which is stdout."""
+    if path == "-":
+        if fmt == "parquet":
+            raise ExportError("Parquet cannot be written to stdout")
+        return fmt or "csv"
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown export format {fmt or path!r}; "
+                          f"use one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and pyarrow is None:
+        raise ExportError("Parquet export needs the pyarrow package")
+    return fmt
+
+# Exact for any 256-bit amount; the default context rounds to 28 digits.
+_WEI_CONTEXT = Context(prec=100)
+
+def to_ether(wei):
+    """Decimal R5 of wei. Unlike Web3.from_wei it takes negative amounts,
+    as a running balance without its opening balance can go below 0, and
+    it is several times faster, which counts at four amounts a row."""
+    return None if wei is None else Decimal(wei).scaleb(-18, _WEI_CONTEXT)
+
+def format_ether(wei) -> str:
+    """Fixed-point R5 of wei without trailing zeros."""
+    return _text(to_ether(wei))
+
+def iter_report_rows(index: HistoryIndex, addresses, opening_balances: dict = None,
+                     summary: dict = None):
+    """Report rows of the indexed transactions of addresses, account by
+    account in block order. Amounts are Decimal R5; fee is None for an
+    outgoing transaction whose fee is unknown, which then counts as 0. A
+    reverted transaction keeps its value in the row, but neither the
+    balance nor received and sent count it; one whose status is unknown
+    counts as successful. opening_balances maps lowercase addresses to wei.
+    When given, summary is filled with the totals of every account as the
+    rows go by."""
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    addresses = list(dict.fromkeys(address.lower() for address in addresses))
+    opening_balances = opening_balances or {}
+    summary = {} if summary is None else summary
+    for address in addresses:
+        summary[address] = {"rows": 0, "received": 0, "sent": 0, "fees": 0, "fees_missing": 0,
+                            "reverted": 0, "opening_balance": opening_balances.get(address, 0),
+                            "balance": opening_balances.get(address, 0)}
+    checksums = {}
+    for (address, block_number, tx_hash, tx_from, tx_to, value_wei, fee_wei,
+         status) in index.iter_rows(addresses):
+        totals = summary[address]
+        outgoing = tx_from.lower() == address
+        incoming = (tx_to or "").lower() == address
+        value = int(value_wei)
+        moved = 0 if status == 0 else value
+        fee = (None if fee_wei is None else int(fee_wei)) if outgoing else 0
+        if incoming:
+            totals["received"] += moved
+            totals["balance"] += moved
+        if outgoing:
+            totals["sent"] += moved
+            totals["balance"] -= moved + (fee or 0)
+            totals["fees"] += fee or 0
+            totals["fees_missing"] += fee is None
+        totals["reverted"] += status == 0
+        totals["rows"] += 1
+        if address not in checksums:
+            checksums[address] = Web3.to_checksum_address(address)
+        yield {
+            "account": checksums[address],
+            "block": block_number,
+            "tx_hash": "0x" + tx_hash,
+            "from": tx_from,
+            "to": tx_to,
+            "direction": "self" if incoming and outgoing else "out" if outgoing else "in",
+            "status": _STATUS_NAMES.get(status),
+            "value": to_ether(value),
+            "fee": to_ether(fee),
+            "balance": to_ether(totals["balance"]),
+            "fees_total": to_ether(totals["fees"]),
+        }
+
+def _text(value):
+    # Fixed-point, never 1E+1 style, so spreadsheets read the amounts as is.
+    if isinstance(value, Decimal):
+        return format(value.normalize(), "f")
+    return value
+
+def write_csv(rows, f):
+    writer = csv.writer(f)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(["" if row[column] is None else _text(row[column])
+                         for column in EXPORT_COLUMNS])
+
+def write_jsonl(rows, f):
+    # Amounts are strings, as JSON numbers would lose wei precision.
+    for row in rows:
+        f.write(json.dumps({column: _text(row[column]) for column in EXPORT_COLUMNS}) + "\n")
+
+def write_parquet(rows, path: str, row_group_size: int = EXPORT_PARQUET_ROWS):
+    # Wei fit 18 decimals; 38 digits leave 20 for whole R5.
+    amount = pyarrow.decimal128(38, 18)
+    schema = pyarrow.schema([
+        ("account", pyarrow.string()), ("block", pyarrow.int64()),
+        ("tx_hash", pyarrow.string()), ("from", pyarrow.string()),
+        ("to", pyarrow.string()), ("direction", pyarrow.string()),
+        ("status", pyarrow.string()),
+        ("value", amount), ("fee", amount), ("balance", amount), ("fees_total", amount),
+    ])
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        columns = {column: [] for column in EXPORT_COLUMNS}
+        for row in rows:
+            for column in EXPORT_COLUMNS:
+                columns[column].append(row[column])
+            if len(columns["block"]) >= row_group_size:
+                writer.write_table(pyarrow.table(columns, schema=schema))
+                columns = {column: [] for column in EXPORT_COLUMNS}
+        if columns["block"]:
+            writer.write_table(pyarrow.table(columns, schema=schema))
+
+def export_history(index: HistoryIndex, addresses, path: str, fmt: str = None,
+                   opening_balances: dict = None) -> dict:
+    """Write the report of addresses to path, "-" for stdout, in fmt or by
+    default the one export_format() picks. The file is
+    written next to path and moved over it once complete. Returns the
+    totals per lowercase address: rows, received, sent, fees,
+    fees_missing, reverted, opening_balance and balance, amounts in wei."""
+    fmt = export_format(path, fmt)
+    summary = {}
+    rows = iter_report_rows(index, addresses, opening_balances, summary)
+    if path == "-":
+        (write_csv if fmt == "csv" else write_jsonl)(rows, sys.stdout)
+        return summary
+    tmp_path = path + ".tmp"
+    try:
+        if fmt == "parquet":
+            write_parquet(rows, tmp_path)
+        else:
+            with open(tmp_path, "w", newline="" if fmt == "csv" else None,
+                      encoding="utf-8") as f:
+                (write_csv if fmt == "csv" else write_jsonl)(rows, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return summary
@@ -0,0 +1,143 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Fee suggestions refreshed once per block, and transfer gas."""
+
+import statistics
+import threading
+from collections import OrderedDict
+from web3 import Web3
+from web3.exceptions import MethodUnavailable
+
+from r5wallet.config import (FEE_HISTORY_BLOCKS, FEE_TIERS, DEFAULT_FEE_TIER, TRANSFER_GAS,
+                             FEE_GAS_MEMO_SIZE)
+from r5wallet.chain import estimate_gas
+
+class FeeOracle:
+    """Slow, normal and fast fee suggestions for one chain. refresh() is
+    cheap to call on every tick: it only asks the node when the block it is
+    given differs from the last one. Readers get the last computed tiers
+    without any RPC, so a send form can open instantly.
+
+    Each tier is {"gas_price", "max_fee_per_gas", "max_priority_fee_per_gas"}.
+    With eth_feeHistory the tip is the tier's reward percentile (median over
+    non-empty blocks) and gas_price is the next base fee with the tier's
+    headroom plus that tip. Nodes without fee history get eth_gasPrice times
+    the headroom, and the oracle stops asking them for fee history; when
+    fee history fails for any other reason, only that block is priced from
+    eth_gasPrice."""
+
+    def __init__(self, w3: Web3):
+        self.w3 = w3
+        self.block = None
+        self.tiers = None
+        self.fee_history = True
+        self._lock = threading.Lock()
+        self._has_code = OrderedDict()
+
+    def _fetch(self):
+        percentiles = [percentile for percentile, _ in FEE_TIERS.values()]
+        if self.fee_history:
+            try:
+                with self.w3.batch_requests() as batch:
+                    batch.add(self.w3.eth.fee_history(FEE_HISTORY_BLOCKS, "latest", percentiles))
+                    batch.add(self.w3.eth.gas_price)
+                    history, gas_price = batch.execute()
+                return _tiers_from_history(history, gas_price)
+            except Exception as error:
+                gas_price = self.w3.eth.gas_price
+                if _unsupported(error):
+                    # The node answers, it just has no fee history.
+                    self.fee_history = False
+                return _legacy_tiers(gas_price)
+        return _legacy_tiers(self.w3.eth.gas_price)
+
+    def refresh(self, block_number: int = None) -> dict:
+        """Recompute the tiers if block_number (default: the head) is new."""
+        if block_number is None:
+            block_number = self.w3.eth.block_number
+        if block_number == self.block and self.tiers is not None:
+            return self.tiers
+        tiers = self._fetch()
+        # One assignment each, so readers on other threads see whole tiers.
+        self.tiers = tiers
+        self.block = block_number
+        return tiers
+
+    def suggestion(self, tier: str = DEFAULT_FEE_TIER):
+        tiers = self.tiers
+        return tiers[tier] if tiers else None
+
+    def transfer_gas(self, wallet, destination: str = None, amount_wei: int = 0) -> int:
+        """Gas for a plain value transfer of amount_wei to destination; None
+        stands for any account without code. A transfer to an account
+        without code is always TRANSFER_GAS, so what is memoized per
+        destination is whether it has code, not an estimate: contracts are
+        estimated on every call, as their gas can depend on the amount."""
+        if destination is None:
+            return TRANSFER_GAS
+        destination = Web3.to_checksum_address(destination)
+        key = destination.lower()
+        with self._lock:
+            has_code = self._has_code.get(key)
+            if has_code is not None:
+                self._has_code.move_to_end(key)
+        if has_code is None:
+            try:
+                has_code = len(self.w3.eth.get_code(destination)) > 0
+            except Exception:
+                # Not knowing is not remembered; estimate this one.
+                return estimate_gas(self.w3, wallet, destination, amount_wei)
+            with self._lock:
+                self._has_code[key] = has_code
+                while len(self._has_code) > FEE_GAS_MEMO_SIZE:
+                    self._has_code.popitem(last=False)
+        if not has_code:
+            return TRANSFER_GAS
+        return estimate_gas(self.w3, wallet, destination, amount_wei)
+
+def _unsupported(error) -> bool:
+    """Whether error means the node has no eth_feeHistory at all: JSON-RPC
+    method not found (-32601, which web3 raises as MethodUnavailable) or a
+    "not supported" message. Anything else may pass by the next block."""
+    if isinstance(error, MethodUnavailable):
+        return True
+    response = getattr(error, "rpc_response", None)
+    rpc_error = response.get("error") if isinstance(response, dict) else None
+    if isinstance(rpc_error, dict):
+        if rpc_error.get("code") == -32601:
+            return True
+        return "not supported" in str(rpc_error.get("message", "")).lower()
+    return "not supported" in str(error).lower()
+
+def _tiers_from_history(history, gas_price: int) -> dict:
+    next_base_fee = history["baseFeePerGas"][-1]
+    if not next_base_fee:
+        # Pre-London blocks report a zero base fee; price them legacy-style.
+        return _legacy_tiers(gas_price)
+    rewards = [reward for reward, ratio in zip(history.get("reward") or [], history["gasUsedRatio"])
+               if ratio > 0]
+    tiers = {}
+    for position, (name, (_, headroom)) in enumerate(FEE_TIERS.items()):
+        tip = int(statistics.median(reward[position] for reward in rewards)) if rewards else 0
+        tiers[name] = {
+            "gas_price": int(next_base_fee * headroom) + tip,
+            "max_fee_per_gas": 2 * next_base_fee + tip,
+            "max_priority_fee_per_gas": tip,
+        }
+    return tiers
+
+def _legacy_tiers(gas_price: int) -> dict:
+    return {name: {"gas_price": int(gas_price * headroom),
+                   "max_fee_per_gas": int(gas_price * headroom),
+                   "max_priority_fee_per_gas": int(gas_price * headroom)}
+            for name, (_, headroom) in FEE_TIERS.items()}
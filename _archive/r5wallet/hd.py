@@ -0,0 +1,319 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""BIP-32/BIP-44 hierarchical key derivation and BIP-39 seed phrases."""
+
+import os
+import hmac
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from ecdsa import SECP256k1
+from cryptography.hazmat.primitives.asymmetric import ec
+from eth_utils import keccak, to_checksum_address
+
+from r5wallet.config import HD_DEFAULT_PATH, HD_MNEMONIC_WORDS, DEFAULT_HD_GAP_LIMIT, HD_DERIVE_CHUNK
+
+HARDENED = 0x80000000
+_G = SECP256k1.generator
+_N = SECP256k1.order
+_P = SECP256k1.curve.p()
+
+class HDError(ValueError):
+    pass
+
+# -------------------------------
+# Seed Phrases
+# -------------------------------
+def _mnemonic():
+    # The BIP-39 word list and checks ship with eth_account.
+    from eth_account.hdaccount.mnemonic import Language, Mnemonic
+    return Mnemonic(Language.ENGLISH)
+
+def generate_mnemonic(num_words: int = HD_MNEMONIC_WORDS) -> str:
+    return _mnemonic().generate(num_words)
+
+def normalize_mnemonic(phrase: str) -> str:
+    """Collapse whitespace and case; raises HDError unless it is a valid
+    BIP-39 English phrase."""
+    phrase = " ".join(phrase.lower().split())
+    if not _mnemonic().is_mnemonic_valid(phrase):
+        raise HDError("Invalid seed phrase.")
+    return phrase
+
+def mnemonic_to_seed(phrase: str, passphrase: str = "") -> bytes:
+    from eth_account.hdaccount.mnemonic import Mnemonic
+    return Mnemonic.to_seed(normalize_mnemonic(phrase), passphrase)
+
+# -------------------------------
+# Extended Keys
+# -------------------------------
+def parse_path(path: str) -> tuple:
+    """"m/44'/60'/0'/0/5" -> (44 | HARDENED, 60 | HARDENED, HARDENED, 0, 5)"""
+    parts = path.strip().split("/")
+    if parts[0] != "m":
+        raise HDError(f"Derivation path must start with m: {path!r}")
+    indexes = []
+    for part in parts[1:]:
+        hardened = part.endswith(("'", "h", "H"))
+        digits = part[:-1] if hardened else part
+        if not digits.isdigit() or int(digits) >= HARDENED:
+            raise HDError(f"Invalid derivation path element {part!r} in {path!r}")
+        indexes.append(int(digits) | (HARDENED if hardened else 0))
+    return tuple(indexes)
+
+def format_path(indexes) -> str:
+    return "/".join(["m"] + [f"{i & ~HARDENED}'" if i & HARDENED else str(i) for i in indexes])
+
+def _public_point(private_key: int):
+    """private_key * G, affine. Done by OpenSSL, whose scalar multiplication
+    does not branch on the key bits the way _mul_add does."""
+    numbers = ec.derive_private_key(private_key, ec.SECP256K1()).public_key().public_numbers()
+    return numbers.x, numbers.y
+
+# Fixed-base multiplication with one table per process: 32 rows of the 255
+# multiples of 256**row * G, so k * G is at most 32 mixed additions instead
+# of the ~90 ecdsa's generic precomputation needs. Its timing depends on k,
+# so it only ever takes the tweaks of public derivation, which come from a
+# public key and chain code; private keys go through _public_point. Points
+# outside this table are affine (x, y) tuples.
+_TABLE = None
+
+def _base_table():
+    global _TABLE
+    if _TABLE is None:
+        base = (_G.x(), _G.y())
+        table = []
+        for _ in range(32):
+            row = [None, base]
+            for _ in range(254):
+                row.append(_affine_add(row[-1], base))
+            table.append(row)
+            base = _affine_add(row[-1], base)
+        _TABLE = table
+    return _TABLE
+
+def _affine_add(a, b):
+    (x1, y1), (x2, y2) = a, b
+    if x1 == x2:
+        if (y1 + y2) % _P == 0:
+            raise HDError("Point at infinity")
+        slope = 3 * x1 * x1 * pow(2 * y1, -1, _P) % _P
+    else:
+        slope = (y2 - y1) * pow(x2 - x1, -1, _P) % _P
+    x3 = (slope * slope - x1 - x2) % _P
+    return x3, (slope * (x1 - x3) - y1) % _P
+
+def _mul_add(k: int, point=None):
+    """k * G + point, affine."""
+    table = _base_table()
+    acc = None
+    if point is not None:
+        acc = (point[0], point[1], 1)
+    for row in table:
+        digit = k & 0xFF
+        k >>= 8
+        if not digit:
+            continue
+        x2, y2 = row[digit]
+        if acc is None:
+            acc = (x2, y2, 1)
+            continue
+        # Jacobian + affine mixed addition.
+        x1, y1, z1 = acc
+        zz = z1 * z1 % _P
+        h = (x2 * zz - x1) % _P
+        r = (y2 * z1 * zz - y1) % _P
+        if h == 0:
+            # acc == +-row[digit]; too rare to be worth a doubling formula.
+            zinv = pow(z1, -1, _P)
+            x, y = _affine_add((x1 * zinv * zinv % _P, y1 * zinv ** 3 % _P), (x2, y2))
+            acc = (x, y, 1)
+            continue
+        hh = h * h % _P
+        hhh = h * hh % _P
+        v = x1 * hh % _P
+        x3 = (r * r - hhh - 2 * v) % _P
+        acc = (x3, (r * (v - x3) - y1 * hhh) % _P, z1 * h % _P)
+    if acc is None:
+        raise HDError("Point at infinity")
+    x, y, z = acc
+    zinv = pow(z, -1, _P)
+    return x * zinv * zinv % _P, y * zinv * zinv * zinv % _P
+
+def _compress(point) -> bytes:
+    x, y = point
+    return bytes([2 + (y & 1)]) + x.to_bytes(32, "big")
+
+def _decompress(data: bytes):
+    x = int.from_bytes(data[1:], "big")
+    y = pow((x * x * x + 7) % _P, (_P + 1) // 4, _P)
+    if (y & 1) != (data[0] & 1):
+        y = _P - y
+    return x, y
+
+def _address(point) -> str:
+    x, y = point
+    return to_checksum_address(keccak(x.to_bytes(32, "big") + y.to_bytes(32, "big"))[-20:])
+
+class ExtendedKey:
+    """One BIP-32 node. private_key is None for a public-only node, which can
+    still derive non-hardened children and their addresses."""
+
+    __slots__ = ("private_key", "point", "chain_code", "depth")
+
+    def __init__(self, private_key, point, chain_code: bytes, depth: int = 0):
+        self.private_key = private_key
+        self.point = point
+        self.chain_code = chain_code
+        self.depth = depth
+
+    @classmethod
+    def from_seed(cls, seed: bytes):
+        digest = hmac.new(b"Bitcoin seed", seed, hashlib.sha512).digest()
+        key = int.from_bytes(digest[:32], "big")
+        if not 0 < key < _N:
+            raise HDError("Seed yields an invalid master key")
+        return cls(key, _public_point(key), digest[32:])
+
+    @property
+    def public_key(self) -> bytes:
+        return _compress(self.point)
+
+    @property
+    def address(self) -> str:
+        return _address(self.point)
+
+    def private_key_hex(self) -> str:
+        if self.private_key is None:
+            raise HDError("Public-only key has no private key")
+        return self.private_key.to_bytes(32, "big").hex()
+
+    def public(self):
+        return ExtendedKey(None, self.point, self.chain_code, self.depth)
+
+    def child(self, index: int):
+        if index & HARDENED:
+            if self.private_key is None:
+                raise HDError("Hardened children need the private key")
+            data = b"\0" + self.private_key.to_bytes(32, "big")
+        else:
+            data = self.public_key
+        digest = hmac.new(self.chain_code, data + index.to_bytes(4, "big"), hashlib.sha512).digest()
+        tweak = int.from_bytes(digest[:32], "big")
+        if tweak >= _N:
+            raise HDError(f"Index {index} yields an invalid key; use the next one")
+        if self.private_key is not None:
+            key = (self.private_key + tweak) % _N
+            if key == 0:
+                raise HDError(f"Index {index} yields an invalid key; use the next one")
+            return ExtendedKey(key, _public_point(key), digest[32:], self.depth + 1)
+        return ExtendedKey(None, _mul_add(tweak, self.point), digest[32:], self.depth + 1)
+
+class HDKeychain:
+    """Derives keys below one seed. Every intermediate node on the way to a
+    requested key is cached, so walking m/44'/60'/0'/0/N for consecutive N
+    costs one child derivation each instead of five from the master key."""
+
+    def __init__(self, seed: bytes):
+        self._nodes = {(): ExtendedKey.from_seed(seed)}
+
+    @classmethod
+    def from_mnemonic(cls, phrase: str, passphrase: str = ""):
+        return cls(mnemonic_to_seed(phrase, passphrase))
+
+    def node(self, path):
+        """The extended key at path (a string or parse_path() tuple). Only
+        non-leaf nodes are kept, so bulk leaf derivation does not grow the
+        cache."""
+        indexes = parse_path(path) if isinstance(path, str) else tuple(path)
+        depth = len(indexes)
+        while indexes[:depth] not in self._nodes:
+            depth -= 1
+        node = self._nodes[indexes[:depth]]
+        for depth in range(depth, len(indexes)):
+            node = node.child(indexes[depth])
+            if depth + 1 < len(indexes):
+                self._nodes[indexes[:depth + 1]] = node
+        return node
+
+    def account_key(self, index: int, base: str = HD_DEFAULT_PATH) -> ExtendedKey:
+        return self.node(parse_path(base) + (index,))
+
+# -------------------------------
+# Bulk Derivation
+# -------------------------------
+def _derive_address_chunk(public_key: bytes, chain_code: bytes, start: int, count: int) -> list:
+    parent = ExtendedKey(None, _decompress(public_key), chain_code)
+    return [parent.child(index).address for index in range(start, start + count)]
+
+def derive_addresses(parent: ExtendedKey, start: int, count: int, workers: int = None) -> list:
+    """Addresses of children start .. start+count-1 of parent, in order.
+    Only the public half of parent is used, so worker processes never see a
+    private key. Chunks of HD_DERIVE_CHUNK are spread over worker processes
+    when there is more than one core and more than one chunk."""
+    public_key, chain_code = parent.public_key, parent.chain_code
+    chunks = [(i, min(HD_DERIVE_CHUNK, start + count - i))
+              for i in range(start, start + count, HD_DERIVE_CHUNK)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        return [address for i, n in chunks
+                for address in _derive_address_chunk(public_key, chain_code, i, n)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_derive_address_chunk, itertools.repeat(public_key),
+                           itertools.repeat(chain_code), *zip(*chunks))
+        return [address for chunk in results for address in chunk]
+
+# -------------------------------
+# Gap-Limit Discovery
+# -------------------------------
+def discover_addresses(w3, parent: ExtendedKey, gap_limit: int = DEFAULT_HD_GAP_LIMIT,
+                       block_identifier="latest") -> list:
+    """Used children of parent, scanning gap_limit addresses per JSON-RPC
+    batch until gap_limit in a row are unused. An address counts as used
+    when it has sent a transaction or holds a balance; plain RPC has no
+    index of received transfers, so an address that only ever received
+    and was since emptied by someone else's key is not seen."""
+    gap_limit = max(1, gap_limit)
+    used = []
+    index, last_used = 0, -1
+    while index <= last_used + gap_limit:
+        addresses = derive_addresses(parent, index, gap_limit, workers=1)
+        with w3.batch_requests() as batch:
+            for address in addresses:
+                batch.add(w3.eth.get_balance(address, block_identifier))
+                batch.add(w3.eth.get_transaction_count(address, block_identifier))
+            results = batch.execute()
+        if len(results) != 2 * len(addresses):
+            raise ValueError("Incomplete batch response")
+        for offset, address in enumerate(addresses):
+            balance, nonce = results[2 * offset], results[2 * offset + 1]
+            if balance or nonce:
+                used.append({"index": index + offset, "address": address,
+                             "balance_wei": balance, "nonce": nonce})
+                last_used = index + offset
+        index += gap_limit
+    return used
+
+def discover_accounts(w3, keychain: HDKeychain, gap_limit: int = DEFAULT_HD_GAP_LIMIT,
+                      base: str = "m/44'/60'") -> list:
+    """BIP-44 account discovery: accounts 0, 1, ... until one has no used
+    external address, all read at the same block."""
+    block_number = w3.eth.block_number
+    accounts = []
+    for account in itertools.count():
+        chain = keychain.node(f"{base}/{account}'/0")
+        used = discover_addresses(w3, chain, gap_limit, block_number)
+        if not used:
+            break
+        accounts.append({"account": account, "path": f"{base}/{account}'/0", "addresses": used})
+    return accounts
@@ -0,0 +1,497 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Local sqlite index of the transaction history of the wallet's accounts."""
+
+import time
+import sqlite3
+import threading
+from contextlib import closing
+from web3 import Web3
+from web3.exceptions import BlockNotFound
+
+from r5wallet.config import (HISTORY_DB_FILENAME, DEFAULT_HISTORY_BATCH_SIZE,
+                             DEFAULT_HISTORY_CONCURRENCY, DEFAULT_HISTORY_LOOKBACK,
+                             HISTORY_REORG_DEPTH, DEFAULT_HISTORY_SCAN_WINDOW,
+                             DEFAULT_HISTORY_SCAN_RATE, HISTORY_SCAN_MIN_BACKOFF,
+                             HISTORY_SCAN_MAX_BACKOFF)
+from r5wallet.chain import (HistoryScanError, iter_blocks, match_raw_transactions,
+                            fetch_transaction_outcomes)
+
+# -------------------------------
+# Local Transaction History Index
+# -------------------------------
+class HistoryIndex:
+    """On-disk index of matched transactions per address, with the scanned
+    range and the hashes of the most recent scanned blocks so a refresh only
+    scans new blocks and can detect reorgs, plus the checkpoints of
+    full-chain scan jobs. Outgoing transactions also keep the fee they paid,
+    and every transaction its receipt status (1 success, 0 reverted), NULL
+    where it is not known yet."""
+
+    def __init__(self, path=HISTORY_DB_FILENAME):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scans (
+                address TEXT PRIMARY KEY,
+                last_block INTEGER NOT NULL,
+                first_block INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS block_hashes (
+                address TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (address, number)
+            );
+            CREATE TABLE IF NOT EXISTS transactions (
+                address TEXT NOT NULL,
+                block_number INTEGER NOT NULL,
+                tx_hash TEXT NOT NULL,
+                tx_from TEXT NOT NULL,
+                tx_to TEXT,
+                value_wei TEXT NOT NULL,
+                fee_wei TEXT,
+                status INTEGER,
+                PRIMARY KEY (address, tx_hash)
+            );
+            CREATE INDEX IF NOT EXISTS transactions_by_block
+                ON transactions (address, block_number);
+            CREATE TABLE IF NOT EXISTS scan_jobs (
+                key TEXT PRIMARY KEY,
+                from_block INTEGER NOT NULL,
+                to_block INTEGER NOT NULL,
+                next_block INTEGER NOT NULL
+            );
+        """)
+        # Indexes from before full-chain scans do not know where they began.
+        if "first_block" not in [row[1] for row in self.conn.execute("PRAGMA table_info(scans)")]:
+            self.conn.execute("ALTER TABLE scans ADD COLUMN first_block INTEGER")
+        # Nor did they keep fees or receipt status; fill_missing_fees() looks
+        # them up later.
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")]
+        if "fee_wei" not in columns:
+            self.conn.execute("ALTER TABLE transactions ADD COLUMN fee_wei TEXT")
+        if "status" not in columns:
+            self.conn.execute("ALTER TABLE transactions ADD COLUMN status INTEGER")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def last_scanned_block(self, address: str):
+        row = self.conn.execute("SELECT last_block FROM scans WHERE address = ?",
+                                (address,)).fetchone()
+        return row[0] if row else None
+
+    def first_scanned_block(self, address: str):
+        """Lowest indexed block, None for an address never scanned or indexed
+        before this was recorded."""
+        row = self.conn.execute("SELECT first_block FROM scans WHERE address = ?",
+                                (address,)).fetchone()
+        return row[0] if row else None
+
+    def stored_hashes(self, address: str):
+        """(number, hash) pairs of the recent scanned blocks, newest first."""
+        return self.conn.execute(
+            "SELECT number, hash FROM block_hashes WHERE address = ? ORDER BY number DESC",
+            (address,)).fetchall()
+
+    def record(self, address: str, last_block: int, block_hashes, transactions,
+               first_block: int = None):
+        """Store one scanned window atomically: the matched transactions, the
+        hashes of its blocks and the new last scanned height. first_block is
+        kept from the address's first window only."""
+        self.record_many([(address, last_block, block_hashes, transactions, first_block)])
+
+    def _store_transactions(self, address, transactions):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO transactions "
+            "(address, block_number, tx_hash, tx_from, tx_to, value_wei, fee_wei, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(address, tx["blockNumber"], tx["hash"], tx["from"], tx["to"],
+              str(Web3.to_wei(tx["value"], 'ether')),
+              None if tx.get("fee") is None else str(tx["fee"]), tx.get("status"))
+             for tx in transactions])
+
+    def record_many(self, scans):
+        """record() for several (address, last_block, block_hashes,
+        transactions, first_block) windows in a single sqlite transaction."""
+        with self.conn:
+            for address, last_block, block_hashes, transactions, first_block in scans:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO block_hashes (address, number, hash) VALUES (?, ?, ?)",
+                    [(address, number, block_hash) for number, block_hash in block_hashes])
+                self._store_transactions(address, transactions)
+                self.conn.execute(
+                    "DELETE FROM block_hashes WHERE address = ? AND number <= ?",
+                    (address, last_block - HISTORY_REORG_DEPTH))
+                self.conn.execute(
+                    "INSERT INTO scans (address, last_block, first_block) VALUES (?, ?, ?) "
+                    "ON CONFLICT (address) DO UPDATE SET last_block = excluded.last_block",
+                    (address, last_block, first_block))
+
+    def scan_job(self, key: str):
+        """(from_block, to_block, next_block) of a full-chain scan, or None."""
+        return self.conn.execute("SELECT from_block, to_block, next_block FROM scan_jobs "
+                                 "WHERE key = ?", (key,)).fetchone()
+
+    def start_scan_job(self, key: str, from_block: int, to_block: int):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO scan_jobs (key, from_block, to_block, "
+                              "next_block) VALUES (?, ?, ?, ?)",
+                              (key, from_block, to_block, from_block))
+
+    def checkpoint_scan_job(self, key: str, next_block: int, transactions, block_hashes=()):
+        """Store a full-chain scan window's matches, tagged with their
+        account, and move the job past it, atomically."""
+        with self.conn:
+            for address in {tx["account"] for tx in transactions}:
+                self._store_transactions(address, [tx for tx in transactions
+                                                   if tx["account"] == address])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO block_hashes (address, number, hash) VALUES (?, ?, ?)",
+                block_hashes)
+            self.conn.execute("UPDATE scan_jobs SET next_block = ? WHERE key = ?",
+                              (next_block, key))
+
+    def finish_scan_job(self, key: str, addresses, from_block: int, to_block: int):
+        """Extend the indexed range of addresses down to from_block and drop
+        the job. An address first synced while the job ran keeps its own
+        range, as the blocks between the two were never scanned."""
+        with self.conn:
+            for address in addresses:
+                self.conn.execute(
+                    "UPDATE scans SET first_block = ? WHERE address = ? AND "
+                    "(first_block IS NULL OR first_block <= ?)",
+                    (from_block, address, to_block + 1))
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO scans (address, last_block, first_block) VALUES (?, ?, ?)",
+                    (address, to_block, from_block))
+            self.conn.execute("DELETE FROM scan_jobs WHERE key = ?", (key,))
+
+    def rollback(self, address: str, block_number: int):
+        """Forget everything above block_number, e.g. after a reorg."""
+        with self.conn:
+            self.conn.execute("DELETE FROM transactions WHERE address = ? AND block_number > ?",
+                              (address, block_number))
+            self.conn.execute("DELETE FROM block_hashes WHERE address = ? AND number > ?",
+                              (address, block_number))
+            if block_number < 0:
+                self.conn.execute("DELETE FROM scans WHERE address = ?", (address,))
+            else:
+                self.conn.execute("UPDATE scans SET last_block = ? WHERE address = ?",
+                                  (block_number, address))
+
+    def missing_fees(self, addresses, after: int = 0, limit: int = DEFAULT_HISTORY_BATCH_SIZE):
+        """Up to limit (rowid, address, tx_hash) of transactions of addresses
+        without a receipt status, or outgoing without a fee, past rowid
+        after, to page through them."""
+        return self.conn.execute(
+            "SELECT rowid, address, tx_hash FROM transactions "
+            f"WHERE address IN ({', '.join('?' * len(addresses))}) AND rowid > ? "
+            "AND (status IS NULL OR (fee_wei IS NULL AND lower(tx_from) = address)) "
+            "ORDER BY rowid LIMIT ?",
+            [*addresses, after, limit]).fetchall()
+
+    def store_fees(self, fees):
+        """Set what is known of (address, tx_hash, fee_wei, status) rows; the
+        fee only sticks to outgoing transactions."""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE transactions SET status = coalesce(?, status), fee_wei = CASE "
+                "WHEN lower(tx_from) = address THEN coalesce(?, fee_wei) END "
+                "WHERE address = ? AND tx_hash = ?",
+                [(status, None if fee is None else str(fee), address, tx_hash)
+                 for address, tx_hash, fee, status in fees
+                 if fee is not None or status is not None])
+
+    def iter_rows(self, addresses):
+        """Raw indexed rows (address, block_number, tx_hash, tx_from, tx_to,
+        value_wei, fee_wei, status) of addresses, grouped by address and in
+        block order within it, straight off the cursor so a long history is
+        never held in memory. Amounts are wei strings."""
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        # A cursor of its own, as others may write while this one is read.
+        cursor = self.conn.cursor()
+        cursor.arraysize = DEFAULT_HISTORY_BATCH_SIZE
+        cursor.execute(
+            "SELECT address, block_number, tx_hash, tx_from, tx_to, value_wei, fee_wei, status "
+            f"FROM transactions WHERE address IN ({', '.join('?' * len(addresses))}) "
+            "ORDER BY address, block_number, rowid", list(addresses))
+        with closing(cursor):
+            while rows := cursor.fetchmany():
+                yield from rows
+
+    def transactions(self, addresses):
+        """Indexed transactions of one lowercase address or a list of them,
+        in block order, each tagged with the account it was matched for."""
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        rows = self.conn.execute(
+            "SELECT address, block_number, tx_from, tx_to, value_wei, tx_hash FROM transactions "
+            f"WHERE address IN ({', '.join('?' * len(addresses))}) "
+            "ORDER BY block_number, rowid", list(addresses))
+        return [{
+            "blockNumber": block_number,
+            "from": tx_from,
+            "to": tx_to,
+            "value": Web3.from_wei(int(value_wei), 'ether'),
+            "hash": tx_hash,
+            "account": address
+        } for address, block_number, tx_from, tx_to, value_wei, tx_hash in rows]
+
+def _add_fees(w3: Web3, transactions, batch_size: int):
+    # Every transaction needs its status, as a reverted one moves no value,
+    # but only the sender pays for it; incoming ones carry no fee.
+    if transactions:
+        outcomes = fetch_transaction_outcomes(w3, list({tx["hash"] for tx in transactions}),
+                                              batch_size)
+        for tx in transactions:
+            fee, tx["status"] = outcomes.get(tx["hash"], (None, None))
+            if tx["from"].lower() == tx["account"]:
+                tx["fee"] = fee
+
+def fill_missing_fees(w3: Web3, index: HistoryIndex, addresses,
+                      batch_size: int = DEFAULT_HISTORY_BATCH_SIZE) -> int:
+    """Look up the receipt status of indexed transactions and the fee of
+    outgoing ones where they are missing, e.g. for those indexed before
+    either was kept, a page of batch_size at a time. Returns how many rows
+    got their receipt; those whose receipt the node lacks stay unknown."""
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    addresses = list(dict.fromkeys(address.lower() for address in addresses))
+    filled = after = 0
+    while rows := index.missing_fees(addresses, after, batch_size):
+        outcomes = fetch_transaction_outcomes(w3, list({tx_hash for _, _, tx_hash in rows}),
+                                              batch_size)
+        index.store_fees([(address, tx_hash, *outcomes.get(tx_hash, (None, None)))
+                          for _, address, tx_hash in rows])
+        filled += sum(outcomes.get(tx_hash, (None, None)) != (None, None)
+                      for _, _, tx_hash in rows)
+        after = rows[-1][0]
+    return filled
+
+def _find_fork_point(w3: Web3, index: HistoryIndex, address: str, last_block: int) -> int:
+    # Walk the stored hashes from the tip down; the first one still on the
+    # canonical chain is where the index stays valid.
+    stored = index.stored_hashes(address)
+    for number, block_hash in stored:
+        try:
+            block = w3.eth.get_block(number)
+        except BlockNotFound:
+            continue
+        except Exception as e:
+            raise HistoryScanError(f"Unable to verify block {number}: {e}") from e
+        if Web3.to_hex(block.hash) == block_hash:
+            return number
+    if not stored:
+        return last_block
+    # Reorg deeper than the hashes we keep: rescan from before the oldest one.
+    return stored[-1][0] - 1
+
+def _scan_start(w3: Web3, index: HistoryIndex, address: str, head: int, lookback: int) -> int:
+    last_block = index.last_scanned_block(address)
+    if last_block is None:
+        return 0 if lookback <= 0 else max(0, head - lookback)
+    fork_point = _find_fork_point(w3, index, address, last_block)
+    if fork_point < last_block:
+        index.rollback(address, fork_point)
+    return fork_point + 1
+
+def iter_history_index(w3: Web3, index: HistoryIndex, addresses,
+                       lookback: int = DEFAULT_HISTORY_LOOKBACK,
+                       batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                       concurrency: int = DEFAULT_HISTORY_CONCURRENCY, indexed: bool = True):
+    """Bring the index for one address, or a list of them, up to the chain
+    head, yielding (transactions, blocks_done, blocks_total). The first item
+    carries the already indexed history (nothing without indexed), every
+    following one the matches of one newly scanned batch, which is committed
+    before it is yielded. Every transaction names its "account", outgoing
+    ones also the "fee" they paid in wei.
+
+    The first sync of an address starts lookback blocks below the head (0
+    scans from genesis); later syncs only scan blocks above its last scanned
+    height, after rolling back any range that was reorged out. All addresses
+    share one pass over the blocks from the lowest of their starting points,
+    so following more accounts costs no extra block fetches."""
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    addresses = list(dict.fromkeys(address.lower() for address in addresses))
+    try:
+        head = w3.eth.block_number
+    except Exception as e:
+        raise HistoryScanError(f"Unable to fetch block height: {e}") from e
+    starts = {address: _scan_start(w3, index, address, head, lookback) for address in addresses}
+    start_block = min(starts.values())
+    total = max(0, head - start_block + 1)
+    yield index.transactions(addresses) if indexed else [], 0, total
+    watched = set(addresses)
+    done = 0
+    for blocks in iter_blocks(w3, start_block, head, batch_size, concurrency, raw=True):
+        transactions = []
+        for block in blocks:
+            transactions.extend(match_raw_transactions(block, watched))
+        numbers = [int(block["number"], 16) for block in blocks]
+        block_hashes = [(number, block["hash"]) for number, block in zip(numbers, blocks)
+                        if number > head - HISTORY_REORG_DEPTH]
+        last_block = numbers[-1]
+        # An account already indexed past part of this batch only takes the
+        # blocks from its own starting point on.
+        transactions = [tx for tx in transactions if tx["blockNumber"] >= starts[tx["account"]]]
+        _add_fees(w3, transactions, batch_size)
+        index.record_many([
+            (address, last_block,
+             [(number, block_hash) for number, block_hash in block_hashes if number >= start],
+             [tx for tx in transactions if tx["account"] == address], start)
+            for address, start in starts.items() if last_block >= start])
+        done += len(blocks)
+        yield transactions, done, total
+
+def sync_history_index(w3: Web3, index: HistoryIndex, addresses,
+                       lookback: int = DEFAULT_HISTORY_LOOKBACK,
+                       batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                       concurrency: int = DEFAULT_HISTORY_CONCURRENCY):
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    addresses = [address.lower() for address in addresses]
+    for _ in iter_history_index(w3, index, addresses, lookback, batch_size, concurrency):
+        pass
+    return index.transactions(addresses)
+
+# -------------------------------
+# Full-Chain Scan Jobs
+# -------------------------------
+def scan_job_key(addresses) -> str:
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    return ",".join(sorted({address.lower() for address in addresses}))
+
+def format_eta(seconds) -> str:
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+def iter_chain_scan(w3: Web3, index: HistoryIndex, addresses, from_block: int = 0,
+                    rate: int = DEFAULT_HISTORY_SCAN_RATE,
+                    window: int = DEFAULT_HISTORY_SCAN_WINDOW,
+                    batch_size: int = DEFAULT_HISTORY_BATCH_SIZE,
+                    concurrency: int = DEFAULT_HISTORY_CONCURRENCY, stop=None):
+    """Backfill the index of one address, or a list of them, from from_block
+    up to where their regular sync began (the head for addresses never
+    synced), yielding (transactions, progress) after every window.
+
+    Windows of window blocks are committed together with a checkpoint, so a
+    job that is stopped, crashes or loses its node resumes where it left off
+    when called again with the same addresses and from_block; another
+    from_block starts the job over. When the node fails a window the job
+    waits, backing off up to HISTORY_SCAN_MAX_BACKOFF seconds, and retries
+    it instead of giving up. With rate, block requests are held to that many
+    per second on average. Setting the stop event ends the job after the
+    current window or wait.
+
+    progress has status (scanning, waiting, stopped or done), from_block,
+    to_block, next_block, blocks_done and blocks_total over the whole job,
+    blocks_per_second and eta in seconds over this run, the number of
+    transactions found in this run, and the error behind a wait."""
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    addresses = list(dict.fromkeys(address.lower() for address in addresses))
+    stop = stop or threading.Event()
+    key = scan_job_key(addresses)
+    job = index.scan_job(key)
+    if job is None or job[0] != from_block:
+        try:
+            head = w3.eth.block_number
+        except Exception as e:
+            raise HistoryScanError(f"Unable to fetch block height: {e}") from e
+        ends = []
+        for address in addresses:
+            if index.last_scanned_block(address) is None:
+                ends.append(head)
+            else:
+                first_block = index.first_scanned_block(address)
+                ends.append(index.last_scanned_block(address) if first_block is None
+                            else first_block - 1)
+        index.start_scan_job(key, from_block, max(ends))
+        job = index.scan_job(key)
+    from_block, to_block, next_block = job
+    if rate > 0:
+        # Keep each burst to about a second's worth of the budget.
+        window = min(window, rate)
+    window = max(1, window)
+    watched = set(addresses)
+    progress = {"status": "scanning", "from_block": from_block, "to_block": to_block,
+                "next_block": next_block, "blocks_done": next_block - from_block,
+                "blocks_total": max(0, to_block - from_block + 1), "blocks_per_second": None,
+                "eta": None, "transactions": 0, "error": None}
+    started = budget_start = time.monotonic()
+    scanned = budget_blocks = 0
+    backoff = 0
+    while next_block <= to_block and not stop.is_set():
+        end_block = min(next_block + window - 1, to_block)
+        if rate > 0:
+            delay = budget_start + budget_blocks / rate - time.monotonic()
+            if delay > 0 and stop.wait(delay):
+                break
+        transactions, block_hashes = [], []
+        try:
+            blocks_iter = iter_blocks(w3, next_block, end_block, batch_size, concurrency, raw=True)
+            with closing(blocks_iter):
+                for blocks in blocks_iter:
+                    if stop.is_set():
+                        break
+                    for block in blocks:
+                        transactions.extend(match_raw_transactions(block, watched))
+                        number = int(block["number"], 16)
+                        if number > to_block - HISTORY_REORG_DEPTH:
+                            block_hashes.extend((address, number, block["hash"])
+                                                for address in addresses)
+            if not stop.is_set():
+                _add_fees(w3, transactions, batch_size)
+        except HistoryScanError as e:
+            backoff = min(max(backoff * 2, HISTORY_SCAN_MIN_BACKOFF), HISTORY_SCAN_MAX_BACKOFF)
+            progress.update(status="waiting", error=f"{e}; retrying in {backoff}s")
+            yield [], dict(progress)
+            waited = time.monotonic()
+            if stop.wait(backoff):
+                break
+            # The outage counts neither against the speed nor the budget.
+            started += time.monotonic() - waited
+            budget_start, budget_blocks = time.monotonic(), 0
+            continue
+        if stop.is_set():
+            break
+        backoff = 0
+        index.checkpoint_scan_job(key, end_block + 1, transactions, block_hashes)
+        scanned += end_block - next_block + 1
+        budget_blocks += end_block - next_block + 1
+        next_block = end_block + 1
+        speed = scanned / max(time.monotonic() - started, 1e-9)
+        progress.update(status="scanning", next_block=next_block,
+                        blocks_done=next_block - from_block, blocks_per_second=speed,
+                        eta=(to_block - next_block + 1) / speed,
+                        transactions=progress["transactions"] + len(transactions), error=None)
+        yield transactions, dict(progress)
+    if next_block > to_block:
+        index.finish_scan_job(key, addresses, from_block, to_block)
+        progress.update(status="done", eta=0)
+    else:
+        progress.update(status="stopped")
+    yield [], dict(progress)
@@ -0,0 +1,343 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Encrypted r5.key handling and the unlocked wallet session."""
+
+import os
+import json
+import base64
+import hmac
+import hashlib
+import time
+import threading
+import statistics
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+from r5wallet.config import (WALLET_FILENAME, DEFAULT_SESSION_TIMEOUT, KEYSTORE_VERSION,
+                             KDF_PBKDF2, KDF_SCRYPT, DEFAULT_KDF, DEFAULT_KDF_TARGET_MS,
+                             LEGACY_KDF_PARAMS, MIN_KDF_PARAMS, MAX_SCRYPT_N,
+                             HD_DEFAULT_PATH, HD_MNEMONIC_WORDS)
+
+# -------------------------------
+# Wallet Helper Functions (same as CLI version)
+# -------------------------------
+def derive_key(password: str, salt: bytes, kdf: str = KDF_PBKDF2, params: dict = None) -> bytes:
+    params = params or (LEGACY_KDF_PARAMS if kdf == KDF_PBKDF2 else MIN_KDF_PARAMS.get(kdf))
+    if kdf == KDF_SCRYPT:
+        kdf_impl = Scrypt(
+            salt=salt,
+            length=32,
+            n=params["n"],
+            r=params["r"],
+            p=params["p"],
+        )
+    elif kdf == KDF_PBKDF2:
+        kdf_impl = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=params["iterations"],
+        )
+    else:
+        raise ValueError(f"Unsupported KDF: {kdf}")
+    return base64.urlsafe_b64encode(kdf_impl.derive(password.encode()))
+
+def keystore_kdf(file_data: dict):
+    """The (kdf, params) a wallet file was written with."""
+    if file_data.get("version", 1) < 2:
+        return KDF_PBKDF2, LEGACY_KDF_PARAMS
+    return file_data["kdf"], file_data["kdf_params"]
+
+def keystore_needs_migration(file_data: dict, kdf: str) -> bool:
+    return file_data.get("version", 1) < KEYSTORE_VERSION or keystore_kdf(file_data)[0] != kdf
+
+def _time_kdf(kdf: str, params: dict, salt: bytes) -> float:
+    start = time.perf_counter()
+    derive_key("calibration", salt, kdf, params)
+    return time.perf_counter() - start
+
+def calibrate_kdf(kdf: str = DEFAULT_KDF, target_ms: int = DEFAULT_KDF_TARGET_MS) -> dict:
+    """Pick the strongest parameters that still derive in about target_ms on
+    this machine, never weaker than MIN_KDF_PARAMS."""
+    salt = os.urandom(16)
+    target = target_ms / 1000
+    params = dict(MIN_KDF_PARAMS[kdf])
+    if kdf == KDF_SCRYPT:
+        # Cost is linear in n, so keep doubling while the next step fits.
+        elapsed = _time_kdf(kdf, params, salt)
+        while params["n"] < MAX_SCRYPT_N and elapsed * 2 <= target:
+            params["n"] *= 2
+            elapsed = _time_kdf(kdf, params, salt)
+    elif kdf == KDF_PBKDF2:
+        elapsed = _time_kdf(kdf, params, salt)
+        scaled = int(params["iterations"] * target / elapsed) // 10000 * 10000
+        params["iterations"] = max(params["iterations"], scaled)
+    else:
+        raise ValueError(f"Unsupported KDF: {kdf}")
+    return params
+
+def encrypt_wallet(wallet: dict, password: str, kdf: str = DEFAULT_KDF, kdf_params: dict = None) -> dict:
+    if kdf_params is None:
+        kdf_params = calibrate_kdf(kdf)
+    salt = os.urandom(16)
+    key = derive_key(password, salt, kdf, kdf_params)
+    return encrypt_wallet_with_key(wallet, key, salt, kdf, kdf_params)
+
+def encrypt_wallet_with_key(wallet: dict, key: bytes, salt: bytes, kdf: str, kdf_params: dict) -> dict:
+    f = Fernet(key)
+    wallet_json = json.dumps(wallet).encode()
+    encrypted_wallet = f.encrypt(wallet_json)
+    return {
+        "version": KEYSTORE_VERSION,
+        "kdf": kdf,
+        "kdf_params": kdf_params,
+        "salt": base64.urlsafe_b64encode(salt).decode(),
+        "wallet": encrypted_wallet.decode()
+    }
+
+def decrypt_wallet(file_data: dict, password: str) -> dict:
+    salt = base64.urlsafe_b64decode(file_data["salt"])
+    key = derive_key(password, salt, *keystore_kdf(file_data))
+    return decrypt_wallet_with_key(file_data, key)
+
+def decrypt_wallet_with_key(file_data: dict, key: bytes) -> dict:
+    f = Fernet(key)
+    decrypted = f.decrypt(file_data["wallet"].encode())
+    wallet = json.loads(decrypted.decode())
+    return wallet
+
+def write_wallet_file(file_contents: dict, path: str = WALLET_FILENAME):
+    # Write next to the target and swap it in, so a crash never leaves a
+    # half-written key file behind.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(file_contents, f)
+    os.replace(tmp_path, path)
+
+def benchmark_kdf(rounds: int = 3):
+    """Median decrypt_wallet latency for the legacy format and a range of
+    PBKDF2 and scrypt settings."""
+    wallet = {"private_key": "00" * 32, "public_key": ""}
+    settings = [(KDF_PBKDF2, LEGACY_KDF_PARAMS),
+                (KDF_PBKDF2, {"iterations": 600000})]
+    settings += [(KDF_SCRYPT, {"n": 2 ** exp, "r": 8, "p": 1}) for exp in range(14, 19)]
+    results = []
+    for kdf, params in settings:
+        file_data = encrypt_wallet(wallet, "benchmark", kdf, params)
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            decrypt_wallet(file_data, "benchmark")
+            timings.append(time.perf_counter() - start)
+        results.append({"kdf": kdf, "params": params,
+                        "decrypt_ms": round(statistics.median(timings) * 1000, 1)})
+    return results
+
+# -------------------------------
+# Unlocked Wallet Session
+# -------------------------------
+class WalletLockedError(Exception):
+    pass
+
+class WalletSession:
+    """An unlocked wallet. Keeps the derived file key, the signing account and
+    the address so sensitive actions and re-encryption do not redo the KDF or
+    the key derivation. After idle_timeout seconds without use the secrets are
+    overwritten and dropped; the address stays available. Python strings
+    cannot be wiped, so the zeroization is best effort."""
+
+    def __init__(self, wallet: dict, key: bytes, salt: bytes, kdf: str, kdf_params: dict,
+                 password: str, idle_timeout: int = DEFAULT_SESSION_TIMEOUT,
+                 path: str = WALLET_FILENAME):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        # Reentrant: the idle check locks the session from inside a locked
+        # section.
+        self._lock = threading.RLock()
+        self._set_secrets(wallet, key, salt, kdf, kdf_params, password)
+        self.address = self._account.address
+        self.public_key = wallet.get("public_key", "")
+
+    def _set_secrets(self, wallet, key, salt, kdf, kdf_params, password):
+        # eth_account takes most of a second to import; only unlocking needs it.
+        from eth_account import Account
+        self._wallet = dict(wallet)
+        self._account = Account.from_key(wallet["private_key"])
+        self._key = bytearray(key)
+        self._salt = salt
+        self.kdf = kdf
+        self.kdf_params = kdf_params
+        # A memory-only password check, so confirming a sensitive action does
+        # not cost another KDF run while the session is unlocked.
+        self._pepper = bytearray(os.urandom(32))
+        self._verifier = bytearray(hmac.new(self._pepper, password.encode(), hashlib.sha256).digest())
+        self._last_used = time.monotonic()
+
+    @staticmethod
+    def _open(file_data, password, kdf, kdf_target_ms, path):
+        # Decrypt with the file's own KDF; on success move an old or
+        # differently configured file over to the current format.
+        salt = base64.urlsafe_b64decode(file_data["salt"])
+        file_kdf, file_params = keystore_kdf(file_data)
+        key = derive_key(password, salt, file_kdf, file_params)
+        wallet = decrypt_wallet_with_key(file_data, key)
+        if keystore_needs_migration(file_data, kdf):
+            file_kdf, file_params = kdf, calibrate_kdf(kdf, kdf_target_ms)
+            salt = os.urandom(16)
+            key = derive_key(password, salt, file_kdf, file_params)
+            write_wallet_file(encrypt_wallet_with_key(wallet, key, salt, file_kdf, file_params), path)
+        return wallet, key, salt, file_kdf, file_params
+
+    @classmethod
+    def unlock_file(cls, file_data: dict, password: str,
+                    idle_timeout: int = DEFAULT_SESSION_TIMEOUT, path: str = WALLET_FILENAME,
+                    kdf: str = DEFAULT_KDF, kdf_target_ms: int = DEFAULT_KDF_TARGET_MS):
+        wallet, key, salt, file_kdf, file_params = cls._open(file_data, password, kdf,
+                                                             kdf_target_ms, path)
+        return cls(wallet, key, salt, file_kdf, file_params, password, idle_timeout, path)
+
+    @classmethod
+    def create_file(cls, wallet: dict, password: str,
+                    idle_timeout: int = DEFAULT_SESSION_TIMEOUT, path: str = WALLET_FILENAME,
+                    kdf: str = DEFAULT_KDF, kdf_target_ms: int = DEFAULT_KDF_TARGET_MS):
+        kdf_params = calibrate_kdf(kdf, kdf_target_ms)
+        salt = os.urandom(16)
+        key = derive_key(password, salt, kdf, kdf_params)
+        write_wallet_file(encrypt_wallet_with_key(wallet, key, salt, kdf, kdf_params), path)
+        return cls(wallet, key, salt, kdf, kdf_params, password, idle_timeout, path)
+
+    @property
+    def locked(self) -> bool:
+        return self._wallet is None
+
+    def check_idle(self):
+        with self._lock:
+            if not self.locked and time.monotonic() - self._last_used > self.idle_timeout:
+                self.lock()
+
+    def lock(self):
+        with self._lock:
+            for secret in (self._key, self._pepper, self._verifier):
+                if secret is not None:
+                    secret[:] = bytes(len(secret))
+            self._wallet = None
+            self._account = None
+            self._key = None
+            self._pepper = None
+            self._verifier = None
+
+    def unlock(self, password: str):
+        """Re-derive the key from the wallet file. Raises on a wrong password."""
+        with open(self.path, "r") as f:
+            file_data = json.load(f)
+        salt = base64.urlsafe_b64decode(file_data["salt"])
+        kdf, kdf_params = keystore_kdf(file_data)
+        key = derive_key(password, salt, kdf, kdf_params)
+        wallet = decrypt_wallet_with_key(file_data, key)
+        with self._lock:
+            self._set_secrets(wallet, key, salt, kdf, kdf_params, password)
+
+    def verify_password(self, password: str) -> bool:
+        """Check password, unlocking the session with it when locked."""
+        self.check_idle()
+        with self._lock:
+            if not self.locked:
+                digest = hmac.new(self._pepper, password.encode(), hashlib.sha256).digest()
+                if hmac.compare_digest(digest, bytes(self._verifier)):
+                    self._last_used = time.monotonic()
+                    return True
+                return False
+        try:
+            self.unlock(password)
+        except Exception:
+            return False
+        return True
+
+    def _unlocked(self):
+        # Callers hold self._lock from this check through their use of the
+        # secrets, so the idle timer cannot wipe them in between.
+        self.check_idle()
+        if self.locked:
+            raise WalletLockedError("Wallet is locked")
+        self._last_used = time.monotonic()
+
+    def __getitem__(self, name):
+        # Lets the session stand in for the decrypted wallet dict.
+        with self._lock:
+            self._unlocked()
+            return self._wallet[name]
+
+    def get(self, name, default=None):
+        with self._lock:
+            self._unlocked()
+            return self._wallet.get(name, default)
+
+    @property
+    def account(self):
+        with self._lock:
+            self._unlocked()
+            return self._account
+
+    def encrypt(self, wallet: dict) -> dict:
+        """Re-encrypt with the cached key, no KDF run."""
+        with self._lock:
+            self._unlocked()
+            return encrypt_wallet_with_key(wallet, bytes(self._key), self._salt,
+                                           self.kdf, self.kdf_params)
+
+def wallet_from_private_key(private_key: str) -> dict:
+    """Raises ValueError for anything that is not a secp256k1 key in hex."""
+    from ecdsa import SigningKey, SECP256k1
+    private_key = private_key.strip()
+    try:
+        sk = SigningKey.from_string(bytes.fromhex(private_key), curve=SECP256k1)
+    except Exception:
+        raise ValueError("Invalid private key format.")
+    vk = sk.get_verifying_key()
+    wallet = {
+        "private_key": private_key,
+        "public_key": vk.to_string().hex()
+    }
+    return wallet
+
+def create_new_wallet():
+    from ecdsa import SigningKey, SECP256k1
+    sk = SigningKey.generate(curve=SECP256k1)
+    vk = sk.get_verifying_key()
+    wallet = {
+        "private_key": sk.to_string().hex(),
+        "public_key": vk.to_string().hex()
+    }
+    return wallet
+
+def wallet_from_mnemonic(phrase: str, passphrase: str = "", path: str = None) -> dict:
+    """The wallet for the key at path (first BIP-44 address by default)
+    below a seed phrase. Raises ValueError for an invalid phrase or path.
+    The phrase is kept in the wallet so it can be exported again."""
+    from r5wallet.hd import HDKeychain, normalize_mnemonic
+    phrase = normalize_mnemonic(phrase)
+    path = path or HD_DEFAULT_PATH + "/0"
+    key = HDKeychain.from_mnemonic(phrase, passphrase).node(path)
+    return {
+        "private_key": key.private_key_hex(),
+        "public_key": f"{key.point[0]:064x}{key.point[1]:064x}",
+        "mnemonic": phrase,
+        "mnemonic_passphrase": passphrase,
+        "hd_path": path,
+    }
+
+def create_hd_wallet(num_words: int = HD_MNEMONIC_WORDS, passphrase: str = "") -> dict:
+    from r5wallet.hd import generate_mnemonic
+    return wallet_from_mnemonic(generate_mnemonic(num_words), passphrase)
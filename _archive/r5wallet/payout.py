@@ -0,0 +1,278 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Headless bulk payouts with a resumable journal."""
+
+import os
+import re
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from r5wallet.config import (DEFAULT_TX_TIMEOUT, DEFAULT_PAYOUT_WINDOW, PAYOUT_SIGN_CHUNK,
+                             PAYOUT_POLL_INTERVAL)
+from r5wallet.chain import NonceManager, get_wallet_address, sign_transaction
+
+# -------------------------------
+# Bulk Payouts
+# -------------------------------
+class PayoutError(Exception):
+    pass
+
+def load_payouts(path: str) -> list:
+    """Read (to, amount) rows from a CSV (optional to,amount header) or
+    JSONL file. Every row is checked before anything is signed; all bad rows
+    are reported together."""
+    rows, errors = [], []
+    with open(path, "r", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            records = []
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    records.append((line_no, record["to"], record["amount"]))
+                except (ValueError, KeyError, TypeError):
+                    errors.append(f"line {line_no}: expected an object with to and amount")
+        else:
+            records = []
+            for line_no, record in enumerate(csv.reader(f), 1):
+                if not record or not "".join(record).strip():
+                    continue
+                if line_no == 1 and record[0].strip().lower() == "to":
+                    continue
+                if len(record) < 2:
+                    errors.append(f"line {line_no}: expected to,amount")
+                    continue
+                records.append((line_no, record[0], record[1]))
+    for line_no, to, amount in records:
+        to = str(to).strip()
+        if not Web3.is_address(to):
+            errors.append(f"line {line_no}: invalid address {to!r}")
+            continue
+        try:
+            amount = Decimal(str(amount).strip())
+        except InvalidOperation:
+            errors.append(f"line {line_no}: invalid amount {amount!r}")
+            continue
+        if not amount.is_finite() or amount <= 0:
+            errors.append(f"line {line_no}: amount must be positive")
+            continue
+        rows.append({"row": len(rows), "to": Web3.to_checksum_address(to),
+                     "value": Web3.to_wei(amount, "ether")})
+    if errors:
+        raise PayoutError("\n".join(errors))
+    return rows
+
+class PayoutJournal:
+    """Append-only JSONL log of every payout row's progress. A row is written
+    with its nonce and signed bytes, and fsynced, before it is broadcast, so
+    a resumed run re-sends the identical transaction instead of signing a
+    second one. Replaying the file gives the latest state of each row."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash
+                    self.entries.setdefault(entry["row"], {}).update(entry)
+        self._file = open(path, "a")
+
+    def write(self, entries, sync=True):
+        for entry in entries:
+            self.entries.setdefault(entry["row"], {}).update(entry)
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+_payout_wallet = None
+
+def _init_payout_signer(private_key):
+    global _payout_wallet
+    _payout_wallet = {"private_key": private_key}
+
+def _sign_payout_chunk(txs):
+    signed = []
+    for tx in txs:
+        signed_tx = sign_transaction(None, _payout_wallet, tx)
+        signed.append((Web3.to_hex(signed_tx.hash), Web3.to_hex(signed_tx.raw_transaction)))
+    return signed
+
+# How nodes reject a transaction their pool or chain already has. Matched
+# as whole words: a bare "known" is also in "unknown account" and the like.
+_ALREADY_SENT_ERRORS = re.compile(r"\b(already known|known transaction|nonce too low)\b")
+
+def _already_sent(error: Exception) -> bool:
+    # A re-broadcast after a crash may find the transaction already in the
+    # pool or mined; the receipt check settles which.
+    return _ALREADY_SENT_ERRORS.search(str(error).lower()) is not None
+
+def _estimate_payout_gas(w3: Web3, sender: str, destination: str, value: int):
+    # Unlike chain.estimate_gas this never falls back to 21000, which for a
+    # contract destination signs, and pays for, a transaction sure to fail.
+    try:
+        return w3.eth.estimate_gas({"from": sender, "to": destination, "value": value}), None
+    except Exception as e:
+        return None, e
+
+def run_payouts(w3: Web3, wallet: dict, rows: list, journal: PayoutJournal,
+                window: int = DEFAULT_PAYOUT_WINDOW, workers: int = None, log=print) -> dict:
+    """Sign, broadcast and confirm payout rows. Rows the journal already has
+    are never re-signed: mined ones are skipped and the rest are re-sent as
+    recorded. At most window transactions are unconfirmed at once. Raises
+    PayoutError before signing anything when gas cannot be estimated for a
+    new row."""
+    address = get_wallet_address(wallet, w3)
+    for row in rows:
+        recorded = journal.entries.get(row["row"])
+        if recorded and (recorded["to"] != row["to"] or recorded["value"] != row["value"]):
+            raise PayoutError(f"Row {row['row'] + 1} differs from journal {journal.path}; "
+                              "refusing to resume with a changed payout file.")
+    todo = [row for row in rows if row["row"] not in journal.entries]
+    started = time.monotonic()
+
+    if todo:
+        nonce_manager = NonceManager(w3, address)
+        journaled = [e["nonce"] for e in journal.entries.values() if "nonce" in e]
+        if journaled:
+            nonce_manager.skip_to(max(journaled) + 1)
+        gas_price = w3.eth.gas_price
+        chain_id = w3.eth.chain_id
+        destinations = {(row["to"], row["value"]) for row in todo}
+        with ThreadPoolExecutor(max_workers=window) as pool:
+            gas = dict(zip(destinations, pool.map(
+                lambda d: _estimate_payout_gas(w3, address, d[0], d[1]), destinations)))
+        failed = [(row, gas[(row["to"], row["value"])][1]) for row in todo
+                  if gas[(row["to"], row["value"])][1] is not None]
+        if failed:
+            raise PayoutError(f"Gas estimation failed for {len(failed)} rows, nothing was signed:\n"
+                              + "\n".join(f"row {row['row'] + 1} to {row['to']}: {error}"
+                                          for row, error in failed[:20]))
+        gas = {destination: limit for destination, (limit, _) in gas.items()}
+        txs = [{"to": row["to"], "value": row["value"], "gas": gas[(row["to"], row["value"])],
+                "gasPrice": gas_price, "chainId": chain_id, "nonce": nonce_manager.next_nonce()}
+               for row in todo]
+        workers = workers or os.cpu_count() or 1
+        chunk = max(1, min(PAYOUT_SIGN_CHUNK, len(txs) // workers or 1))
+        chunks = [txs[i:i + chunk] for i in range(0, len(txs), chunk)]
+        # Forked signers only pay off with spare cores; on one they just add
+        # start-up and pickling cost.
+        pool = None
+        if workers > 1 and len(chunks) > 1:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_payout_signer,
+                                       initargs=(wallet["private_key"],))
+        else:
+            _init_payout_signer(wallet["private_key"])
+        try:
+            results = (pool.map if pool else map)(_sign_payout_chunk, chunks)
+            for start, signed in zip(range(0, len(txs), chunk), results):
+                journal.write([
+                    {"row": row["row"], "to": row["to"], "value": row["value"],
+                     "nonce": tx["nonce"], "hash": tx_hash, "raw": raw, "status": "signed"}
+                    for row, tx, (tx_hash, raw) in zip(todo[start:], txs[start:], signed)])
+        finally:
+            if pool:
+                pool.shutdown()
+            _init_payout_signer(None)
+        sign_elapsed = time.monotonic() - started
+        log(f"Estimated and signed {len(txs)} transactions in {sign_elapsed:.2f}s "
+            f"({len(txs) / max(sign_elapsed, 1e-9):.1f} tx/s)")
+
+    # Anything not settled is re-sent byte for byte; the nonce makes that safe.
+    queue = deque(sorted((e for e in journal.entries.values()
+                          if e["status"] in ("signed", "sent", "error", "dropped")),
+                         key=lambda e: e["nonce"]))
+    in_flight = {}
+    confirmed = 0
+    halted = None
+
+    def check(entry):
+        # (entry, receipt, answered): a transport error is no receipt yet,
+        # asked again next round, but says nothing about the transaction.
+        try:
+            return entry, w3.eth.get_transaction_receipt(entry["hash"]), True
+        except TransactionNotFound:
+            return entry, None, True
+        except Exception:
+            return entry, None, False
+
+    with ThreadPoolExecutor(max_workers=window) as pool:
+        while queue or in_flight:
+            while queue and len(in_flight) < window and halted is None:
+                entry = queue.popleft()
+                try:
+                    w3.eth.send_raw_transaction(entry["raw"])
+                except Exception as e:
+                    if not _already_sent(e):
+                        # Later nonces would only queue up behind the gap.
+                        halted = f"row {entry['row'] + 1} (nonce {entry['nonce']}): {e}"
+                        journal.write([{"row": entry["row"], "status": "error", "error": str(e)}])
+                        break
+                if entry["status"] != "sent":
+                    journal.write([{"row": entry["row"], "status": "sent"}], sync=False)
+                entry["sent_at"] = time.monotonic()
+                in_flight[entry["hash"]] = entry
+            if halted is not None and not in_flight:
+                break
+            chain_nonce = None
+            finished = []
+            for entry, receipt, answered in pool.map(check, list(in_flight.values())):
+                if receipt is not None:
+                    status = "mined" if receipt["status"] == 1 else "failed"
+                    finished.append({"row": entry["row"], "status": status,
+                                     "blockNumber": receipt["blockNumber"]})
+                    continue
+                if answered and chain_nonce is None:
+                    try:
+                        chain_nonce = w3.eth.get_transaction_count(address, "latest")
+                    except Exception:
+                        answered = False
+                if answered and chain_nonce > entry["nonce"] and check(entry)[1:] == (None, True):
+                    # Something else spent this nonce; paying again is the
+                    # operator's call, not ours.
+                    finished.append({"row": entry["row"], "status": "replaced"})
+                elif time.monotonic() - entry["sent_at"] > DEFAULT_TX_TIMEOUT:
+                    finished.append({"row": entry["row"], "status": "dropped"})
+            if finished:
+                journal.write(finished)
+                for update in finished:
+                    del in_flight[journal.entries[update["row"]]["hash"]]
+                confirmed += len(finished)
+                elapsed = time.monotonic() - started
+                log(f"{confirmed} confirmed, {len(in_flight)} in flight, {len(queue)} queued "
+                    f"({confirmed / max(elapsed, 1e-9):.1f} tx/s)")
+            else:
+                time.sleep(PAYOUT_POLL_INTERVAL)
+
+    elapsed = time.monotonic() - started
+    statuses = [journal.entries.get(row["row"], {}).get("status", "pending") for row in rows]
+    summary = {status: statuses.count(status) for status in set(statuses)}
+    summary["elapsed"] = elapsed
+    summary["tx_per_second"] = confirmed / max(elapsed, 1e-9)
+    if halted:
+        summary["halted"] = halted
+    return summary
@@ -0,0 +1,538 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""JSON-RPC transport: endpoint pool, call metrics and response cache."""
+
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+import requests
+from web3 import Web3, JSONBaseProvider
+from web3.middleware import Web3Middleware
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+from r5wallet.config import (RPC_CACHE_FILENAME, DEFAULT_HISTORY_CONCURRENCY, DEFAULT_RPC_TIMEOUT,
+                             RPC_LATENCY_SMOOTHING, RPC_MAX_COOLDOWN, DEFAULT_RPC_CACHE_SIZE,
+                             RPC_CACHE_DISK_ROWS, RPC_CACHE_FINALITY_DEPTH, RPC_CACHE_RECENT_TTL,
+                             RPC_CACHE_TTLS, RPC_CACHE_BLOCK_PARAMS, RPC_CACHE_BY_HASH,
+                             RPC_CACHE_MEMORY_ONLY,
+                             RPC_LATENCY_BUCKETS, RPC_RECENT_CALLS, int_setting, rpc_addresses)
+
+# -------------------------------
+# RPC Call Metrics
+# -------------------------------
+class RPCMetrics:
+    """Per-method counters and latency histograms for everything an
+    RPCPoolProvider sends, plus the last RPC_RECENT_CALLS requests. Recorded
+    at the transport, so errors count even where a caller swallows them.
+
+    A batch is one request named "batch:" plus its sorted distinct methods;
+    its calls count every entry. Latency is the wall time of the request
+    including failovers, and every failover counts as a retry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+        self.recent = deque(maxlen=RPC_RECENT_CALLS)
+
+    def record(self, method, elapsed, calls=1, request_bytes=0, response_bytes=0,
+               errors=0, retries=0, endpoint=None):
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = {
+                    "requests": 0, "calls": 0, "errors": 0, "retries": 0, "seconds": 0.0,
+                    "request_bytes": 0, "response_bytes": 0,
+                    "buckets": [0] * len(RPC_LATENCY_BUCKETS),
+                }
+            stats["requests"] += 1
+            stats["calls"] += calls
+            stats["errors"] += errors
+            stats["retries"] += retries
+            stats["seconds"] += elapsed
+            stats["request_bytes"] += request_bytes
+            stats["response_bytes"] += response_bytes
+            for i, bound in enumerate(RPC_LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats["buckets"][i] += 1
+                    break
+            self.recent.append({"time": time.time(), "method": method, "elapsed": elapsed,
+                                "calls": calls, "request_bytes": request_bytes,
+                                "response_bytes": response_bytes, "errors": errors,
+                                "retries": retries, "endpoint": endpoint})
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {method: dict(stats, buckets=list(stats["buckets"]))
+                    for method, stats in self._methods.items()}
+
+    def slowest(self, count: int = 20) -> list:
+        with self._lock:
+            recent = list(self.recent)
+        return sorted(recent, key=lambda call: call["elapsed"], reverse=True)[:count]
+
+    def prometheus(self, prefix: str = "r5wallet_rpc") -> str:
+        """The counters in the Prometheus text exposition format."""
+        methods = self.snapshot()
+        lines = []
+        for name, key, kind, text in [
+                ("requests_total", "requests", "counter", "HTTP requests sent"),
+                ("calls_total", "calls", "counter", "JSON-RPC calls sent, batch entries included"),
+                ("errors_total", "errors", "counter", "Failed requests and JSON-RPC error responses"),
+                ("retries_total", "retries", "counter", "Requests retried on another endpoint"),
+                ("request_bytes_total", "request_bytes", "counter", "Request body bytes"),
+                ("response_bytes_total", "response_bytes", "counter", "Response body bytes")]:
+            lines += [f"# HELP {prefix}_{name} {text}.", f"# TYPE {prefix}_{name} {kind}"]
+            lines += [f'{prefix}_{name}{{method="{method}"}} {stats[key]}'
+                      for method, stats in sorted(methods.items())]
+        name = f"{prefix}_request_duration_seconds"
+        lines += [f"# HELP {name} Request latency including failovers.", f"# TYPE {name} histogram"]
+        for method, stats in sorted(methods.items()):
+            cumulative = 0
+            for bound, count in zip(RPC_LATENCY_BUCKETS, stats["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{method="{method}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{method="{method}",le="+Inf"}} {stats["requests"]}')
+            lines.append(f'{name}_sum{{method="{method}"}} {stats["seconds"]:.6f}')
+            lines.append(f'{name}_count{{method="{method}"}} {stats["requests"]}')
+        return "\n".join(lines) + "\n"
+
+    def summary_line(self) -> str:
+        """One log line: totals, then the three methods with the most time."""
+        methods = self.snapshot()
+        requests_sent = sum(stats["requests"] for stats in methods.values())
+        line = (f"rpc: {requests_sent} requests, "
+                f"{sum(stats['calls'] for stats in methods.values())} calls, "
+                f"{sum(stats['errors'] for stats in methods.values())} errors, "
+                f"{sum(stats['retries'] for stats in methods.values())} retries, "
+                f"{sum(stats['response_bytes'] for stats in methods.values()) / 1e6:.1f} MB in")
+        busiest = sorted(methods.items(), key=lambda item: item[1]["seconds"], reverse=True)[:3]
+        return line + "".join(f"; {method} {stats['requests']}x avg "
+                              f"{stats['seconds'] / stats['requests'] * 1000:.0f}ms"
+                              for method, stats in busiest)
+
+def _batch_name(batch_requests) -> str:
+    return "batch:" + "+".join(sorted({method for method, _ in batch_requests}))
+
+def _count_errors(response) -> int:
+    if isinstance(response, list):
+        return sum(1 for entry in response if isinstance(entry, dict) and "error" in entry)
+    return 1 if isinstance(response, dict) and "error" in response else 0
+
+# Body sizes of the last exchange on this thread, set by the session hook.
+_exchange = threading.local()
+
+def _measure_exchange(response, *args, **kwargs):
+    body = response.request.body or b""
+    _exchange.sizes = (len(body), len(response.content))
+
+# -------------------------------
+# RPC Endpoint Pool
+# -------------------------------
+class PoolEndpoint:
+    """One endpoint of an RPCPoolProvider with its keep-alive session and a
+    rolling view of its latency and error rate."""
+
+    def __init__(self, uri, timeout, pool_size):
+        self.uri = uri
+        self.timeout = timeout
+        self.session = session = requests.Session()
+        session.hooks["response"].append(_measure_exchange)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        # Retries are the pool's job: trying the next endpoint beats waiting
+        # on a dead one.
+        self.provider = Web3.HTTPProvider(uri, request_kwargs={"timeout": timeout},
+                                          session=session, exception_retry_configuration=None)
+        self.latency = None  # smoothed seconds, None until the first answer
+        self.error_rate = 0.0
+        self.failures = 0  # consecutive
+        self.down_until = 0.0
+        self.in_flight = 0
+        self.calls = 0
+
+    def post(self, body: bytes) -> bytes:
+        response = self.session.post(self.uri, data=body, timeout=self.timeout,
+                                     headers={"Content-Type": "application/json"})
+        response.raise_for_status()
+        return response.content
+
+    def score(self):
+        # Untried endpoints score 0 so they get measured; busy ones are spread
+        # over, which lets concurrent scans fan out across the pool.
+        latency = self.latency or 0.0
+        return latency * (1 + self.in_flight) * (1 + 4 * self.error_rate)
+
+class RPCPoolProvider(JSONBaseProvider):
+    """Sends every call to the healthiest of several HTTP endpoints and fails
+    over to the next one on transport errors. A failing endpoint is skipped
+    for an exponentially growing cooldown, capped at RPC_MAX_COOLDOWN."""
+
+    def __init__(self, endpoint_uris, timeout=DEFAULT_RPC_TIMEOUT,
+                 pool_size=DEFAULT_HISTORY_CONCURRENCY, metrics=None, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoints = [PoolEndpoint(uri, timeout, max(pool_size, 1)) for uri in endpoint_uris]
+        self.metrics = metrics or RPCMetrics()
+        # Set by connect(); make_raw_batch_request bypasses the middleware holding it.
+        self.cache = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f"RPC pool {', '.join(e.uri for e in self.endpoints)}"
+
+    def _ranked(self):
+        now = time.monotonic()
+        with self._lock:
+            up = sorted((e for e in self.endpoints if e.down_until <= now), key=PoolEndpoint.score)
+            down = sorted((e for e in self.endpoints if e.down_until > now),
+                          key=lambda e: e.down_until)
+        # Endpoints in cooldown are still tried last rather than failing outright.
+        return up + down
+
+    def _record(self, endpoint, elapsed):
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.calls += 1
+            failed = elapsed is None
+            endpoint.error_rate += RPC_LATENCY_SMOOTHING * (failed - endpoint.error_rate)
+            if failed:
+                endpoint.failures += 1
+                endpoint.down_until = time.monotonic() + min(RPC_MAX_COOLDOWN, 2 ** endpoint.failures)
+                return
+            endpoint.failures = 0
+            endpoint.down_until = 0.0
+            if endpoint.latency is None:
+                endpoint.latency = elapsed
+            else:
+                endpoint.latency += RPC_LATENCY_SMOOTHING * (elapsed - endpoint.latency)
+
+    def _send(self, method, calls, request):
+        last_error = None
+        started = time.monotonic()
+        failures = 0
+        request_bytes = response_bytes = 0
+        for endpoint in self._ranked():
+            with self._lock:
+                endpoint.in_flight += 1
+            start = time.monotonic()
+            _exchange.sizes = (0, 0)
+            try:
+                response = request(endpoint)
+            except requests.RequestException as e:
+                self._record(endpoint, None)
+                sent, received = _exchange.sizes
+                request_bytes += sent
+                response_bytes += received
+                failures += 1
+                last_error = e
+                continue
+            self._record(endpoint, time.monotonic() - start)
+            sent, received = _exchange.sizes
+            self.metrics.record(method, time.monotonic() - started, calls, request_bytes + sent,
+                                response_bytes + received, _count_errors(response), failures,
+                                endpoint.uri)
+            return response
+        self.metrics.record(method, time.monotonic() - started, calls, request_bytes,
+                            response_bytes, calls, max(0, failures - 1))
+        raise last_error
+
+    def make_request(self, method, params):
+        return self._send(method, 1,
+                          lambda endpoint: endpoint.provider.make_request(method, params))
+
+    def make_batch_request(self, batch_requests):
+        return self._send(_batch_name(batch_requests), len(batch_requests),
+                          lambda endpoint: endpoint.provider.make_batch_request(batch_requests))
+
+    def make_raw_batch_request(self, batch_requests):
+        """The responses to a JSON-RPC batch of (method, params) pairs as
+        the node sent them, with each request's position as its id. Skips
+        web3's formatters and middleware and decodes with orjson when it is
+        installed. The middleware's response cache is consulted directly
+        when connect() gave one, for final entries only: the history scans
+        behind this path look for reorgs near the head, which a cached
+        recent block would hide. Requests cached for good are answered
+        from it, only the rest go to the node, and the final ones among
+        their responses are stored."""
+        responses = [None] * len(batch_requests)
+        cache = self.cache
+        if cache is not None:
+            for i, (method, params) in enumerate(batch_requests):
+                if cache.cacheable(method):
+                    cached = cache.get(method, params, final=True)
+                    if cached is not None:
+                        responses[i] = dict(cached, id=i)
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if not missing:
+            return responses
+        body = json.dumps([{"jsonrpc": "2.0", "id": i, "method": batch_requests[i][0],
+                            "params": batch_requests[i][1]} for i in missing]).encode()
+        fetched = self._send(_batch_name([batch_requests[i] for i in missing]), len(missing),
+                             lambda endpoint: _json_loads(endpoint.post(body)))
+        if not isinstance(fetched, list):
+            # The whole batch was rejected.
+            return fetched
+        for response in fetched:
+            i = response.get("id") if isinstance(response, dict) else None
+            if isinstance(i, int) and 0 <= i < len(responses) and responses[i] is None:
+                responses[i] = response
+        if cache is not None:
+            cache.put_many([(*batch_requests[i], responses[i])
+                            for i in missing if responses[i] is not None], final=True)
+        # A response the node left out shows as a short list, as before.
+        return [response for response in responses if response is not None]
+
+    def endpoint_stats(self):
+        with self._lock:
+            return [{
+                "uri": e.uri,
+                "latency": e.latency,
+                "error_rate": e.error_rate,
+                "calls": e.calls,
+                "up": e.down_until <= time.monotonic(),
+            } for e in self.endpoints]
+
+# -------------------------------
+# RPC Response Cache
+# -------------------------------
+def _block_param_number(tag):
+    # Numeric block parameters only; tags like "latest" move with the chain.
+    if isinstance(tag, int):
+        return tag
+    if isinstance(tag, str) and tag.startswith("0x"):
+        return int(tag, 16)
+    return None
+
+class RPCCache:
+    """Response cache for immutable and slow-changing RPC data: a bounded
+    in-memory LRU, plus an optional sqlite file holding the permanent
+    entries so a restart starts warm. Install it innermost, next to the
+    provider, so it stores the raw JSON-RPC responses:
+    w3.middleware_onion.inject(cache.middleware, "rpc_cache", layer=0).
+
+    Entries on disk belong to the chain id they were fetched on. The file
+    is neither read nor written until bind() gives the cache the live
+    node's chain id, which every eth_chainId answer passing through does,
+    so a file filled on one network never answers for another."""
+
+    def __init__(self, max_entries=DEFAULT_RPC_CACHE_SIZE, path=RPC_CACHE_FILENAME):
+        self.max_entries = max(1, max_entries)
+        self.head = None
+        self.chain_id = None
+        self._entries = OrderedDict()  # key -> (expires_at or None, response)
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                # Files from before chain ids were kept cannot say which
+                # chain their entries came from.
+                self._db.execute("DROP TABLE IF EXISTS responses")
+                self._db.execute("CREATE TABLE IF NOT EXISTS chain_responses "
+                                 "(chain_id INTEGER NOT NULL, key TEXT NOT NULL, "
+                                 "response TEXT NOT NULL, PRIMARY KEY (chain_id, key))")
+
+    def middleware(self, w3):
+        return RPCCacheMiddleware(w3, self)
+
+    @staticmethod
+    def cacheable(method):
+        return method in RPC_CACHE_TTLS or method in RPC_CACHE_BLOCK_PARAMS or method in RPC_CACHE_BY_HASH
+
+    @staticmethod
+    def key(method, params):
+        return method + json.dumps(params, sort_keys=True, default=str)
+
+    def _block_ttl(self, number):
+        if number is None:
+            return 0
+        if self.head is not None and number <= self.head - RPC_CACHE_FINALITY_DEPTH:
+            return None
+        # Still reorgable: keep it briefly, keyed by number it can only change on a reorg.
+        return RPC_CACHE_RECENT_TTL
+
+    def ttl(self, method, params, response):
+        """None to cache for good, 0 not to cache, else seconds."""
+        result = response.get("result")
+        if "error" in response or result is None:
+            return 0
+        if method in RPC_CACHE_TTLS:
+            return RPC_CACHE_TTLS[method]
+        if method in RPC_CACHE_BLOCK_PARAMS:
+            position = RPC_CACHE_BLOCK_PARAMS[method]
+            tag = params[position] if len(params) > position else "latest"
+            return self._block_ttl(_block_param_number(tag))
+        if method == "eth_getBlockByHash":
+            return None
+        if method in RPC_CACHE_BY_HASH:
+            return self._block_ttl(_block_param_number(result.get("blockNumber")))
+        return 0
+
+    def bind(self, chain_id: int):
+        """Read and write the disk entries of chain_id. Moving to another
+        chain also drops the entries in memory, which came from the old one."""
+        with self._lock:
+            if self.chain_id is not None and chain_id != self.chain_id:
+                self._entries.clear()
+                self.head = None
+            self.chain_id = chain_id
+
+    def observe(self, method, response):
+        # Track the chain head and id from the traffic that passes through anyway.
+        if method in ("eth_blockNumber", "eth_chainId") and "result" in response:
+            number = _block_param_number(response["result"])
+            if number is None:
+                return
+            if method == "eth_chainId":
+                self.bind(number)
+            else:
+                self.head = number if self.head is None else max(self.head, number)
+
+    def _on_disk(self, method):
+        return (self._db is not None and self.chain_id is not None
+                and method not in RPC_CACHE_MEMORY_ONLY)
+
+    def get(self, method, params, final=False):
+        """The cached response, or None. With final, only entries cached
+        for good count, not the short-lived ones near the head."""
+        key = self.key(method, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at is None or (not final and expires_at > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self._hits[method] = self._hits.get(method, 0) + 1
+                    return response
+                if expires_at <= time.monotonic():
+                    del self._entries[key]
+            if self._on_disk(method):
+                row = self._db.execute("SELECT response FROM chain_responses "
+                                       "WHERE chain_id = ? AND key = ?",
+                                       (self.chain_id, key)).fetchone()
+                if row is not None:
+                    response = json.loads(row[0])
+                    self._remember(key, None, response)
+                    self._hits[method] = self._hits.get(method, 0) + 1
+                    return response
+            self._misses[method] = self._misses.get(method, 0) + 1
+        return None
+
+    def put(self, method, params, response):
+        self.put_many([(method, params, response)])
+
+    def put_many(self, entries, final=False):
+        """put() for (method, params, response) triples, with the permanent
+        ones written to disk in a single transaction. With final, entries
+        that would only be cached for a while are left out."""
+        for method, _, response in entries:
+            self.observe(method, response)
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for method, params, response in entries:
+                if not self.cacheable(method):
+                    continue
+                ttl = self.ttl(method, params, response)
+                if ttl == 0 or (final and ttl is not None):
+                    continue
+                key = self.key(method, params)
+                self._remember(key, None if ttl is None else now + ttl, response)
+                if ttl is None and self._on_disk(method):
+                    rows.append((self.chain_id, key, json.dumps(response)))
+            if rows:
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO chain_responses (chain_id, key, "
+                                         "response) VALUES (?, ?, ?)", rows)
+                    self._db.execute("DELETE FROM chain_responses WHERE rowid <= "
+                                     "(SELECT MAX(rowid) FROM chain_responses) - ?",
+                                     (RPC_CACHE_DISK_ROWS,))
+
+    def _remember(self, key, expires_at, response):
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            methods = sorted(set(self._hits) | set(self._misses))
+            return {
+                "hits": sum(self._hits.values()),
+                "misses": sum(self._misses.values()),
+                "entries": len(self._entries),
+                "methods": {m: (self._hits.get(m, 0), self._misses.get(m, 0)) for m in methods},
+            }
+
+class RPCCacheMiddleware(Web3Middleware):
+    def __init__(self, w3, cache):
+        super().__init__(w3)
+        self.cache = cache
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            if self.cache.cacheable(method):
+                cached = self.cache.get(method, params)
+                if cached is not None:
+                    return cached
+            response = make_request(method, params)
+            self.cache.put(method, params, response)
+            return response
+        return middleware
+
+    def wrap_make_batch_request(self, make_batch_request):
+        def middleware(requests_info):
+            responses = [self.cache.get(method, params) if self.cache.cacheable(method) else None
+                         for method, params in requests_info]
+            missing = [i for i, response in enumerate(responses) if response is None]
+            if not missing:
+                return responses
+            fetched = make_batch_request([requests_info[i] for i in missing])
+            if not isinstance(fetched, list):
+                # The whole batch was rejected.
+                return fetched
+            for i, response in zip(missing, fetched):
+                responses[i] = response
+            self.cache.put_many([(*requests_info[i], response)
+                                 for i, response in zip(missing, fetched)])
+            return responses
+        return middleware
+
+def connect(settings: dict, pool_size: int = None):
+    """Web3 over the configured endpoint pool with the response cache
+    innermost. Returns (w3, cache). The node is asked its chain id, which
+    binds the cache's disk entries to that chain, but a node that does not
+    answer is left for the caller to find out about."""
+    pool_size = pool_size or int_setting(settings, "history_concurrency", DEFAULT_HISTORY_CONCURRENCY)
+    w3 = Web3(RPCPoolProvider(rpc_addresses(settings),
+                              int_setting(settings, "rpc_timeout", DEFAULT_RPC_TIMEOUT), pool_size))
+    cache_size = int_setting(settings, "rpc_cache_size", DEFAULT_RPC_CACHE_SIZE)
+    try:
+        cache = RPCCache(cache_size, settings.get("rpc_cache_file", RPC_CACHE_FILENAME).strip())
+    except sqlite3.Error:
+        cache = RPCCache(cache_size, None)
+    w3.middleware_onion.inject(cache.middleware, "rpc_cache", layer=0)
+    w3.provider.cache = cache
+    try:
+        w3.eth.chain_id
+    except Exception:
+        pass  # the disk entries stay unused until a chain id comes through
+    return w3, cache
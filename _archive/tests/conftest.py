@@ -0,0 +1,58 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Shared fixtures: a scratch working directory and the benchmark mock node
+served in-process, so a test can change the chain under the wallet."""
+
+import os
+import sys
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from r5wallet.config import default_settings
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # The wallet keeps its files in the working directory.
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def serve():
+    """serve(node) -> URL of a MockNode served until the test ends."""
+    servers = []
+
+    def serve(node):
+        server = node.server()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def connect_node(serve):
+    """connect_node(node, **settings) -> w3 over the wallet's own provider
+    stack, pointed at node, without a disk cache."""
+    from r5wallet.rpc import connect
+
+    def connect_node(node, **settings):
+        values = dict(default_settings(), rpc_address=serve(node), rpc_cache_file="")
+        values.update({key: str(value) for key, value in settings.items()})
+        return connect(values)[0]
+
+    return connect_node
@@ -0,0 +1,104 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Checkpointed full-chain scans: stop, crash and resume."""
+
+import threading
+from collections import Counter
+import pytest
+
+from r5wallet.bench import MockNode, BENCH_ADDRESS, MOCK_WALLET_EVERY
+from r5wallet.history import HistoryIndex, iter_chain_scan, scan_job_key
+
+BLOCKS = 300
+WINDOW = 40
+ADDRESS = BENCH_ADDRESS.lower()
+
+class CountingNode(MockNode):
+    """MockNode that counts how often each block is fetched."""
+
+    def __init__(self):
+        super().__init__(blocks=BLOCKS)
+        self.fetched = Counter()
+
+    def _block_by_number(self, params):
+        with self._lock:
+            self.fetched[self._block_number(params[0])] += 1
+        return super()._block_by_number(params)
+
+class Crash(Exception):
+    pass
+
+def _scan(w3, index, stop=None, from_block=0):
+    return iter_chain_scan(w3, index, ADDRESS, from_block, rate=0, window=WINDOW,
+                           batch_size=10, concurrency=2, stop=stop)
+
+def _assert_complete(index):
+    assert index.scan_job(scan_job_key([ADDRESS])) is None
+    assert index.first_scanned_block(ADDRESS) == 0
+    assert [tx["blockNumber"] for tx in index.transactions(ADDRESS)] == \
+        list(range(0, BLOCKS, MOCK_WALLET_EVERY))
+
+def test_stopped_scan_resumes_at_checkpoint(connect_node):
+    node = CountingNode()
+    w3 = connect_node(node)
+    stop = threading.Event()
+    with HistoryIndex() as index:
+        for _, progress in _scan(w3, index, stop):
+            if progress["blocks_done"] >= 2 * WINDOW:
+                stop.set()
+        assert progress["status"] == "stopped"
+        assert index.scan_job(scan_job_key([ADDRESS]))[2] == 2 * WINDOW
+        first_run = dict(node.fetched)
+
+        node.fetched.clear()
+        statuses = [progress["status"] for _, progress in _scan(w3, index)]
+        assert statuses[-1] == "done"
+        _assert_complete(index)
+    assert sorted(first_run) == list(range(2 * WINDOW))
+    assert sorted(node.fetched) == list(range(2 * WINDOW, BLOCKS))
+    assert set(node.fetched.values()) == {1}
+
+def test_crashed_scan_resumes_from_disk(connect_node):
+    node = CountingNode()
+    w3 = connect_node(node)
+    with pytest.raises(Crash):
+        with HistoryIndex() as index:
+            for _, progress in _scan(w3, index):
+                if progress["blocks_done"] >= 3 * WINDOW:
+                    raise Crash()
+
+    node.fetched.clear()
+    with HistoryIndex() as index:
+        assert index.scan_job(scan_job_key([ADDRESS]))[2] == 3 * WINDOW
+        for _, progress in _scan(w3, index):
+            assert progress["status"] != "waiting"
+        _assert_complete(index)
+    assert min(node.fetched) == 3 * WINDOW
+    assert set(node.fetched.values()) == {1}
+
+def test_other_from_block_starts_over(connect_node):
+    node = CountingNode()
+    w3 = connect_node(node)
+    stop = threading.Event()
+    with HistoryIndex() as index:
+        for _, progress in _scan(w3, index, stop, from_block=100):
+            stop.set()
+        assert index.scan_job(scan_job_key([ADDRESS]))[:3] == (100, BLOCKS - 1, 100 + WINDOW)
+
+        node.fetched.clear()
+        for _ in _scan(w3, index):
+            pass
+        _assert_complete(index)
+    # Starting over refetches everything but the final blocks the first
+    # window left in the response cache.
+    assert sorted(node.fetched) == [n for n in range(BLOCKS) if not 100 <= n < 100 + WINDOW]
@@ -0,0 +1,102 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Report totals and running balances, reverted transactions included."""
+
+import csv
+import json
+import sqlite3
+from decimal import Decimal
+
+from r5wallet.bench import MockNode, BENCH_ADDRESS, MOCK_GAS_PRICE, MOCK_WALLET_EVERY
+from r5wallet.config import TRANSFER_GAS
+from r5wallet.export import export_history, iter_report_rows
+from r5wallet.history import HistoryIndex, fill_missing_fees, sync_history_index
+
+ADDRESS = BENCH_ADDRESS.lower()
+OTHER = "0x" + "ee" * 20
+ETHER = 10 ** 18
+FEE = 10 ** 16
+
+def _tx(block, tx_from, tx_to, value, fee=None, status=None):
+    return {"blockNumber": block, "hash": "%064x" % block, "from": tx_from, "to": tx_to,
+            "value": Decimal(value), "fee": fee, "status": status}
+
+class RevertNode(MockNode):
+    """MockNode whose wallet transactions in the blocks of `reverted` fail."""
+
+    def __init__(self, blocks, reverted=()):
+        super().__init__(blocks=blocks)
+        self.reverted = {"0x%064x" % (number * self.txs_per_block) for number in reverted}
+
+    def _receipt(self, params):
+        receipt = json.loads(super()._receipt(params))
+        if params[0] in self.reverted:
+            receipt["status"] = "0x0"
+        return json.dumps(receipt)
+
+def test_reverted_transactions_move_only_the_fee():
+    with HistoryIndex() as index:
+        index.record(ADDRESS, 5, [], [
+            _tx(1, OTHER, ADDRESS, 5, status=1),
+            _tx(2, ADDRESS, OTHER, 2, FEE, 1),
+            _tx(3, ADDRESS, OTHER, 1, FEE, 0),
+            _tx(4, OTHER, ADDRESS, 3, status=0),
+            _tx(5, ADDRESS, OTHER, 1),
+        ])
+        summary = {}
+        rows = list(iter_report_rows(index, ADDRESS, {ADDRESS: ETHER}, summary))
+    assert [row["status"] for row in rows] == ["success", "success", "reverted", "reverted", None]
+    assert [row["value"] for row in rows] == [5, 2, 1, 3, 1]
+    assert [row["balance"] for row in rows] == [Decimal(b) for b in
+                                                ("6", "3.99", "3.98", "3.98", "2.98")]
+    assert [row["fees_total"] for row in rows] == [Decimal(f) for f in
+                                                   ("0", "0.01", "0.02", "0.02", "0.02")]
+    assert summary[ADDRESS] == {"rows": 5, "received": 5 * ETHER, "sent": 3 * ETHER,
+                                "fees": 2 * FEE, "fees_missing": 1, "reverted": 2,
+                                "opening_balance": ETHER,
+                                "balance": ETHER + 5 * ETHER - 3 * ETHER - 2 * FEE}
+
+def test_synced_history_exports_receipt_status(connect_node):
+    w3 = connect_node(RevertNode(blocks=50, reverted={20}))
+    with HistoryIndex() as index:
+        sync_history_index(w3, index, ADDRESS)
+        summary = export_history(index, ADDRESS, "report.csv")[ADDRESS]
+    fee = TRANSFER_GAS * MOCK_GAS_PRICE
+    assert summary["rows"] == 5
+    assert (summary["sent"], summary["fees"], summary["reverted"]) == (4 * ETHER, 5 * fee, 1)
+    assert summary["balance"] == -(4 * ETHER + 5 * fee)
+    with open("report.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["block"] for row in rows] == [str(n) for n in range(0, 50, MOCK_WALLET_EVERY)]
+    assert [row["status"] for row in rows] == ["success", "success", "reverted", "success",
+                                               "success"]
+    assert Decimal(rows[2]["balance"]) == Decimal(rows[1]["balance"]) - Decimal(rows[2]["fee"])
+
+def test_legacy_index_gets_status_and_fees(connect_node):
+    conn = sqlite3.connect("history.db")
+    conn.execute("CREATE TABLE transactions (address TEXT NOT NULL, block_number INTEGER NOT "
+                 "NULL, tx_hash TEXT NOT NULL, tx_from TEXT NOT NULL, tx_to TEXT, value_wei "
+                 "TEXT NOT NULL, PRIMARY KEY (address, tx_hash))")
+    conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)", [
+        (ADDRESS, 10, "%064x" % (10 * MockNode().txs_per_block), ADDRESS, OTHER, str(ETHER)),
+        (ADDRESS, 11, "%064x" % 1, OTHER, ADDRESS, str(ETHER)),
+    ])
+    conn.commit()
+    conn.close()
+    w3 = connect_node(RevertNode(blocks=20, reverted={10}))
+    with HistoryIndex("history.db") as index:
+        assert fill_missing_fees(w3, index, ADDRESS) == 2
+        assert index.missing_fees([ADDRESS]) == []
+        rows = list(index.iter_rows(ADDRESS))
+    assert [(row[6], row[7]) for row in rows] == [(str(TRANSFER_GAS * MOCK_GAS_PRICE), 0),
+                                                  (None, 1)]
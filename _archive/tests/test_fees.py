@@ -0,0 +1,96 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Fee oracle fallbacks and transfer gas."""
+
+import json
+import pytest
+
+from r5wallet.bench import MockNode, MOCK_GAS_PRICE, BENCH_PRIVATE_KEY
+from r5wallet.config import TRANSFER_GAS
+from r5wallet.fees import FeeOracle
+
+WALLET = {"private_key": BENCH_PRIVATE_KEY[2:], "public_key": ""}
+CONTRACT = "0x" + "c0" * 20
+ACCOUNT = "0x" + "a0" * 20
+
+class FeeNode(MockNode):
+    """Fails eth_feeHistory with fee_history_error while it is set, serves
+    code for CONTRACT only, and estimates 21000 plus one gas per wei."""
+
+    def __init__(self):
+        super().__init__(blocks=10)
+        self.fee_history_error = None
+        self.estimate_error = False
+        self.calls = []
+        self.methods["eth_getCode"] = lambda params: (
+            '"0x6000"' if params[0].lower() == CONTRACT else '"0x"')
+        self.methods["eth_estimateGas"] = lambda params: '"%s"' % hex(
+            TRANSFER_GAS + int(params[0].get("value", "0x0"), 16))
+
+    def handle(self, request):
+        self.calls.append(request["method"])
+        if request["method"] == "eth_feeHistory" and self.fee_history_error:
+            return json.dumps({"jsonrpc": "2.0", "id": request["id"],
+                               "error": self.fee_history_error})
+        if request["method"] == "eth_estimateGas" and self.estimate_error:
+            return json.dumps({"jsonrpc": "2.0", "id": request["id"],
+                               "error": {"code": -32000, "message": "execution reverted"}})
+        return super().handle(request)
+
+@pytest.fixture
+def node():
+    return FeeNode()
+
+@pytest.mark.parametrize("error", [
+    {"code": -32601, "message": "Method not found"},
+    {"code": -32000, "message": "eth_feeHistory is not supported"},
+])
+def test_unsupported_fee_history_is_not_asked_again(node, connect_node, error):
+    oracle = FeeOracle(connect_node(node))
+    node.fee_history_error = error
+    tiers = oracle.refresh(1)
+    assert tiers["normal"]["max_priority_fee_per_gas"] == tiers["normal"]["gas_price"]
+    assert oracle.fee_history is False
+    node.fee_history_error = None
+    oracle.refresh(2)
+    assert node.calls.count("eth_feeHistory") == 1
+
+def test_transient_fee_history_error_prices_one_block_legacy(node, connect_node):
+    oracle = FeeOracle(connect_node(node))
+    node.fee_history_error = {"code": -32000, "message": "header not found"}
+    legacy = oracle.refresh(1)
+    assert legacy["normal"]["max_priority_fee_per_gas"] == legacy["normal"]["gas_price"]
+    assert oracle.fee_history is True
+    node.fee_history_error = None
+    tiers = oracle.refresh(2)
+    assert tiers["normal"]["max_priority_fee_per_gas"] < MOCK_GAS_PRICE
+
+def test_account_transfer_checks_code_once(node, connect_node):
+    oracle = FeeOracle(connect_node(node))
+    assert oracle.transfer_gas(WALLET, ACCOUNT, 1) == TRANSFER_GAS
+    assert oracle.transfer_gas(WALLET, ACCOUNT.upper().replace("0X", "0x"), 5) == TRANSFER_GAS
+    assert node.calls.count("eth_getCode") == 1
+    assert "eth_estimateGas" not in node.calls
+
+def test_contract_transfer_is_estimated_per_amount(node, connect_node):
+    oracle = FeeOracle(connect_node(node))
+    assert oracle.transfer_gas(WALLET, CONTRACT, 1) == TRANSFER_GAS + 1
+    assert oracle.transfer_gas(WALLET, CONTRACT, 500) == TRANSFER_GAS + 500
+    assert node.calls.count("eth_getCode") == 1
+
+def test_estimate_fallback_is_not_memoized(node, connect_node):
+    oracle = FeeOracle(connect_node(node))
+    node.estimate_error = True
+    assert oracle.transfer_gas(WALLET, CONTRACT, 7) == TRANSFER_GAS
+    node.estimate_error = False
+    assert oracle.transfer_gas(WALLET, CONTRACT, 7) == TRANSFER_GAS + 7
@@ -0,0 +1,85 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""BIP-32 derivation against the spec's vectors and eth_account."""
+
+import pytest
+from eth_account import Account
+
+from r5wallet import hd
+from r5wallet.hd import HDKeychain, HDError, derive_addresses
+
+# BIP-32 test vector 1: path -> (chain code, private key, public key).
+SEED = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+VECTOR = {
+    "m": ("873dff81c02f525623fd1fe5167eac3a55a049de3d314bb42ee227ffed37d508",
+          "e8f32e723decf4051aefac8e2c93c9c5b214313817cdb01a1494b917c8436b35",
+          "0339a36013301597daef41fbe593a02cc513d0b55527ec2df1050e2e8ff49c85c2"),
+    "m/0'": ("47fdacbd0f1097043b78c63c20c34ef4ed9a111d980047ad16282c7ae6236141",
+             "edb2e14f9ee77d26dd93b4ecede8d16ed408ce149b6cd80b0715a2d911a0afea",
+             "035a784662a4a20a65bf6aab9ae98a6c068a81c52e4b032c0fb5400c706cfccc56"),
+    "m/0'/1": ("2a7857631386ba23dacac34180dd1983734e444fdbf774041578e9b6adb37c19",
+               "3c6cb8d0f6a264c91ea8b5030fadaa8e538b020f0a387421a12de9319dc93368",
+               "03501e454bf00751f24b1b489aa925215d66af2234e3891c3b21a52bedb3cd711c"),
+    "m/0'/1/2'": ("04466b9cc8e161e966409ca52986c584f07e9dc81f735db683c3ff6ec7b1503f",
+                  "cbce0d719ecf7431d88e6a89fa1483e02e35092af60c042b1df2ff59fa424dca",
+                  "0357bfe1e341d01c69fe5654309956cbea516822fba8a601743a012a7896ee8dc2"),
+    "m/0'/1/2'/2": ("cfb71883f01676f587d023cc53a35bc7f88f724b1f8c2892ac1275ac822a3edd",
+                    "0f479245fb19a38a1954c5c7c0ebab2f9bdfd96a17563ef28a6a4b1a2a764ef4",
+                    "02e8445082a72f29b75ca48748a914df60622a609cacfce8ed0e35804560741d29"),
+    "m/0'/1/2'/2/1000000000": ("c783e67b921d2beb8f6b389cc646d7263b4145701dadd2161548a8b078e65e9e",
+                               "471b76e389e528d6de6d816857e012c5455051cad6660850e58372a6c3e6e7c8",
+                               "022a471424da5e657499d1ff51cb43c47481a03b1e77f951fe64cec9f5a48f7011"),
+}
+
+PHRASE = "test test test test test test test test test test test junk"
+
+@pytest.fixture
+def no_table(monkeypatch):
+    """Private derivation must never reach the key-dependent fixed-base table."""
+    def refuse(*args):
+        raise AssertionError("private key went through _mul_add")
+    monkeypatch.setattr(hd, "_mul_add", refuse)
+
+@pytest.mark.parametrize("path", VECTOR)
+def test_bip32_vector(path, no_table):
+    chain_code, private_key, public_key = VECTOR[path]
+    node = HDKeychain(SEED).node(path)
+    assert node.chain_code.hex() == chain_code
+    assert node.private_key_hex() == private_key
+    assert node.public_key.hex() == public_key
+    assert node.depth == len(hd.parse_path(path))
+
+def test_public_derivation_matches_private():
+    parent = HDKeychain(SEED).node("m/0'/1/2'")
+    child = parent.public().child(2)
+    assert child.private_key is None
+    assert child.public_key.hex() == VECTOR["m/0'/1/2'/2"][2]
+    assert child.chain_code.hex() == VECTOR["m/0'/1/2'/2"][0]
+    with pytest.raises(HDError):
+        parent.public().child(hd.HARDENED)
+
+@pytest.mark.parametrize("passphrase", ["", "TREZOR"])
+def test_bip44_matches_eth_account(passphrase, no_table):
+    Account.enable_unaudited_hdwallet_features()
+    keychain = HDKeychain.from_mnemonic(PHRASE, passphrase)
+    for i in range(5):
+        expected = Account.from_mnemonic(PHRASE, passphrase, account_path=f"m/44'/60'/0'/0/{i}")
+        key = keychain.account_key(i)
+        assert key.private_key_hex() == expected.key.hex().removeprefix("0x")
+        assert key.address == expected.address
+
+def test_derive_addresses_matches_private_keys():
+    keychain = HDKeychain.from_mnemonic(PHRASE)
+    parent = keychain.node("m/44'/60'/0'/0")
+    expected = [keychain.account_key(i).address for i in range(3, 13)]
+    assert derive_addresses(parent, 3, 10, workers=1) == expected
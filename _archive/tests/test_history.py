@@ -0,0 +1,94 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Incremental history index: new blocks only, and rollback on reorgs."""
+
+import json
+from web3 import Web3
+
+from r5wallet.bench import MockNode, BENCH_ADDRESS, MOCK_WALLET_EVERY
+from r5wallet.history import HistoryIndex, sync_history_index
+
+OTHER = "0x" + "ee" * 20
+
+def _alt_hash(number: int) -> str:
+    return "0x%064x" % (number * 7919 + 2)
+
+class ReorgNode(MockNode):
+    """MockNode whose chain can be replaced from block `fork` up: those
+    blocks get other hashes and lose the wallet's transactions."""
+
+    fork = None
+
+    def _block_by_number(self, params):
+        text = super()._block_by_number(params)
+        number = self._block_number(params[0])
+        if self.fork is None or number < self.fork or text == "null":
+            return text
+        block = json.loads(text)
+        block["hash"] = _alt_hash(number)
+        if number > self.fork:
+            block["parentHash"] = _alt_hash(number - 1)
+        for tx in block["transactions"]:
+            if isinstance(tx, dict):
+                tx["blockHash"] = block["hash"]
+                if tx["from"] == self.address:
+                    tx["from"] = OTHER
+        return json.dumps(block)
+
+def _blocks(transactions):
+    return [tx["blockNumber"] for tx in transactions]
+
+def test_sync_scans_only_new_blocks(connect_node):
+    node = MockNode(blocks=200, txs_per_block=2)
+    w3 = connect_node(node)
+    with HistoryIndex("history.db") as index:
+        first = sync_history_index(w3, index, BENCH_ADDRESS, lookback=0)
+        assert _blocks(first) == list(range(0, 200, MOCK_WALLET_EVERY))
+        assert index.last_scanned_block(BENCH_ADDRESS) == 199
+        node.head = 249
+        calls = w3.provider.metrics.snapshot()
+        before = sum(stats["calls"] for stats in calls.values())
+        second = sync_history_index(w3, index, BENCH_ADDRESS, lookback=0)
+        calls = w3.provider.metrics.snapshot()
+        scanned = sum(stats["calls"] for stats in calls.values()) - before
+    assert _blocks(second) == list(range(0, 250, MOCK_WALLET_EVERY))
+    # 50 new blocks, plus the head and the reorg check of the stored hashes.
+    assert 50 <= scanned < 200
+
+def test_reorg_rolls_back_replaced_blocks(connect_node):
+    node = ReorgNode(blocks=300, txs_per_block=2)
+    w3 = connect_node(node)
+    with HistoryIndex("history.db") as index:
+        sync_history_index(w3, index, BENCH_ADDRESS, lookback=0)
+        node.fork = 245
+        node.head = 319
+        transactions = sync_history_index(w3, index, BENCH_ADDRESS, lookback=0)
+        stored = dict(index.stored_hashes(BENCH_ADDRESS))
+        last_block = index.last_scanned_block(BENCH_ADDRESS)
+    # The wallet's transactions in 250..290 were reorged out.
+    assert _blocks(transactions) == list(range(0, 245, MOCK_WALLET_EVERY))
+    assert last_block == 319
+    assert stored[244] == "0x%064x" % (244 * 7919 + 1)
+    assert all(stored[number] == _alt_hash(number) for number in range(245, 320))
+
+def test_rollback_forgets_everything_above():
+    tx = {"from": Web3.to_checksum_address(BENCH_ADDRESS), "to": OTHER, "value": 1}
+    with HistoryIndex("history.db") as index:
+        index.record(BENCH_ADDRESS, 20, [(n, f"0x{n:064x}") for n in range(21)],
+                     [dict(tx, blockNumber=n, hash=f"{n:064x}") for n in (5, 10, 15, 20)], 0)
+        index.rollback(BENCH_ADDRESS, 12)
+        assert _blocks(index.transactions(BENCH_ADDRESS)) == [5, 10]
+        assert index.last_scanned_block(BENCH_ADDRESS) == 12
+        assert max(number for number, _ in index.stored_hashes(BENCH_ADDRESS)) == 12
+        index.rollback(BENCH_ADDRESS, -1)
+        assert index.last_scanned_block(BENCH_ADDRESS) is None
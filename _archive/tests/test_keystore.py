@@ -0,0 +1,111 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Unlocked wallet sessions and the keystore file format."""
+
+import json
+import threading
+import pytest
+
+from r5wallet import keystore
+from r5wallet.bench import BENCH_PRIVATE_KEY, BENCH_ADDRESS
+from r5wallet.config import KDF_SCRYPT
+from r5wallet.keystore import WalletSession, WalletLockedError, decrypt_wallet
+
+PASSWORD = "correct horse"
+WALLET = {"private_key": BENCH_PRIVATE_KEY[2:], "public_key": ""}
+
+def _session(idle_timeout=300):
+    # The weakest parameters calibration allows, to keep the tests quick.
+    return WalletSession.create_file(dict(WALLET), PASSWORD, idle_timeout, "r5.key",
+                                     KDF_SCRYPT, kdf_target_ms=1)
+
+def test_lock_wipes_secrets_but_keeps_the_address():
+    session = _session()
+    assert session["private_key"] == WALLET["private_key"]
+    key = session._key
+    session.lock()
+    assert session.locked
+    assert not any(key)
+    assert session.address.lower() == BENCH_ADDRESS
+    with pytest.raises(WalletLockedError):
+        session["private_key"]
+    with pytest.raises(WalletLockedError):
+        session.account
+
+def test_idle_timeout_locks_on_next_use():
+    session = _session(idle_timeout=0)
+    session._last_used -= 1
+    with pytest.raises(WalletLockedError):
+        session.get("private_key")
+    assert session.locked
+
+def test_verify_password_without_kdf_and_unlock():
+    session = _session()
+    assert session.verify_password(PASSWORD)
+    assert not session.verify_password("wrong")
+    session.lock()
+    assert not session.verify_password("wrong")
+    assert session.locked
+    assert session.verify_password(PASSWORD)
+    assert session.account.address.lower() == BENCH_ADDRESS
+
+def test_lock_waits_for_a_use_in_progress(monkeypatch):
+    session = _session()
+    encrypt = keystore.encrypt_wallet_with_key
+    locker = threading.Thread(target=session.lock)
+
+    def encrypt_while_locking(wallet, key, *args):
+        # The idle timer fires while the key is in use; it must wait.
+        locker.start()
+        locker.join(timeout=0.2)
+        assert locker.is_alive()
+        return encrypt(wallet, key, *args)
+
+    monkeypatch.setattr(keystore, "encrypt_wallet_with_key", encrypt_while_locking)
+    file_data = session.encrypt(dict(WALLET))
+    locker.join()
+    assert session.locked
+    assert decrypt_wallet(json.loads(json.dumps(file_data)), PASSWORD) == WALLET
+
+def _legacy_file(wallet, password):
+    # Version 1: no version field, PBKDF2 with LEGACY_KDF_PARAMS.
+    salt = b"\x01" * 16
+    key = keystore.derive_key(password, salt)
+    file_data = keystore.encrypt_wallet_with_key(wallet, key, salt, None, None)
+    return {"salt": file_data["salt"], "wallet": file_data["wallet"]}
+
+def test_legacy_file_migrates_on_unlock(workdir):
+    legacy = _legacy_file(dict(WALLET), PASSWORD)
+    keystore.write_wallet_file(legacy, "r5.key")
+    with pytest.raises(Exception):
+        WalletSession.unlock_file(legacy, "wrong", path="r5.key", kdf=KDF_SCRYPT, kdf_target_ms=1)
+    assert json.loads((workdir / "r5.key").read_text()) == legacy
+    session = WalletSession.unlock_file(legacy, PASSWORD, path="r5.key", kdf=KDF_SCRYPT,
+                                        kdf_target_ms=1)
+    migrated = json.loads((workdir / "r5.key").read_text())
+    assert migrated["version"] == keystore.KEYSTORE_VERSION
+    assert migrated["kdf"] == KDF_SCRYPT
+    assert migrated["salt"] != legacy["salt"]
+    assert decrypt_wallet(migrated, PASSWORD) == WALLET
+    assert session.kdf == KDF_SCRYPT
+    # The session's cached key re-encrypts in the new format.
+    assert decrypt_wallet(session.encrypt(dict(WALLET, label="x")), PASSWORD)["label"] == "x"
+
+def test_current_file_is_not_rewritten(workdir):
+    _session()
+    before = (workdir / "r5.key").read_text()
+    file_data = json.loads(before)
+    WalletSession.unlock_file(file_data, PASSWORD, path="r5.key", kdf=KDF_SCRYPT, kdf_target_ms=1)
+    assert (workdir / "r5.key").read_text() == before
+    assert not keystore.keystore_needs_migration(file_data, KDF_SCRYPT)
+    assert keystore.keystore_needs_migration(file_data, keystore.KDF_PBKDF2)
@@ -0,0 +1,154 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Bulk payouts: a run that crashes resumes from its journal without
+signing or paying anything twice."""
+
+import json
+import pytest
+from eth_utils import keccak
+
+from r5wallet import payout
+from r5wallet.bench import MockNode, BENCH_PRIVATE_KEY
+from r5wallet.payout import PayoutJournal, run_payouts
+
+ROWS = 8
+
+class PayoutNode(MockNode):
+    """Mines every new raw transaction at once and rejects a repeat the
+    way geth does; reject_with fails every broadcast with that message."""
+
+    reject_with = None
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.received = []
+        self.failures = {}  # method -> how many more calls of it fail
+        self.fail_after_send = {}  # failures armed by the first broadcast
+        self.no_estimate = set()  # destinations eth_estimateGas fails for
+
+    def _error(self, request, message):
+        return ('{"jsonrpc":"2.0","id":%s,"error":{"code":-32000,"message":"%s"}}'
+                % (json.dumps(request.get("id")), message))
+
+    def handle(self, request):
+        method = request.get("method")
+        with self._lock:
+            failing = self.failures.get(method, 0)
+            if failing:
+                self.failures[method] = failing - 1
+        if failing:
+            return self._error(request, "upstream request timeout")
+        if method == "eth_estimateGas" and request["params"][0]["to"].lower() in self.no_estimate:
+            return self._error(request, "execution reverted")
+        if method == "eth_sendRawTransaction":
+            with self._lock:
+                self.failures.update(self.fail_after_send)
+                self.fail_after_send = {}
+            raw = request["params"][0]
+            tx_hash = "0x" + keccak(hexstr=raw).hex()
+            message = self.reject_with or ("already known" if raw in self.received else None)
+            if raw not in self.received and not self.reject_with:
+                self.received.append(raw)
+            if message:
+                return ('{"jsonrpc":"2.0","id":%s,"error":{"code":-32000,"message":"%s"}}'
+                        % (json.dumps(request.get("id")), message))
+            return '{"jsonrpc":"2.0","id":%s,"result":"%s"}' % (json.dumps(request.get("id")),
+                                                               tx_hash)
+        return super().handle(request)
+
+    def _transaction_count(self, params):
+        return f'"{hex(len(self.received))}"'
+
+    def _receipt(self, params):
+        mined = {"0x" + keccak(hexstr=raw).hex() for raw in self.received}
+        return super()._receipt(params) if params[0] in mined else "null"
+
+class Crash(BaseException):
+    pass
+
+def _rows():
+    return [{"row": i, "to": "0x" + f"{i + 1:040x}", "value": 10 ** 18 + i} for i in range(ROWS)]
+
+def _run(w3, journal):
+    return run_payouts(w3, {"private_key": BENCH_PRIVATE_KEY}, _rows(), journal, window=4,
+                       workers=1, log=lambda message: None)
+
+def test_resume_after_crash_never_resigns_or_double_sends(connect_node, monkeypatch):
+    node = PayoutNode(blocks=10, txs_per_block=1)
+    w3 = connect_node(node)
+    journal = PayoutJournal("payout.journal")
+    write = journal.write
+
+    def write_then_crash(entries, sync=True):
+        write(entries, sync)
+        if sum(entry["status"] == "sent" for entry in journal.entries.values()) >= 3:
+            raise Crash()
+
+    journal.write = write_then_crash
+    with pytest.raises(Crash):
+        _run(w3, journal)
+    journal.close()
+    signed = {entry["row"]: entry["raw"] for entry in PayoutJournal("payout.journal").entries.values()}
+    assert len(signed) == ROWS
+    assert 3 <= len(node.received) < ROWS
+
+    def resign(txs):
+        raise AssertionError("a journaled row was signed again")
+
+    monkeypatch.setattr(payout, "_sign_payout_chunk", resign)
+    resumed = PayoutJournal("payout.journal")
+    summary = _run(w3, resumed)
+    resumed.close()
+    assert summary["mined"] == ROWS
+    assert "halted" not in summary
+    # Every row reached the node exactly once, as the bytes signed before the crash.
+    assert sorted(node.received) == sorted(signed.values())
+    nonces = sorted(entry["nonce"] for entry in resumed.entries.values())
+    assert nonces == list(range(ROWS))
+
+@pytest.mark.parametrize("message", ["unknown account", "unknown block", "unknown transaction type",
+                                     "insufficient funds"])
+def test_other_errors_halt_instead_of_counting_as_sent(connect_node, message):
+    node = PayoutNode(blocks=10, txs_per_block=1)
+    node.reject_with = message
+    journal = PayoutJournal("payout.journal")
+    summary = _run(connect_node(node), journal)
+    journal.close()
+    assert message in summary["halted"]
+    assert summary.get("mined", 0) == 0
+    assert summary["error"] == 1
+
+@pytest.mark.parametrize("message", ["already known", "Known transaction: 0xab",
+                                     "nonce too low: next nonce 5"])
+def test_already_sent_phrases(message):
+    assert payout._already_sent(ValueError({"code": -32000, "message": message}))
+
+def test_transient_poll_errors_are_retried(connect_node):
+    node = PayoutNode(blocks=10, txs_per_block=1)
+    node.fail_after_send = {"eth_getTransactionReceipt": 5, "eth_getTransactionCount": 1}
+    journal = PayoutJournal("payout.journal")
+    summary = _run(connect_node(node), journal)
+    journal.close()
+    assert summary["mined"] == ROWS
+    assert "halted" not in summary
+    assert len(node.received) == ROWS
+
+def test_failed_gas_estimate_signs_nothing(connect_node):
+    node = PayoutNode(blocks=10, txs_per_block=1)
+    node.no_estimate = {_rows()[3]["to"]}
+    journal = PayoutJournal("payout.journal")
+    with pytest.raises(payout.PayoutError, match="row 4 .*execution reverted"):
+        _run(connect_node(node), journal)
+    journal.close()
+    assert node.received == []
+    assert PayoutJournal("payout.journal").entries == {}
@@ -0,0 +1,144 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""RPC response cache: what is kept, for how long, and what survives a restart."""
+
+import pytest
+
+from r5wallet import rpc
+from r5wallet.bench import MockNode
+from r5wallet.chain import iter_blocks
+from r5wallet.config import RPC_CACHE_FINALITY_DEPTH, RPC_CACHE_RECENT_TTL, RPC_CACHE_TTLS
+from r5wallet.rpc import RPCCache
+
+HEAD = 1000
+
+def _result(value):
+    return {"jsonrpc": "2.0", "id": 1, "result": value}
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock:
+        now = 1000.0
+
+        def monotonic(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(rpc.time, "monotonic", clock.monotonic)
+    return clock
+
+def _cache(path=None, max_entries=100):
+    cache = RPCCache(max_entries, path)
+    cache.put("eth_blockNumber", [], _result(hex(HEAD)))
+    return cache
+
+def test_method_ttls(clock):
+    cache = _cache()
+    cache.put("eth_chainId", [], _result("0x539"))
+    cache.put("eth_gasPrice", [], _result("0x1"))
+    cache.put("eth_blockNumber", [], _result(hex(HEAD)))
+    clock.now += RPC_CACHE_TTLS["eth_gasPrice"] - 1
+    assert cache.get("eth_gasPrice", []) == _result("0x1")
+    clock.now += 2
+    assert cache.get("eth_gasPrice", []) is None
+    assert cache.get("eth_chainId", []) == _result("0x539")
+    # The head moves with every block and is never served from the cache.
+    assert cache.get("eth_blockNumber", []) is None
+
+def test_blocks_are_kept_for_good_only_once_final(clock):
+    cache = _cache()
+    final, recent = hex(HEAD - RPC_CACHE_FINALITY_DEPTH), hex(HEAD - RPC_CACHE_FINALITY_DEPTH + 1)
+    for number in (final, recent, "latest"):
+        cache.put("eth_getBlockByNumber", [number, False], _result({"number": number}))
+    clock.now += RPC_CACHE_RECENT_TTL + 1
+    assert cache.get("eth_getBlockByNumber", [final, False]) == _result({"number": final})
+    assert cache.get("eth_getBlockByNumber", [recent, False]) is None
+    assert cache.get("eth_getBlockByNumber", ["latest", False]) is None
+
+def test_errors_and_missing_results_are_not_cached(clock):
+    cache = _cache()
+    cache.put("eth_chainId", [], {"jsonrpc": "2.0", "id": 1, "error": {"code": -32000}})
+    cache.put("eth_getTransactionReceipt", ["0x01"], _result(None))
+    assert cache.get("eth_chainId", []) is None
+    assert cache.get("eth_getTransactionReceipt", ["0x01"]) is None
+
+def test_lru_evicts_the_least_recently_used(clock):
+    cache = _cache(max_entries=2)
+    cache.put("eth_chainId", [], _result("0x539"))
+    cache.put("net_version", [], _result("1337"))
+    cache.get("eth_chainId", [])
+    cache.put("eth_getBlockByNumber", ["0x1", False], _result({"number": "0x1"}))
+    assert cache.get("net_version", []) is None
+    assert cache.get("eth_chainId", []) == _result("0x539")
+
+def test_final_entries_survive_a_restart(clock, workdir):
+    path = str(workdir / "cache.db")
+    cache = _cache(path)
+    cache.put("eth_chainId", [], _result("0x539"))
+    cache.put("eth_getBlockByNumber", ["0x1", False], _result({"number": "0x1"}))
+    cache.put("eth_gasPrice", [], _result("0x1"))
+    restarted = RPCCache(100, path)
+    # Nothing is read from disk before the chain is known.
+    assert restarted.get("eth_getBlockByNumber", ["0x1", False]) is None
+    restarted.bind(0x539)
+    assert restarted.get("eth_getBlockByNumber", ["0x1", False]) == _result({"number": "0x1"})
+    assert restarted.get("eth_gasPrice", []) is None
+    assert restarted.get("eth_chainId", []) is None
+
+class OtherChainNode(MockNode):
+    def __init__(self, chain_id, **kwargs):
+        super().__init__(**kwargs)
+        self.methods["eth_chainId"] = lambda params: f'"{hex(chain_id)}"'
+        self.methods["net_version"] = lambda params: f'"{chain_id}"'
+
+def test_cache_file_does_not_answer_for_another_chain(connect_node, workdir):
+    path = str(workdir / "cache.db")
+    w3 = connect_node(OtherChainNode(1337, blocks=HEAD + 1, txs_per_block=1), rpc_cache_file=path)
+    w3.eth.block_number
+    first = w3.eth.get_block(1)
+    assert w3.eth.chain_id == 1337
+
+    w3 = connect_node(OtherChainNode(999, blocks=HEAD + 1, txs_per_block=2), rpc_cache_file=path)
+    assert w3.eth.chain_id == 999
+    assert w3.net.version == "999"
+    w3.eth.block_number
+    assert len(w3.eth.get_block(1)["transactions"]) == 2 != len(first["transactions"])
+    assert w3.provider.metrics.snapshot()["eth_getBlockByNumber"]["requests"] == 1
+
+    # Back on the first chain its entries are still there.
+    w3 = connect_node(OtherChainNode(1337, blocks=HEAD + 1, txs_per_block=3), rpc_cache_file=path)
+    assert w3.eth.get_block(1) == first
+    assert "eth_getBlockByNumber" not in w3.provider.metrics.snapshot()
+
+def test_middleware_answers_repeats_without_the_node(connect_node):
+    w3 = connect_node(MockNode(blocks=HEAD + 1, txs_per_block=1))
+    w3.eth.block_number
+    for _ in range(3):
+        w3.eth.get_block(1)
+        w3.eth.chain_id
+    methods = w3.provider.metrics.snapshot()
+    assert methods["eth_getBlockByNumber"]["requests"] == 1
+    assert methods["eth_chainId"]["requests"] == 1
+
+def test_raw_scans_read_and_fill_the_final_entries(connect_node, workdir):
+    path = str(workdir / "cache.db")
+    scans = []
+    for _ in range(2):
+        w3 = connect_node(MockNode(blocks=HEAD + 1, txs_per_block=1), rpc_cache_file=path)
+        w3.eth.block_number
+        scans.append([block for chunk in iter_blocks(w3, 0, HEAD, raw=True) for block in chunk])
+        fetched = w3.provider.metrics.snapshot()["batch:eth_getBlockByNumber"]["calls"]
+    assert scans[0] == scans[1]
+    assert [block["number"] for block in scans[1]] == [hex(n) for n in range(HEAD + 1)]
+    # After the restart only the blocks still within reorg reach of the head are asked for.
+    assert fetched == RPC_CACHE_FINALITY_DEPTH
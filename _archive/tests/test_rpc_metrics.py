@@ -0,0 +1,47 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Error counts of the RPC call metrics."""
+
+from r5wallet.bench import MockNode
+
+class ErrorNode(MockNode):
+    """Answers with "error" inside results, and fails the blocks in failing."""
+
+    def __init__(self, failing=()):
+        super().__init__(blocks=10)
+        self.failing = set(failing)
+        self.methods["web3_clientVersion"] = lambda params: '{"error":"error"}'
+
+    def handle(self, request):
+        if (request["method"] == "eth_getBlockByNumber"
+                and int(request["params"][0], 16) in self.failing):
+            return ('{"jsonrpc":"2.0","id":%d,"error":{"code":-32000,"message":"error"}}'
+                    % request["id"])
+        return super().handle(request)
+
+def test_error_text_in_results_is_not_an_error(connect_node):
+    w3 = connect_node(ErrorNode())
+    w3.provider.make_request("web3_clientVersion", [])
+    responses = w3.provider.make_raw_batch_request([("web3_clientVersion", [])] * 3)
+    assert [response["result"] for response in responses] == [{"error": "error"}] * 3
+    stats = w3.provider.metrics.snapshot()
+    assert stats["web3_clientVersion"]["errors"] == 0
+    assert stats["batch:web3_clientVersion"]["errors"] == 0
+
+def test_raw_batch_counts_each_failed_entry(connect_node):
+    w3 = connect_node(ErrorNode(failing={2, 5}))
+    responses = w3.provider.make_raw_batch_request([("eth_getBlockByNumber", [hex(n), False])
+                                                    for n in range(8)])
+    assert sum("error" in response for response in responses) == 2
+    stats = w3.provider.metrics.snapshot()["batch:eth_getBlockByNumber"]
+    assert (stats["calls"], stats["errors"]) == (8, 2)
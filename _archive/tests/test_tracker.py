@@ -0,0 +1,134 @@
+# Copyright 2025 R5
+# This file is part of the R5 Core library.
+#
+# This software is provided "as is", without warranty of any kind,
+# express or implied, including but not limited to the warranties
+# of merchantability, fitness for a particular purpose and
+# noninfringement. In no event shall the authors or copyright
+# holders be liable for any claim, damages, or other liability,
+# whether in an action of contract, tort or otherwise, arising
+# from, out of or in connection with the software or the use or
+# other dealings in the software.
+
+"""Transaction tracker: receipt polling with backoff, from several threads."""
+
+import threading
+
+from r5wallet.bench import MockNode, BENCH_PRIVATE_KEY, BENCH_DESTINATION, MOCK_CHAIN_ID
+from r5wallet.chain import NonceManager, TransactionTracker
+from r5wallet.config import TX_POLL_MIN_INTERVAL, TX_DROP_MISSES, TX_DROP_GRACE
+
+TX = {"to": BENCH_DESTINATION, "value": 1, "gas": 21000, "gasPrice": 10 ** 9,
+      "chainId": MOCK_CHAIN_ID}
+
+class PendingNode(MockNode):
+    """Keeps sent transactions pending until mined is set."""
+
+    mined = False
+    unknown = 0  # answer this many transaction lookups with null
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.methods["eth_getTransactionByHash"] = self._transaction
+
+    def _transaction_count(self, params):
+        # The nonce is only used up at "latest" once the transaction is mined.
+        if params[1] == "latest" and not self.mined:
+            return '"0x0"'
+        return super()._transaction_count(params)
+
+    def _transaction(self, params):
+        with self._lock:
+            if self.unknown:
+                self.unknown -= 1
+                return "null"
+        return ('{"hash":"%s","nonce":"0x0","blockHash":null,"blockNumber":null,'
+                '"transactionIndex":null,"from":"%s","to":"%s","value":"0x1","gas":"0x5208",'
+                '"gasPrice":"0x3b9aca00","input":"0x","v":"0x1b","r":"0x1","s":"0x1","type":"0x0"}'
+                % (params[0], self.address, BENCH_DESTINATION.lower()))
+
+    def _receipt(self, params):
+        return super()._receipt(params) if self.mined else "null"
+
+def _tracker(w3):
+    statuses = []
+    wallet = {"private_key": BENCH_PRIVATE_KEY}
+    nonces = NonceManager(w3, w3.eth.account.from_key(BENCH_PRIVATE_KEY).address)
+    tracker = TransactionTracker(w3, wallet, nonces,
+                                 lambda tx_hash, status, details: statuses.append((tx_hash, status)))
+    return tracker, statuses
+
+def test_backs_off_until_mined(connect_node):
+    node = PendingNode(blocks=10, txs_per_block=1)
+    tracker, statuses = _tracker(connect_node(node))
+    tx_hash = tracker.submit(TX)
+    for expected in (2, 4):
+        tracker.pending[tx_hash]["next_poll"] = 0
+        tracker.poll()
+        assert tracker.pending[tx_hash]["interval"] == TX_POLL_MIN_INTERVAL * expected
+    node.mined = True
+    tracker.pending[tx_hash]["next_poll"] = 0
+    tracker.poll()
+    assert statuses == [(tx_hash, "pending"), (tx_hash, "mined")]
+    assert not tracker.pending
+
+def test_overlapping_polls_report_once(connect_node):
+    node = PendingNode(blocks=10, txs_per_block=1)
+    node.mined = True
+    tracker, statuses = _tracker(connect_node(node))
+    tx_hash = tracker.submit(TX)
+    tracker.pending[tx_hash]["next_poll"] = 0
+    # Both polls pick the transaction up before either finishes it.
+    barrier = threading.Barrier(2, timeout=5)
+    receipt = tracker._receipt
+
+    def receipt_together(tx_hash):
+        barrier.wait()
+        return receipt(tx_hash)
+
+    tracker._receipt = receipt_together
+    errors = []
+
+    def poll():
+        try:
+            tracker.poll()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=poll) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert statuses.count((tx_hash, "mined")) == 1
+
+def _poll(tracker, tx_hash):
+    tracker.pending[tx_hash]["next_poll"] = 0
+    tracker.poll()
+
+def test_a_missed_lookup_keeps_the_transaction_pending(connect_node):
+    node = PendingNode(blocks=10, txs_per_block=1)
+    tracker, statuses = _tracker(connect_node(node))
+    tx_hash = tracker.submit(TX)
+    node.unknown = 1
+    _poll(tracker, tx_hash)
+    assert tracker.pending[tx_hash]["misses"] == 1
+    _poll(tracker, tx_hash)
+    assert tracker.pending[tx_hash]["misses"] == 0
+    node.mined = True
+    _poll(tracker, tx_hash)
+    assert statuses == [(tx_hash, "pending"), (tx_hash, "mined")]
+
+def test_dropped_only_after_misses_and_grace(connect_node):
+    node = PendingNode(blocks=10, txs_per_block=1)
+    tracker, statuses = _tracker(connect_node(node))
+    tx_hash = tracker.submit(TX)
+    node.unknown = 100
+    for _ in range(TX_DROP_MISSES + 2):
+        _poll(tracker, tx_hash)
+    assert statuses == [(tx_hash, "pending")]
+    tracker.pending[tx_hash]["submitted"] -= TX_DROP_GRACE
+    _poll(tracker, tx_hash)
+    assert statuses == [(tx_hash, "pending"), (tx_hash, "dropped")]
+    assert not tracker.pending